@@ -0,0 +1,187 @@
+import sqlite3
+import threading
+import hashlib
+import time
+import re
+import os
+import numpy as np
+
+CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Semantic hits (off by default) reuse the answer of a previously asked question
+# whose embedding is at least this close (cosine) to the new one. Only answers
+# generated from exactly the chunks retrieved now are candidates, so a near
+# paraphrase that asks about something else ("TA quota for a CDC with lab" vs
+# "without lab") still gets its own answer unless retrieval can't tell them apart.
+SEMANTIC_ENABLED = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0.92"))
+
+_lock = threading.Lock()
+_counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+# Semantic candidates in memory, {chunk_set: {key: (unit vector, created_at)}},
+# loaded from the table on first use and kept in step with it
+_vectors = None
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(CACHE_PATH, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS answers (
+        key TEXT PRIMARY KEY,
+        question TEXT NOT NULL,
+        corpus_version INTEGER NOT NULL,
+        answer TEXT NOT NULL,
+        source TEXT,
+        embedding BLOB,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        chunk_set TEXT
+    )""")
+    # Caches created before chunk_set existed
+    if "chunk_set" not in [row[1] for row in conn.execute("PRAGMA table_info(answers)")]:
+        conn.execute("ALTER TABLE answers ADD COLUMN chunk_set TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+    conn.execute("CREATE INDEX IF NOT EXISTS answers_version ON answers (corpus_version)")
+    return conn
+
+_conn = _connect()
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+def make_key(question: str, chunk_ids: list) -> str:
+    raw = normalize_question(question) + "\x00" + "\x00".join(sorted(chunk_ids))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def make_chunk_set(chunk_ids: list) -> str:
+    return hashlib.sha256("\x00".join(sorted(chunk_ids)).encode("utf-8")).hexdigest()
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+def _corpus_version() -> int:
+    row = _conn.execute("SELECT value FROM meta WHERE key = 'corpus_version'").fetchone()
+    return int(row[0]) if row else 0
+
+def _load_vectors() -> dict:
+    # Caller holds _lock
+    global _vectors
+    if _vectors is None:
+        _vectors = {}
+        rows = _conn.execute(
+            "SELECT key, chunk_set, embedding, created_at FROM answers "
+            "WHERE corpus_version = ? AND embedding IS NOT NULL AND chunk_set IS NOT NULL",
+            (_corpus_version(),)
+        )
+        for key, chunk_set, blob, created_at in rows:
+            _vectors.setdefault(chunk_set, {})[key] = (_unit(np.frombuffer(blob, dtype=np.float32)), created_at)
+    return _vectors
+
+def _forget(keys: list):
+    # Caller holds _lock
+    if _vectors is None:
+        return
+    for key in keys:
+        for entries in _vectors.values():
+            entries.pop(key, None)
+
+def _get(key: str, now: float) -> dict | None:
+    row = _conn.execute(
+        "SELECT answer, source FROM answers WHERE key = ? AND corpus_version = ? AND created_at > ?",
+        (key, _corpus_version(), now - CACHE_TTL_SECONDS)
+    ).fetchone()
+    if not row:
+        return None
+    _conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+    _conn.commit()
+    return {"answer": row[0], "source": row[1]}
+
+def _get_similar(vector: list, chunk_set: str, now: float) -> dict | None:
+    candidates = [
+        (key, unit) for key, (unit, created_at) in _load_vectors().get(chunk_set, {}).items()
+        if created_at > now - CACHE_TTL_SECONDS
+    ]
+    if not candidates:
+        return None
+    sims = np.stack([unit for _, unit in candidates]) @ _unit(vector)
+    best = int(sims.argmax())
+    if sims[best] < SEMANTIC_THRESHOLD:
+        return None
+    return _get(candidates[best][0], now)
+
+def lookup(key: str, chunk_ids: list, vector: list | None) -> tuple[dict | None, str]:
+    # The cached answer for this question and retrieval, if any, and how it was
+    # found: "hit" (same question), "semantic_hit" (a close paraphrase answered
+    # from the same chunks) or "miss"
+    now = time.time()
+    with _lock:
+        result = _get(key, now)
+        if result:
+            _counters["exact_hits"] += 1
+            return result, "hit"
+        if SEMANTIC_ENABLED and vector is not None:
+            result = _get_similar(vector, make_chunk_set(chunk_ids), now)
+            if result:
+                _counters["semantic_hits"] += 1
+                return result, "semantic_hit"
+        _counters["misses"] += 1
+    return None, "miss"
+
+def put(key: str, question: str, chunk_ids: list, vector: list | None, result: dict):
+    now = time.time()
+    chunk_set = make_chunk_set(chunk_ids)
+    blob = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+    with _lock:
+        _conn.execute(
+            "INSERT OR REPLACE INTO answers "
+            "(key, question, corpus_version, answer, source, embedding, created_at, last_used, chunk_set) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, question, _corpus_version(), result["answer"], result["source"], blob, now, now, chunk_set)
+        )
+        # Drop expired entries, then the least recently used ones over the limit
+        expired = _conn.execute(
+            "DELETE FROM answers WHERE created_at <= ? RETURNING key", (now - CACHE_TTL_SECONDS,)
+        ).fetchall()
+        overflow = _conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?) RETURNING key",
+            (CACHE_MAX_ENTRIES,)
+        ).fetchall()
+        _conn.commit()
+        _counters["evictions"] += len(expired) + len(overflow)
+        _forget([row[0] for row in expired + overflow] + [key])
+        if vector is not None:
+            _load_vectors().setdefault(chunk_set, {})[key] = (_unit(vector), now)
+
+def invalidate():
+    # Called whenever the document collection changes; answers computed against
+    # the old corpus are dropped and can never be served again
+    global _vectors
+    with _lock:
+        version = _corpus_version() + 1
+        _conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('corpus_version', ?)", (str(version),)
+        )
+        _conn.execute("DELETE FROM answers WHERE corpus_version < ?", (version,))
+        _conn.commit()
+        _vectors = {}
+
+def get_cache_stats() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        entries = _conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        version = _corpus_version()
+    lookups = counters["exact_hits"] + counters["semantic_hits"] + counters["misses"]
+    hits = counters["exact_hits"] + counters["semantic_hits"]
+    return {
+        **counters,
+        "entries": entries,
+        "corpus_version": version,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+    }
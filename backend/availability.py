@@ -0,0 +1,224 @@
+from zoneinfo import ZoneInfo
+from database import get_bookings_by_status
+import datetime
+import threading
+import bisect
+import re
+import os
+
+IST = ZoneInfo("Asia/Kolkata")
+# Background reconciliation with Google Calendar: how often, and how far ahead
+CALENDAR_SYNC_SECONDS = int(os.getenv("CALENDAR_SYNC_SECONDS", "300"))
+CALENDAR_SYNC_DAYS = int(os.getenv("CALENDAR_SYNC_DAYS", "90"))
+BOOKING_SUMMARY_PREFIX = "[CSIS Booking] "
+
+def resource_key(resource: str) -> str:
+    return " ".join(resource.lower().split())
+
+def parse_duration_hours(duration: str | None, default: float = 2) -> float:
+    # "2 hours", "1.5 hrs", "90 minutes", "2" -> hours
+    if not duration:
+        return default
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(h|hr|hrs|hours?|m|min|mins|minutes?)?\b", duration.lower())
+    if not match:
+        return default
+    value = float(match.group(1))
+    unit = match.group(2) or "h"
+    return value / 60 if unit.startswith("m") else value
+
+def parse_slot(date: str, time: str, duration_hours: float) -> tuple[datetime.datetime, datetime.datetime]:
+    # Naive local (IST) start/end of a booking
+    dt_str = f"{date} {time.strip().upper()}"
+    for fmt in ("%Y-%m-%d %I:%M %p", "%Y-%m-%d %I %p", "%Y-%m-%d %I:%M%p", "%Y-%m-%d %I%p", "%Y-%m-%d %H:%M"):
+        try:
+            start = datetime.datetime.strptime(dt_str, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Unrecognised date/time: {dt_str}")
+    return start, start + datetime.timedelta(hours=duration_hours)
+
+class _ResourceIntervals:
+    # Intervals sorted by start, plus the running maximum of their ends. A new
+    # [start, end) overlaps something iff, among the intervals starting before
+    # `end`, the latest end is after `start` — one bisect, so O(log n) per check,
+    # and correct for partial overlaps and for stored intervals that overlap each other.
+    def __init__(self):
+        self.starts = []
+        self.entries = []
+        self.max_ends = []
+
+    def _rebuild_max_ends(self, frm: int):
+        running = self.max_ends[frm - 1] if frm > 0 else None
+        self.max_ends[frm:] = []
+        for _, end, _ in self.entries[frm:]:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def add(self, start, end, key: str):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.entries.insert(i, (start, end, key))
+        self._rebuild_max_ends(i)
+
+    def remove(self, key: str) -> bool:
+        for i, entry in enumerate(self.entries):
+            if entry[2] == key:
+                del self.starts[i]
+                del self.entries[i]
+                self._rebuild_max_ends(i)
+                return True
+        return False
+
+    def find_conflict(self, start, end) -> tuple | None:
+        i = bisect.bisect_left(self.starts, end) - 1
+        while i >= 0 and self.max_ends[i] > start:
+            if self.entries[i][1] > start:
+                return self.entries[i]
+            i -= 1
+        return None
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._keys = {}
+
+    def add(self, resource: str, start, end, key: str):
+        with self._lock:
+            self.remove(key)
+            rk = resource_key(resource)
+            self._resources.setdefault(rk, _ResourceIntervals()).add(start, end, key)
+            self._keys[key] = rk
+
+    def remove(self, key: str):
+        with self._lock:
+            rk = self._keys.pop(key, None)
+            if rk:
+                self._resources[rk].remove(key)
+
+    def find_conflict(self, resource: str, start, end) -> tuple | None:
+        with self._lock:
+            intervals = self._resources.get(resource_key(resource))
+            return intervals.find_conflict(start, end) if intervals else None
+
+    def replace_source(self, prefix: str, items: list):
+        # Swap every entry whose key starts with prefix for items [(resource, start, end, key)]
+        with self._lock:
+            for key in [k for k in self._keys if k.startswith(prefix)]:
+                self.remove(key)
+            for resource, start, end, key in items:
+                self.add(resource, start, end, key)
+
+    def resources(self) -> list:
+        with self._lock:
+            return list(self._resources)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+index = AvailabilityIndex()
+_sync_stop = threading.Event()
+_sync_state = {"last_sync": None, "last_error": None, "calendar_events": 0}
+
+def check_availability(resource: str, date: str, time: str, duration_hours: float = 2) -> bool:
+    start, end = parse_slot(date, time, duration_hours)
+    conflict = index.find_conflict(resource, start, end)
+    if conflict:
+        print(f"Conflict found for {resource}: {conflict[2]} {conflict[0]} - {conflict[1]}")
+        return False
+    return True
+
+def _booking_item(booking: dict) -> tuple | None:
+    try:
+        start, end = parse_slot(booking["date"], booking["time"], parse_duration_hours(booking["duration"]))
+    except ValueError as e:
+        print(f"Skipping booking {booking['id']} in availability index: {e}")
+        return None
+    return booking["resource"], start, end, f"booking:{booking['id']}"
+
+def booking_status_changed(booking: dict, status: str):
+    # Only approved bookings block their slot
+    if status != "approved":
+        index.remove(f"booking:{booking['id']}")
+        return
+    item = _booking_item(booking)
+    if item:
+        index.add(*item)
+
+def add_calendar_event(event_id: str, resource: str, date: str, time: str, duration_hours: float):
+    if event_id:
+        start, end = parse_slot(date, time, duration_hours)
+        index.add(resource, start, end, f"event:{event_id}")
+
+def load_bookings():
+    items = [_booking_item(b) for b in get_bookings_by_status("approved")]
+    index.replace_source("booking:", [item for item in items if item])
+
+def _to_local(value: str) -> datetime.datetime:
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt.astimezone(IST).replace(tzinfo=None)
+
+def _event_interval(event: dict):
+    start, end = event.get("start", {}), event.get("end", {})
+    if "dateTime" in start:
+        return _to_local(start["dateTime"]), _to_local(end["dateTime"])
+    # All-day event
+    return (datetime.datetime.fromisoformat(start["date"]),
+            datetime.datetime.fromisoformat(end["date"]))
+
+def _event_resource(event: dict, known: list) -> str | None:
+    private = event.get("extendedProperties", {}).get("private", {})
+    if private.get("csis_resource"):
+        return private["csis_resource"]
+    summary = event.get("summary", "")
+    if summary.startswith(BOOKING_SUMMARY_PREFIX):
+        return summary[len(BOOKING_SUMMARY_PREFIX):].rsplit(" - ", 1)[0]
+    # Events created outside SmartAssist that mention a resource we know about
+    lowered = summary.lower()
+    for rk in known:
+        if rk and rk in lowered:
+            return rk
+    return None
+
+def sync_calendar():
+    # Imported here: calendar_services uses parse_slot from this module
+    from calendar_services import list_events
+    now = datetime.datetime.now(IST)
+    known = index.resources()
+    items = []
+    for event in list_events(now - datetime.timedelta(days=1), now + datetime.timedelta(days=CALENDAR_SYNC_DAYS)):
+        resource = _event_resource(event, known)
+        if not resource:
+            continue
+        start, end = _event_interval(event)
+        items.append((resource, start, end, f"event:{event['id']}"))
+    index.replace_source("event:", items)
+    _sync_state["calendar_events"] = len(items)
+
+def _sync_loop():
+    while not _sync_stop.is_set():
+        try:
+            load_bookings()
+            sync_calendar()
+            _sync_state["last_sync"] = datetime.datetime.utcnow().isoformat()
+            _sync_state["last_error"] = None
+        except Exception as e:
+            print(f"Availability sync error: {e}")
+            _sync_state["last_error"] = str(e)
+        _sync_stop.wait(CALENDAR_SYNC_SECONDS)
+
+def start_sync():
+    # Bookings are loaded synchronously so the index is usable immediately;
+    # the calendar is reconciled in the background from then on
+    load_bookings()
+    _sync_stop.clear()
+    threading.Thread(target=_sync_loop, name="availability-sync", daemon=True).start()
+
+def stop_sync():
+    _sync_stop.set()
+
+def get_availability_stats() -> dict:
+    return {"entries": index.size(), **_sync_state}
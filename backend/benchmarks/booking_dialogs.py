@@ -0,0 +1,119 @@
+# LLM calls per completed booking over scripted multi-turn dialogues, before and
+# after server-side slot filling (conversation.py). The LLM is a stub that
+# extracts exactly what the message says, so only the number of calls differs:
+#
+#   stateless  every message is classified and extracted from scratch, the way
+#              /chat worked before, so each follow-up restates the whole request
+#   stateful   conversation.handle_message with the short follow-ups as written
+#
+# The embedding tier is disabled so no model is loaded. Run from backend/:
+#
+#   python -m benchmarks.booking_dialogs
+import argparse
+import json
+
+import conversation
+import entity_parser
+import intent
+import llm_clients
+
+DIALOGUES = [
+    ["Book the CS lab tomorrow at 3 PM for 2 hours"],
+    ["I want to book the seminar hall", "tomorrow", "at 10 AM", "for 2 hours"],
+    ["reserve lab 3 for friday 2pm", "an hour and a half"],
+    ["Can I book the conference room on Monday?", "from 3 to 5 pm"],
+    ["I need to book something for our project review", "the networks lab", "5 November at 11 AM", "2 hours"],
+    ["Book the ML lab on 2026-11-02", "How are TAs allocated to courses?", "4 PM, 1 hour"],
+    ["Please block the auditorium next Friday for our fest meeting", "6 pm", "three hours"],
+    ["book D-204 room for 3 hours today", "at 5:30 pm"],
+    ["Book the CS lab at 2 PM for 1 hour", "What is the thesis submission deadline on 15 March?", "next Monday"],
+    ["reserve the seminar hall tomorrow at 9 AM", "Does the TA policy apply for 2 hours per week?", "90 minutes"],
+]
+# Questions asked in the middle of a booking; each should be answered as a
+# question, not merged into the pending booking
+ASIDES = {
+    "How are TAs allocated to courses?",
+    "What is the thesis submission deadline on 15 March?",
+    "Does the TA policy apply for 2 hours per week?",
+}
+
+ORIGINAL_PARSER = entity_parser.parse_booking_fields
+
+
+class StubLLM:
+    # Reads the message back out of the prompt and "extracts" it with the
+    # deterministic parsers: a perfect extractor, one call at a time
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        self.stats["calls"] += 1
+        message = prompt.split('Message: "', 1)[1].split('"\n', 1)[0]
+        fields = ORIGINAL_PARSER(message)
+        booking = intent._BOOKING_VERB_RE.search(message) or any(fields.values())
+        if "Reply with only one word" in prompt:
+            return "BOOKING" if booking else "QUESTION"
+        if "Classify this message" in prompt and not booking:
+            return json.dumps({"intent": "question"})
+        return json.dumps(fields)
+
+
+def run_stateless(dialogue: list, stats: dict) -> bool:
+    # The old flow: no parsers in front of the LLM and nothing remembered, so the
+    # user re-sends everything said so far until the booking is complete
+    intent.parse_booking_fields = lambda message, ref=None: dict.fromkeys(intent.BOOKING_FIELDS)
+    try:
+        said = []
+        for message in dialogue:
+            said.append(message)
+            analysis = intent.classify_and_extract(message if len(said) == 1 else ", ".join(said))
+            stats["turns"] += 1
+            if analysis["intent"] == "booking" and None not in analysis["entities"].values():
+                return True
+        return False
+    finally:
+        intent.parse_booking_fields = ORIGINAL_PARSER
+
+
+def run_stateful(dialogue: list, stats: dict, user_id: str) -> bool:
+    for message in dialogue:
+        analysis = conversation.handle_message(user_id, message)
+        stats["turns"] += 1
+        if message in ASIDES and analysis["intent"] == "booking":
+            stats["asides_merged"] += 1
+        if analysis["intent"] == "booking" and None not in analysis["entities"].values():
+            return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--call-ms", type=float, default=1500.0, help="simulated cost of one LLM call")
+    args = parser.parse_args()
+
+    intent._embedding_intent = lambda message: None
+    totals = {mode: {"calls": 0, "turns": 0, "completed": 0, "asides_merged": 0} for mode in ("stateless", "stateful")}
+    print(f"{'dialogue':<52} {'stateless':>9} {'stateful':>9}")
+    for i, dialogue in enumerate(DIALOGUES):
+        row = {}
+        for mode in ("stateless", "stateful"):
+            stats = {"calls": 0, "turns": 0, "asides_merged": 0}
+            llm_clients._llm = StubLLM(stats)
+            done = run_stateless(dialogue, stats) if mode == "stateless" else run_stateful(dialogue, stats, f"user-{i}")
+            row[mode] = f"{stats['calls']}{'' if done else '!'}"
+            totals[mode]["calls"] += stats["calls"]
+            totals[mode]["turns"] += stats["turns"]
+            totals[mode]["completed"] += done
+            totals[mode]["asides_merged"] += stats["asides_merged"]
+        print(f"{' / '.join(dialogue)[:52]:<52} {row['stateless']:>9} {row['stateful']:>9}")
+
+    for mode, t in totals.items():
+        per_booking = t["calls"] / t["completed"] if t["completed"] else float("nan")
+        print(f"{mode:<10} {t['completed']}/{len(DIALOGUES)} completed, {per_booking:.2f} LLM calls per booking "
+              f"(~{per_booking * args.call_ms:.0f} ms), {t['turns']} turns")
+    print(f"questions mid-booking merged into the booking (stateful): {totals['stateful']['asides_merged']}")
+    print(json.dumps(conversation.get_conversation_stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Insert and list latency of the bookings store at growing table sizes: the
+# SQLite store in database.py versus the Chroma collection it replaced (same
+# calls the old database.py made, default embedding function included).
+# Tables are prefilled in bulk; the timed operations are the per-request ones.
+# Run from backend/:
+#
+#   python -m benchmarks.booking_store --sizes 10000 100000
+#
+# --no-embed gives Chroma precomputed vectors, isolating storage cost from the
+# per-insert embedding (and works offline, without the ONNX model download).
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+USERS = 500
+RESOURCES = ["Lab 1", "Lab 2", "Lab 3", "Seminar Hall", "Conference Room", "Projector"]
+EMBEDDING_DIM = 384
+INSERTS = 200
+LOOKUPS = 200
+USER_LISTS = 50
+FULL_LISTS = 3
+
+
+def fake_booking(i: int) -> dict:
+    day = datetime.date(2026, 1, 1) + datetime.timedelta(days=i % 365)
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": f"user{i % USERS}",
+        "requester": f"Requester {i % USERS}",
+        "resource": RESOURCES[i % len(RESOURCES)],
+        "date": day.isoformat(),
+        "time": f"{9 + i % 8}:00 AM",
+        "duration": "2 hours",
+        "status": random.choice(["pending", "approved", "rejected"]),
+        "remarks": "",
+        "created_at": (datetime.datetime(2026, 1, 1) + datetime.timedelta(seconds=i)).isoformat(),
+    }
+
+
+def timed(fn, repeat: int) -> float | None:
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            # Chroma's unpaginated get() fails past ~32k rows (SQLite's bound-variable limit)
+            print(f"  failed: {type(e).__name__}: {e}")
+            return None
+        samples.append(time.perf_counter() - start)
+    return statistics.mean(samples) * 1000
+
+
+def fmt(ms: float | None, width: int, digits: int) -> str:
+    return f"{'failed':>{width}}" if ms is None else f"{ms:>{width}.{digits}f}"
+
+
+class SqliteStore:
+    def __init__(self, path: str):
+        os.environ["DATABASE_PATH"] = path
+        import database
+        self.db = database
+
+    def prefill(self, rows: list):
+        db = self.db
+        with db._lock:
+            db._conn.execute("BEGIN")
+            db._conn.executemany(
+                f"INSERT INTO bookings ({', '.join(db.BOOKING_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(db.BOOKING_COLUMNS))})",
+                [tuple(r.get(c) for c in db.BOOKING_COLUMNS) for r in rows]
+            )
+            db._conn.execute("COMMIT")
+
+    def insert(self, b: dict) -> str:
+        return self.db.create_booking(b["user_id"], b["requester"], b["resource"], b["date"], b["time"], b["duration"])
+
+    def by_id(self, booking_id: str):
+        return self.db.get_booking_by_id(booking_id)
+
+    def by_user(self, user_id: str) -> list:
+        return self.db.get_bookings_by_user(user_id)
+
+    def all(self) -> list:
+        return self.db.get_all_bookings()
+
+
+class ChromaStore:
+    # The pre-SQLite database.py, inlined
+    def __init__(self, path: str, embed: bool):
+        import chromadb
+        self.client = chromadb.PersistentClient(path=path)
+        self.col = self.client.get_or_create_collection("bookings")
+        self.embed = embed
+
+    def prefill(self, rows: list):
+        batch = self.client.get_max_batch_size()
+        for i in range(0, len(rows), batch):
+            part = rows[i:i + batch]
+            self.col.add(
+                ids=[r["id"] for r in part],
+                embeddings=[[0.0] * EMBEDDING_DIM for _ in part],
+                metadatas=[{k: v for k, v in r.items() if k != "id"} for r in part],
+            )
+
+    def insert(self, b: dict) -> str:
+        booking_id = str(uuid.uuid4())
+        extra = {} if self.embed else {"embeddings": [[0.0] * EMBEDDING_DIM]}
+        self.col.add(
+            documents=[f"{b['requester']} wants to book {b['resource']} on {b['date']} at {b['time']} for {b['duration']}"],
+            metadatas=[{k: v for k, v in b.items() if k != "id"}],
+            ids=[booking_id],
+            **extra
+        )
+        return booking_id
+
+    def _format(self, results: dict) -> list:
+        return [{"id": booking_id, **results["metadatas"][i]} for i, booking_id in enumerate(results["ids"])]
+
+    def by_id(self, booking_id: str):
+        result = self.col.get(ids=[booking_id])
+        return {"id": result["ids"][0], **result["metadatas"][0]} if result["ids"] else None
+
+    def by_user(self, user_id: str) -> list:
+        return self._format(self.col.get(where={"user_id": user_id}))
+
+    def all(self) -> list:
+        return self._format(self.col.get())
+
+
+def measure(store, size: int, loaded: int) -> tuple[dict, int]:
+    store.prefill([fake_booking(i) for i in range(loaded, size)])
+    ids = [store.insert(fake_booking(size + i)) for i in range(LOOKUPS)]
+    return {
+        "insert_ms": timed(lambda i: store.insert(fake_booking(size + LOOKUPS + i)), INSERTS),
+        "get_by_id_ms": timed(lambda i: store.by_id(ids[i % len(ids)]), LOOKUPS),
+        "list_user_ms": timed(lambda i: store.by_user(f"user{i % USERS}"), USER_LISTS),
+        "list_all_ms": timed(lambda i: store.all(), FULL_LISTS),
+    }, size + LOOKUPS + INSERTS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--no-embed", action="store_true")
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {"sqlite": SqliteStore(os.path.join(tmp, "bookings.db"))}
+        if not args.skip_chroma:
+            stores["chroma"] = ChromaStore(os.path.join(tmp, "chroma_db"), embed=not args.no_embed)
+
+        print(f"{'store':<8}{'rows':>8}{'insert':>11}{'by id':>11}{'by user':>11}{'list all':>12}   (ms)")
+        for name, store in stores.items():
+            loaded = 0
+            for size in sorted(args.sizes):
+                result, loaded = measure(store, max(size, loaded), loaded)
+                print(f"{name:<8}{size:>8}{fmt(result['insert_ms'], 11, 3)}{fmt(result['get_by_id_ms'], 11, 3)}"
+                      f"{fmt(result['list_user_ms'], 11, 3)}{fmt(result['list_all_ms'], 12, 1)}")
+
+
+if __name__ == "__main__":
+    main()
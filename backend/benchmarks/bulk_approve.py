@@ -0,0 +1,121 @@
+# Time to approve N pending bookings one email-link click at a time
+# (GET /bookings/{id}/action) versus one POST /bookings/batch. Runs the route
+# functions in-process against a scratch database and outbox, with a fake
+# Calendar service that charges --rtt-ms per HTTP request (a batch of up to 50
+# inserts is one request). Notifications are only queued; no mail is sent. Run
+# from backend/:
+#
+#   python -m benchmarks.bulk_approve --bookings 200
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+
+class FakeRequest:
+    def __init__(self, service, body: dict):
+        self.service = service
+        self.body = body
+
+    def execute(self):
+        self.service.http_requests += 1
+        time.sleep(self.service.rtt)
+        return self.service.create(self.body)
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: FakeRequest, request_id: str):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.http_requests += 1
+        time.sleep(self.service.rtt)
+        for request_id, request in self.requests:
+            self.callback(request_id, self.service.create(request.body), None)
+
+
+class FakeCalendar:
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.http_requests = 0
+        self.events_created = 0
+
+    def create(self, body: dict) -> dict:
+        self.events_created += 1
+        return {"id": f"evt-{self.events_created}", **body}
+
+    # The googleapiclient surface CalendarClient uses: events().insert(...) and batches
+    def events(self):
+        return self
+
+    def insert(self, calendarId: str, body: dict) -> FakeRequest:
+        return FakeRequest(self, body)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+def pending_bookings(database, availability, n: int, day: datetime.date) -> list:
+    ids = []
+    for i in range(n):
+        resource, date, slot_time = f"Lab {i % 20}", (day + datetime.timedelta(days=i // 20)).isoformat(), "10:00 AM"
+        start, end = availability.parse_slot(date, slot_time, 2)
+        booking, _ = database.reserve_booking(
+            f"user{i}@example.com", f"User {i}", resource, date, slot_time, "2 hours",
+            availability.resource_key(resource), start.isoformat(), end.isoformat()
+        )
+        ids.append(booking["id"])
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=80.0, help="simulated Calendar API round trip")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+        os.environ["OUTBOX_PATH"] = os.path.join(tmp, "outbox.db")
+        import availability
+        import bookings
+        import calendar_services
+        import database
+        import email_service
+
+        calendar = FakeCalendar(args.rtt_ms)
+        calendar_services.set_calendar_client(calendar_services.CalendarClient(service_factory=lambda: calendar))
+
+        rows = []
+        for mode, day in (("one by one", datetime.date(2032, 1, 5)), ("batch", datetime.date(2033, 1, 5))):
+            ids = pending_bookings(database, availability, args.bookings, day)
+            calendar.http_requests = 0
+            queued = email_service.get_outbox_stats()["by_status"].get("queued", 0)
+            start = time.perf_counter()
+            if mode == "batch":
+                result = bookings.batch_update_bookings(bookings.BatchStatusUpdate(booking_ids=ids, status="approved"))
+                approved = result["updated"]
+            else:
+                for booking_id in ids:
+                    bookings.action_booking(booking_id, "approved")
+                approved = len(database.find_bookings(status="approved", date_from=day.isoformat(),
+                                                      limit=database.MAX_PAGE_SIZE)[0])
+            seconds = time.perf_counter() - start
+            emails = email_service.get_outbox_stats()["by_status"].get("queued", 0) - queued
+            rows.append((mode, seconds, approved, calendar.http_requests, emails))
+
+    print(f"{'mode':<11} {'total ms':>9} {'ms/booking':>10} {'approved':>8} {'calendar reqs':>13} {'emails':>6}")
+    for mode, seconds, approved, requests, emails in rows:
+        print(f"{mode:<11} {seconds * 1000:>9.0f} {seconds * 1000 / args.bookings:>10.2f} {approved:>8} "
+              f"{requests:>13} {emails:>6}")
+    print(f"speedup: {rows[0][1] / rows[1][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
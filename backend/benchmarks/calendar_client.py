@@ -0,0 +1,70 @@
+# Per-call cost of the Calendar client: unpickling token.pickle and building the
+# discovery client on every call (the old get_calendar_service) versus the shared
+# CalendarClient. The backend is googleapiclient's HttpMock with the bundled
+# static discovery document, so no network or Google account is needed. Run from backend/:
+#
+#   python -m benchmarks.calendar_client
+import datetime
+import json
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMock
+
+from calendar_services import CalendarClient
+
+N = 200
+
+
+def fake_backend(tmp: str) -> HttpMock:
+    path = os.path.join(tmp, "events.json")
+    with open(path, "w") as f:
+        json.dump({"id": "evt-1", "items": []}, f)
+    return HttpMock(path, {"status": "200"})
+
+
+def list_request(service):
+    return service.events().list(calendarId="primary", singleEvents=True, orderBy="startTime")
+
+
+def per_call(tmp: str, token_path: str) -> float:
+    start = time.perf_counter()
+    with open(token_path, "rb") as token:
+        pickle.load(token)
+    service = build("calendar", "v3", http=fake_backend(tmp), static_discovery=True)
+    list_request(service).execute()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        token_path = os.path.join(tmp, "token.pickle")
+        creds = Credentials(token="fake", expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+        with open(token_path, "wb") as f:
+            pickle.dump(creds, f)
+
+        before = [per_call(tmp, token_path) for _ in range(N)]
+
+        client = CalendarClient(
+            service_factory=lambda: build("calendar", "v3", http=fake_backend(tmp), static_discovery=True)
+        )
+        after = []
+        for _ in range(N):
+            start = time.perf_counter()
+            client.execute(list_request)
+            after.append(time.perf_counter() - start)
+
+    for label, timings in (("build per call", before), ("shared client", after)):
+        ms = [t * 1000 for t in timings]
+        print(f"{label:<16} mean {statistics.mean(ms):8.3f} ms  p50 {statistics.median(ms):8.3f} ms  "
+              f"first {ms[0]:8.3f} ms")
+    print(f"saved per call: {statistics.mean(before) * 1000 - statistics.mean(after) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
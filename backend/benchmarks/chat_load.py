@@ -0,0 +1,105 @@
+# Load test for /chat with the LLM and retrieval replaced by stubs that sleep,
+# so it measures the server's scheduling rather than Ollama. Throughput should
+# grow with concurrent users up to OLLAMA_CONCURRENCY / llm-latency, and /health
+# should stay fast throughout. Run from backend/:
+#
+#   OLLAMA_CONCURRENCY=4 python -m benchmarks.chat_load --llm-ms 500
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import answer_cache
+import llm_clients
+import main as server
+import rag
+
+
+class SleepyLLM:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        time.sleep(self.seconds)
+        return "Stub answer."
+
+    def stream(self, prompt: str, **kwargs):
+        time.sleep(self.seconds)
+        yield "Stub answer."
+
+
+class StubDoc:
+    page_content = "TAs are allocated with a modified Gale-Shapley algorithm."
+    metadata = {"source": "TA_POLICY.pdf", "page": 1}
+    id = "stub-chunk"
+
+
+class StubRetrieval:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def embed_query(self, text: str) -> list:
+        time.sleep(self.seconds)
+        return [0.0] * 384
+
+    def search(self, question: str, vector: list, k: int | None = None) -> list:
+        return [StubDoc()]
+
+
+async def user(client: httpx.AsyncClient, requests: int, latencies: list):
+    for _ in range(requests):
+        start = time.perf_counter()
+        r = await client.post("/chat", json={"message": "How are TAs allocated to courses?"})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run(users: int, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        chat_latencies, health_latencies = [], []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_health(client, stop, health_latencies))
+        start = time.perf_counter()
+        await asyncio.gather(*(user(client, requests, chat_latencies) for _ in range(users)))
+        wall = time.perf_counter() - start
+        stop.set()
+        await prober
+    return {
+        "throughput": len(chat_latencies) / wall,
+        "chat_p50": statistics.median(chat_latencies),
+        "health_max": max(health_latencies, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-ms", type=float, default=500.0)
+    parser.add_argument("--embed-ms", type=float, default=10.0)
+    parser.add_argument("--requests", type=int, default=4, help="requests per user")
+    parser.add_argument("--users", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    llm_clients._llm = SleepyLLM(args.llm_ms / 1000)
+    rag.get_retrieval_service = lambda: StubRetrieval(args.embed_ms / 1000)
+    answer_cache.lookup = lambda *a: (None, "miss")
+    answer_cache.put = lambda *a: None
+
+    print(f"{'users':>5} {'req/s':>7} {'p50 chat ms':>12} {'max /health ms':>15}")
+    for users in (int(u) for u in args.users.split(",")):
+        r = asyncio.run(run(users, args.requests))
+        print(f"{users:>5} {r['throughput']:>7.2f} {r['chat_p50'] * 1000:>12.0f} {r['health_max'] * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Fires hundreds of simultaneous confirms at one slot and checks that exactly
+# one booking holds it. By default it drives database.reserve_booking from
+# several processes x many threads against a scratch database (the same
+# transaction /bookings/confirm relies on, with no server or email needed);
+# with --url it POSTs to a running backend instead. Exits non-zero on a double
+# booking. Run from backend/:
+#
+#   python -m benchmarks.confirm_race --processes 4 --threads 100
+#   python -m benchmarks.confirm_race --url http://localhost:8000 --threads 300
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+
+SCENARIOS = ("same-slot", "overlap", "idempotent")
+
+
+def slot_for(scenario: str, i: int) -> dict:
+    # Far-future date, one day per scenario so --url runs don't collide; in the
+    # overlap scenario every other request starts an hour later
+    slot = {"resource": "Lab 1", "date": f"2031-03-{14 + SCENARIOS.index(scenario)}", "time": "10:00 AM",
+            "duration": "2 hours"}
+    if scenario == "overlap" and i % 2:
+        slot["time"] = "11:00 AM"
+    return slot
+
+
+def _at(start_at: float):
+    time.sleep(max(0.0, start_at - time.time()))
+
+
+def reserve_worker(db_path: str, threads: int, start_at: float, proc: int, scenario: str, results):
+    os.environ["DATABASE_PATH"] = db_path
+    import database
+    from availability import parse_slot, parse_duration_hours, resource_key
+
+    def attempt(i: int):
+        slot = slot_for(scenario, i)
+        start, end = parse_slot(slot["date"], slot["time"], parse_duration_hours(slot["duration"]))
+        key = "same-key" if scenario == "idempotent" else None
+        user = "same-user" if scenario == "idempotent" else f"user-{proc}-{i}"
+        _at(start_at)
+        try:
+            booking, created = database.reserve_booking(
+                user, user, slot["resource"], slot["date"], slot["time"], slot["duration"],
+                resource_key(slot["resource"]), start.isoformat(), end.isoformat(), key
+            )
+            results.append(("created" if created else "existing", booking["id"]))
+        except database.SlotUnavailable:
+            results.append(("unavailable", None))
+        except Exception as e:
+            results.append(("error", f"{type(e).__name__}: {e}"))
+
+    pool = [threading.Thread(target=attempt, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def run_local(processes: int, threads: int, scenario: str) -> Counter:
+    db_path = os.path.join(tempfile.mkdtemp(), "race.db")
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.list()
+        start_at = time.time() + 3
+        procs = [ctx.Process(target=reserve_worker, args=(db_path, threads, start_at, p, scenario, results))
+                 for p in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        return Counter(list(results))
+
+
+def run_http(url: str, threads: int, scenario: str) -> Counter:
+    results = []
+    lock = threading.Lock()
+    start_at = time.time() + 1
+    run = uuid.uuid4().hex[:8]
+
+    def attempt(i: int):
+        slot = slot_for(scenario, i)
+        user = f"race-{run}" if scenario == "idempotent" else f"race-{run}-{i}@example.com"
+        headers = {"Content-Type": "application/json"}
+        if scenario == "idempotent":
+            headers["Idempotency-Key"] = f"race-{run}"
+        body = json.dumps({"user_id": user, "requester": user, **slot}).encode("utf-8")
+        request = urllib.request.Request(f"{url}/bookings/confirm", data=body, headers=headers, method="POST")
+        _at(start_at)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as resp:
+                data = json.loads(resp.read())
+            outcome = ("booked", data["booking_id"]) if data.get("booking_id") else (data.get("status"), None)
+        except Exception as e:
+            outcome = ("error", f"{type(e).__name__}: {e}")
+        with lock:
+            results.append(outcome)
+
+    pool = [threading.Thread(target=attempt, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return Counter(results)
+
+
+def check(scenario: str, counts: Counter) -> bool:
+    booking_ids = {booking_id for (outcome, booking_id) in counts if outcome in ("created", "existing", "booked")}
+    created = sum(n for (outcome, _), n in counts.items() if outcome == "created")
+    errors = [(detail, n) for (outcome, detail), n in counts.items() if outcome == "error"]
+    summary = Counter()
+    for (outcome, _), n in counts.items():
+        summary[outcome] += n
+    print(f"{scenario:<11} {dict(summary)}  distinct bookings: {len(booking_ids)}")
+    for detail, n in errors[:5]:
+        print(f"  error x{n}: {detail}")
+    # Only local runs can tell a new booking from a replay, so created is 0 over HTTP
+    ok = len(booking_ids) == 1 and not errors and created <= 1
+    if not ok:
+        print("  FAILED: expected exactly one booking for the slot")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--url", help="base URL of a running backend; books far-future slots in its database")
+    args = parser.parse_args()
+
+    ok = True
+    for scenario in SCENARIOS:
+        if args.url:
+            counts = run_http(args.url.rstrip("/"), args.threads, scenario)
+        else:
+            counts = run_local(args.processes, args.threads, scenario)
+        ok = check(scenario, counts) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
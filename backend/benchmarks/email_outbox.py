@@ -0,0 +1,85 @@
+# Compares sending mail inline with a fresh SMTP connection per message (the old
+# send_email) against the outbox: what a booking request now waits for (the
+# enqueue) and how fast the worker drains the queue over one reused connection.
+# Runs against a local aiosmtpd server (pip install aiosmtpd). Run from backend/:
+#
+#   python -m benchmarks.email_outbox --messages 200
+import argparse
+import os
+import smtplib
+import statistics
+import tempfile
+import threading
+import time
+
+from aiosmtpd.controller import Controller
+
+PORT = 8025
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+        self.done = threading.Event()
+        self.expected = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        if self.received >= self.expected:
+            self.done.set()
+        return "250 OK"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update({
+        "SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(PORT), "SMTP_SSL": "0",
+        "GMAIL_USER": "smartassist@example.com", "GMAIL_APP_PASSWORD": "",
+        "OUTBOX_PATH": os.path.join(tmp, "outbox.db"),
+    })
+    import email_service
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=PORT)
+    controller.start()
+    html = "<p>Your booking for <strong>Lab 1</strong> has been approved.</p>"
+
+    try:
+        handler.expected = args.messages
+        inline = []
+        start = time.perf_counter()
+        for i in range(args.messages):
+            t = time.perf_counter()
+            with smtplib.SMTP("127.0.0.1", PORT) as server:
+                server.sendmail("smartassist@example.com", f"user{i}@example.com",
+                                email_service._build_message(f"user{i}@example.com", "Inline", html))
+            inline.append(time.perf_counter() - t)
+        handler.done.wait(30)
+        inline_wall = time.perf_counter() - start
+
+        handler.received, handler.expected = 0, args.messages
+        handler.done.clear()
+        email_service.start_worker()
+        enqueue = []
+        start = time.perf_counter()
+        for i in range(args.messages):
+            t = time.perf_counter()
+            email_service.send_email(f"user{i}@example.com", "Queued", html)
+            enqueue.append(time.perf_counter() - t)
+        handler.done.wait(30)
+        queued_wall = time.perf_counter() - start
+        email_service.stop_worker()
+    finally:
+        controller.stop()
+
+    print(f"inline:  {statistics.mean(inline) * 1000:7.2f} ms/request   {args.messages / inline_wall:7.1f} msg/s")
+    print(f"outbox:  {statistics.mean(enqueue) * 1000:7.2f} ms/request   {args.messages / queued_wall:7.1f} msg/s "
+          f"(delivered {handler.received}, connections opened {email_service._counters['connections_opened']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# CPU embedding backends (embeddings.EMBEDDING_BACKENDS) compared on the bundled
+# docs/*.pdf chunks and the rag_golden.json questions. Each backend runs in its
+# own process so its peak RSS is its own, and reports:
+#
+#   load       seconds to load the model and embed one text
+#   docs/s     embed_documents throughput over every chunk (best of --repeat)
+#   query      embed_query p50 latency over the golden questions
+#   rss        peak resident memory of the process
+#   cached     docs/s through CachedEmbeddings on a second pass (all hits)
+#
+# Recall@k is dense-only cosine search over that backend's own chunk vectors.
+# "mixed" queries the first backend's vectors with this backend's queries, which
+# is what happens if EMBEDDING_BACKEND is switched without rebuilding the index.
+# The ONNX backends need `pip install sentence-transformers[onnx]`; a backend
+# that fails to load is reported and skipped. Run from backend/:
+#
+#   python -m benchmarks.embedding_backends --backends torch,onnx,onnx-int8
+import argparse
+import glob
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+import embeddings
+import ingest
+import retrieval
+from benchmarks.rag_eval import GOLDEN_PATH, RECALL_KS, is_relevant
+
+
+def load_corpus() -> tuple[list, list]:
+    texts, metadatas = [], []
+    for path in sorted(glob.glob(os.path.join(ingest.DOCS_DIR, "*.pdf"))):
+        chunk_texts, chunk_metadatas = ingest.load_chunks(path, os.path.basename(path))
+        texts.extend(chunk_texts)
+        metadatas.extend(chunk_metadatas)
+    return texts, metadatas
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend: str, out_dir: str, repeat: int) -> dict:
+    # Child process: measure one backend and save its vectors for the recall step
+    texts, _ = load_corpus()
+    with open(GOLDEN_PATH) as f:
+        questions = [item["question"] for item in json.load(f)]
+
+    start = time.perf_counter()
+    model = embeddings.load_embeddings(retrieval.EMBEDDING_MODEL, backend)
+    model.embed_query("warm up")
+    load_s = time.perf_counter() - start
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        doc_vectors = model.embed_documents(texts)
+        best = min(best or float("inf"), time.perf_counter() - start)
+    query_ms, query_vectors = [], []
+    for question in questions:
+        start = time.perf_counter()
+        query_vectors.append(model.embed_query(question))
+        query_ms.append((time.perf_counter() - start) * 1000)
+    rss = peak_rss_mb()
+
+    cached = embeddings.CachedEmbeddings(model, embeddings.model_id(retrieval.EMBEDDING_MODEL, backend),
+                                         os.path.join(out_dir, f"cache-{backend}.db"))
+    cached.embed_documents(texts)
+    start = time.perf_counter()
+    cached.embed_documents(texts)
+    cached_s = time.perf_counter() - start
+
+    np.savez(os.path.join(out_dir, f"{backend}.npz"), docs=np.array(doc_vectors, dtype=np.float32),
+             queries=np.array(query_vectors, dtype=np.float32))
+    return {
+        "backend": backend,
+        "chunks": len(texts),
+        "load_s": round(load_s, 2),
+        "docs_per_s": round(len(texts) / best, 1),
+        "query_p50_ms": round(statistics.median(query_ms), 2),
+        "peak_rss_mb": round(rss, 1),
+        "cached_docs_per_s": round(len(texts) / cached_s, 1),
+    }
+
+
+def recall(doc_vectors: np.ndarray, query_vectors: np.ndarray, docs: list, golden: list) -> dict:
+    doc_vectors = doc_vectors / np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    query_vectors = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    ranks = []
+    for item, scores in zip(golden, query_vectors @ doc_vectors.T):
+        order = np.argsort(-scores)[:max(RECALL_KS)]
+        ranks.append(next((r for r, i in enumerate(order, start=1) if is_relevant(docs[i], item)), None))
+    return {f"recall@{k}": round(sum(1 for r in ranks if r and r <= k) / len(ranks), 3) for k in RECALL_KS}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="torch,onnx-int8",
+                        help=f"comma-separated, first is the baseline; any of {', '.join(embeddings.EMBEDDING_BACKENDS)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.out_dir, args.repeat)))
+        return
+
+    texts, metadatas = load_corpus()
+    docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+    with open(GOLDEN_PATH) as f:
+        golden = json.load(f)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for backend in args.backends.split(","):
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.embedding_backends", "--child", backend, "--out-dir", tmp,
+                 "--repeat", str(args.repeat)],
+                capture_output=True, text=True
+            )
+            if proc.returncode:
+                error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+                print(f"{backend}: failed to run ({error})", file=sys.stderr)
+                continue
+            row = json.loads(proc.stdout.strip().splitlines()[-1])
+            vectors = np.load(os.path.join(tmp, f"{backend}.npz"))
+            row.update(recall(vectors["docs"], vectors["queries"], docs, golden))
+            if baseline is None:
+                baseline = vectors
+            else:
+                row["mixed"] = recall(baseline["docs"], vectors["queries"], docs, golden)
+                # Mean cosine between this backend's chunk vectors and the baseline's
+                a, b = vectors["docs"], baseline["docs"]
+                row["cosine_to_baseline"] = round(float(np.mean(
+                    np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+                )), 4)
+            rows.append(row)
+
+    recall_keys = [f"recall@{k}" for k in RECALL_KS]
+    print(f"{'backend':<10} {'load s':>7} {'docs/s':>8} {'query ms':>9} {'rss MB':>7} {'cached/s':>9} "
+          + " ".join(f"{k:>9}" for k in recall_keys))
+    for row in rows:
+        print(f"{row['backend']:<10} {row['load_s']:>7.2f} {row['docs_per_s']:>8.1f} {row['query_p50_ms']:>9.2f} "
+              f"{row['peak_rss_mb']:>7.0f} {row['cached_docs_per_s']:>9.0f} "
+              + " ".join(f"{row[k]:>9.3f}" for k in recall_keys))
+        if "mixed" in row:
+            print(f"{'  mixed':<10} {'':>7} {'':>8} {'':>9} {'':>7} {'':>9} "
+                  + " ".join(f"{row['mixed'][k]:>9.3f}" for k in recall_keys)
+                  + f"   cosine to {rows[0]['backend']}: {row['cosine_to_baseline']:.4f}")
+    print(json.dumps(rows))
+
+
+if __name__ == "__main__":
+    main()
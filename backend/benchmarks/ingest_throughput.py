@@ -0,0 +1,62 @@
+# Ingestion throughput (pages/sec, chunks/sec) over the bundled docs/*.pdf for a
+# few batch sizes and extraction process counts, into a throwaway Chroma
+# directory. The bundled PDFs are short, so --pages-per-task defaults to 1 to
+# make the extraction pool actually fan out. Run from backend/:
+#
+#   python -m benchmarks.ingest_throughput --repeat 5
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import answer_cache
+import ingest
+import retrieval
+
+
+def run_once(paths: list, repeat: int) -> tuple[float, float, int, int]:
+    extract_start = time.perf_counter()
+    pages = sum(1 for _ in range(repeat) for path in paths for _ in ingest.iter_pages(path))
+    extract_secs = time.perf_counter() - extract_start
+
+    chunks = 0
+    start = time.perf_counter()
+    for i in range(repeat):
+        for path in paths:
+            counts = ingest.ingest_pdf(path, f"{i}-{os.path.basename(path)}")
+            chunks += counts["chunks_done"]
+    return extract_secs, time.perf_counter() - start, pages, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3, help="ingest every PDF this many times")
+    parser.add_argument("--batch-sizes", default="16,64,256")
+    parser.add_argument("--processes", default="1,4")
+    parser.add_argument("--pages-per-task", type=int, default=1)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob("docs/*.pdf"))
+    answer_cache.invalidate = lambda: None
+    ingest.PAGES_PER_TASK = args.pages_per_task
+
+    print(f"{'procs':>5} {'batch':>6} {'extract pages/s':>16} {'ingest pages/s':>15} {'chunks/s':>9}")
+    for processes in (int(p) for p in args.processes.split(",")):
+        ingest.INGEST_PROCESSES = processes
+        if ingest._pool:
+            ingest._pool.shutdown()
+        ingest._pool = None
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            ingest.INGEST_BATCH_SIZE = batch_size
+            with tempfile.TemporaryDirectory() as tmp:
+                # Embedding cache off: every run pays for the model, as a first upload does
+                retrieval._service = retrieval.RetrievalService(persist_directory=tmp, embedding_cache_path=None)
+                retrieval._service.warm()
+                extract_secs, secs, pages, chunks = run_once(paths, args.repeat)
+            print(f"{processes:>5} {batch_size:>6} {pages / extract_secs:>16.1f} "
+                  f"{pages / secs:>15.1f} {chunks / secs:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
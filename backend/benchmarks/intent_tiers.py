@@ -0,0 +1,67 @@
+# Measures how often each intent tier decides and how accurate it is on the
+# labelled fixtures. Run from backend/:
+#
+#   python -m benchmarks.intent_tiers          # rules + embedding only
+#   python -m benchmarks.intent_tiers --llm    # also send the leftovers to Ollama
+import argparse
+import json
+import os
+import time
+
+import intent
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "intent_fixtures.json")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="classify undecided messages with the LLM")
+    args = parser.parse_args()
+
+    with open(FIXTURES) as f:
+        fixtures = json.load(f)
+
+    tiers = [("rules", intent._rule_intent), ("embedding", intent._embedding_intent)]
+    if args.llm:
+        tiers.append(("llm", intent._llm_intent))
+
+    intent._embedding_intent("warm up")
+    results = {name: {"calls": 0, "decided": 0, "correct": 0, "seconds": 0.0} for name, _ in tiers}
+    undecided = 0
+    mistakes = []
+
+    for fx in fixtures:
+        for name, tier in tiers:
+            start = time.perf_counter()
+            label = tier(fx["message"])
+            results[name]["seconds"] += time.perf_counter() - start
+            results[name]["calls"] += 1
+            if label is not None:
+                results[name]["decided"] += 1
+                if label == fx["intent"]:
+                    results[name]["correct"] += 1
+                else:
+                    mistakes.append((name, fx["message"], fx["intent"], label))
+                break
+        else:
+            undecided += 1
+
+    total = len(fixtures)
+    print(f"{'tier':<10} {'decided':>8} {'share':>7} {'accuracy':>9} {'ms/call':>8}")
+    for name, r in results.items():
+        share = r["decided"] / total
+        accuracy = r["correct"] / r["decided"] if r["decided"] else 0.0
+        avg_ms = 1000 * r["seconds"] / r["calls"] if r["calls"] else 0.0
+        print(f"{name:<10} {r['decided']:>8} {share:>7.1%} {accuracy:>9.1%} {avg_ms:>8.2f}")
+    if undecided:
+        print(f"{'(to llm)':<10} {undecided:>8} {undecided / total:>7.1%}")
+
+    correct = sum(r["correct"] for r in results.values())
+    decided = sum(r["decided"] for r in results.values())
+    print(f"\noverall accuracy on decided messages: {correct / decided:.1%} ({decided}/{total} decided)")
+    for name, message, expected, got in mistakes:
+        print(f"  [{name}] {message!r}: expected {expected}, got {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Counts LLM calls and tokens per /chat request path, comparing the old
+# classify-then-extract sequence (extraction always run for a booking) with
+# classify_and_extract: one combined JSON-mode call for a booking-like message
+# the fast tiers can't decide and the parsers can't complete, the one-word
+# classifier for anything else. "partial" is a booking the
+# parsers can't complete. By default the LLM is a stub and latency is simulated
+# from token counts with the --*-ms constants; --ollama times the real model
+# (OLLAMA_MODEL) instead, best of --repeat. Run from backend/:
+#
+#   python -m benchmarks.llm_calls
+#   python -m benchmarks.llm_calls --ollama
+import argparse
+import json
+import re
+import time
+
+import intent
+import llm_clients
+
+SAMPLES = {
+    "question": "Can a dual degree student have a mentor from another department?",
+    "booking": "Could you get me the networks lab on 2025-03-21 at 3 PM for 2 hours?",
+    "partial": "Could you get me the networks lab sometime next week?",
+    "unclear": "banana",
+}
+
+CANNED_ENTITIES = {"resource": "networks lab", "date": "2025-03-21", "time": "03:00 PM", "duration": "2 hours"}
+
+
+def count_tokens(text: str) -> int:
+    # Rough llama-style count: words and punctuation marks are separate tokens
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class StubLLM:
+    def __init__(self, stats: dict, label: str):
+        self.stats = stats
+        self.label = label
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        intent = "booking" if self.label == "partial" else self.label
+        if "Reply with only one word" in prompt:
+            output = intent.upper()
+        elif "Classify this message" in prompt:
+            output = json.dumps(CANNED_ENTITIES if intent == "booking" else {"intent": intent})
+        else:
+            output = json.dumps(CANNED_ENTITIES)
+        self.stats["calls"] += 1
+        self.stats["prompt_tokens"] += count_tokens(prompt)
+        self.stats["output_tokens"] += count_tokens(output)
+        return output
+
+
+class CountingLLM:
+    # The real client, with calls and tokens counted the same way as the stub
+    def __init__(self, llm, stats: dict):
+        self.llm = llm
+        self.stats = stats
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        output = self.llm.invoke(prompt, **kwargs)
+        self.stats["calls"] += 1
+        self.stats["prompt_tokens"] += count_tokens(prompt)
+        self.stats["output_tokens"] += count_tokens(output)
+        return output
+
+
+def separate(message: str):
+    label = intent._llm_intent(message)
+    if label == "booking":
+        intent.extract_booking_entities(message)
+
+
+def current(message: str):
+    intent.classify_and_extract(message)
+
+
+def run(path_fn, label: str, message: str, real_llm=None) -> dict:
+    stats = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+    llm_clients._llm = CountingLLM(real_llm, stats) if real_llm else StubLLM(stats, label)
+    start = time.perf_counter()
+    path_fn(message)
+    stats["ms"] = (time.perf_counter() - start) * 1000
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--call-ms", type=float, default=300.0, help="simulated per-call overhead (queueing, HTTP, scheduling)")
+    parser.add_argument("--prompt-ms", type=float, default=2.0, help="simulated prompt eval cost per token")
+    parser.add_argument("--output-ms", type=float, default=60.0, help="simulated generation cost per token")
+    parser.add_argument("--fast-tiers", action="store_true", help="keep the rule/embedding tiers enabled")
+    parser.add_argument("--ollama", action="store_true", help="time the real model instead of simulating")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per path with --ollama; the fastest counts")
+    args = parser.parse_args()
+
+    if not args.fast_tiers:
+        intent._rule_intent = intent._embedding_intent = lambda message: None
+    real_llm = llm_clients.get_llm() if args.ollama else None
+    if real_llm:
+        # Load the model before anything is timed
+        real_llm.invoke("hi")
+
+    print(f"{'path':<9} {'mode':<9} {'calls':>5} {'prompt tok':>10} {'output tok':>10} "
+          f"{'ms' if real_llm else 'sim. ms':>8}")
+    for label, message in SAMPLES.items():
+        for mode, path_fn in (("separate", separate), ("current", current)):
+            if real_llm:
+                runs = [run(path_fn, label, message, real_llm) for _ in range(args.repeat)]
+                s = min(runs, key=lambda r: r["ms"])
+                ms = s["ms"]
+            else:
+                s = run(path_fn, label, message)
+                ms = s["calls"] * args.call_ms + s["prompt_tokens"] * args.prompt_ms + s["output_tokens"] * args.output_ms
+            print(f"{label:<9} {mode:<9} {s['calls']:>5} {s['prompt_tokens']:>10} {s['output_tokens']:>10} {ms:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# Retrieval quality and per-stage latency of the RAG path, over a golden Q&A set
+# (rag_golden.json) drawn from the bundled docs/*.pdf. The PDFs are chunked with
+# ingest's splitter into a throwaway Chroma directory, then for every question:
+#
+#   embed     retrieval.embed_query
+#   retrieve  RetrievalService.search at the production k (dense or hybrid)
+#   generate  rag.build_prompt + LLM (a deterministic stub unless --llm ollama),
+#             with time to first token and prompt tokens recorded separately
+#
+# A retrieved chunk is relevant when it comes from the expected file and page and
+# contains the question's evidence text, so the labels survive chunking changes.
+# Reports recall@k, MRR, whether rag's citation names an expected page and how many
+# of the cited pages are expected ones, as JSON on stdout (or --out). --context raw
+# builds the prompt the old way (every chunk joined whole) to measure the context
+# assembler against. --compare an earlier run's JSON to print deltas and exit
+# non-zero if a quality metric dropped by more than --tolerance. The embedding
+# cache is bypassed so embed latency is the model's (--embedding-backend picks
+# which one). Run from backend/:
+#
+#   python -m benchmarks.rag_eval --out baseline.json
+#   python -m benchmarks.rag_eval --chunk-size 800 --compare baseline.json > candidate.json
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import answer_cache
+import context
+import embeddings
+import ingest
+import llm_clients
+import rag
+import retrieval
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "rag_golden.json")
+RECALL_KS = (1, 3, 5, 10)
+QUALITY_METRICS = ["mrr", "citation_page_accuracy", "citation_precision"] + [f"recall@{k}" for k in RECALL_KS]
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().replace("’", "'").replace("‘", "'").split())
+
+
+def count_tokens(text: str) -> int:
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class StubLLM:
+    # Deterministic offline stand-in: answers with the first sentence of the
+    # context. --prompt-ms/--output-ms add simulated per-token cost, the prompt
+    # part before the first token as with Ollama's prompt evaluation.
+    def __init__(self, prompt_ms: float, output_ms: float):
+        self.prompt_ms = prompt_ms
+        self.output_ms = output_ms
+
+    def stream(self, prompt: str):
+        text = prompt.split("Context:\n", 1)[-1].split("\n\nQuestion:", 1)[0]
+        answer = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+        time.sleep(context.count_tokens(prompt) * self.prompt_ms / 1000)
+        for token in re.findall(r"\S+\s*", answer):
+            time.sleep(count_tokens(token) * self.output_ms / 1000)
+            yield token
+
+
+def raw_prompt(question: str, docs: list) -> tuple[str, str]:
+    # Prompt as built before the context assembler: all chunks whole, first one cited
+    text = "\n\n".join(d.page_content for d in docs)
+    return rag.PROMPT_TEMPLATE.format(context=text, question=question), \
+        f"{docs[0].metadata.get('source', 'Unknown')}, p.{docs[0].metadata.get('page', '?')}"
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def is_relevant(doc, item: dict) -> bool:
+    return (doc.metadata.get("source") == item["source"]
+            and doc.metadata.get("page") in item["pages"]
+            and normalize(item["evidence"]) in normalize(doc.page_content))
+
+
+def cited_pages(source: str) -> list:
+    # "file.pdf, p.3" -> [("file.pdf", 3)]
+    return [(name.strip(), int(page)) for name, page in re.findall(r"([^;]+?), p\.(\d+)", source)]
+
+
+def token_stats(counts: list) -> dict:
+    ordered = sorted(counts)
+    return {
+        "mean": round(statistics.mean(ordered), 1),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[int(0.95 * (len(ordered) - 1))],
+        "max": ordered[-1],
+    }
+
+
+def latency(samples: list) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "mean": round(statistics.mean(ms), 3),
+        "p50": round(statistics.median(ms), 3),
+        "p95": round(ms[int(0.95 * (len(ms) - 1))], 3),
+    }
+
+
+def build_index(service: retrieval.RetrievalService) -> dict:
+    start = time.perf_counter()
+    chunks = 0
+    for path in sorted(glob.glob(os.path.join(ingest.DOCS_DIR, "*.pdf"))):
+        filename = os.path.basename(path)
+        texts, metadatas = ingest.load_chunks(path, filename)
+        ids = [ingest.chunk_id(filename, m["page"], t) for t, m in zip(texts, metadatas)]
+        service.add_texts(texts, metadatas, ids=ids)
+        chunks += len(texts)
+    return {"chunks": chunks, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def evaluate(service: retrieval.RetrievalService, golden: list, llm, k: int, build_prompt) -> tuple[dict, dict, list]:
+    depth = max(max(RECALL_KS), k)
+    stages = {"embed": [], "retrieve": [], "ttft": [], "generate": [], "total": []}
+    results = []
+    for item in golden:
+        question = item["question"]
+        t0 = time.perf_counter()
+        vector = service.embed_query(question)
+        t1 = time.perf_counter()
+        docs = service.search(question, vector, k=k)
+        t2 = time.perf_counter()
+        prompt, source = build_prompt(question, docs)
+        parts = []
+        first = None
+        for token in llm.stream(prompt):
+            first = first or time.perf_counter()
+            parts.append(token)
+        answer = "".join(parts)
+        t3 = time.perf_counter()
+        first = first or t3
+        for stage, secs in (("embed", t1 - t0), ("retrieve", t2 - t1), ("ttft", first - t2), ("generate", t3 - t2),
+                            ("total", t3 - t0)):
+            stages[stage].append(secs)
+
+        # Ranking metrics look deeper than k, untimed
+        ranked = service.search(question, vector, k=depth)
+        rank = next((i + 1 for i, d in enumerate(ranked) if is_relevant(d, item)), None)
+        cited = cited_pages(source)
+        expected = [c for c in cited if c[0] == item["source"] and c[1] in item["pages"]]
+        results.append({
+            "question": question,
+            "expected": {"source": item["source"], "pages": item["pages"]},
+            "rank": rank,
+            "cited": source,
+            "citation_correct": bool(expected),
+            "citation_precision": len(expected) / len(cited) if cited else 0.0,
+            "prompt_tokens": context.count_tokens(prompt),
+            "answer": answer,
+            "timings_ms": {stage: round(samples[-1] * 1000, 3) for stage, samples in stages.items()},
+        })
+
+    n = len(results)
+    metrics = {f"recall@{r}": round(sum(1 for q in results if q["rank"] and q["rank"] <= r) / n, 4) for r in RECALL_KS}
+    metrics["mrr"] = round(sum(1 / q["rank"] for q in results if q["rank"]) / n, 4)
+    metrics["citation_page_accuracy"] = round(sum(q["citation_correct"] for q in results) / n, 4)
+    metrics["citation_precision"] = round(sum(q["citation_precision"] for q in results) / n, 4)
+    return metrics, {stage: latency(samples) for stage, samples in stages.items()}, results
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    print(f"vs {baseline.get('commit')} ({baseline.get('timestamp')}):", file=sys.stderr)
+    ok = True
+    for metric in QUALITY_METRICS:
+        old, new = baseline["metrics"].get(metric), report["metrics"][metric]
+        if old is None:
+            continue
+        regressed = new < old - tolerance
+        ok = ok and not regressed
+        print(f"  {metric:<24} {old:.4f} -> {new:.4f} ({new - old:+.4f}){'  REGRESSED' if regressed else ''}",
+              file=sys.stderr)
+    for stage, new in report["latency_ms"].items():
+        old = baseline["latency_ms"].get(stage)
+        if old:
+            print(f"  {stage + ' mean ms':<24} {old['mean']:.3f} -> {new['mean']:.3f} ({new['mean'] - old['mean']:+.3f})",
+                  file=sys.stderr)
+    old = baseline.get("prompt_tokens")
+    if old:
+        new = report["prompt_tokens"]
+        print(f"  {'prompt tokens mean':<24} {old['mean']:.1f} -> {new['mean']:.1f} ({new['mean'] - old['mean']:+.1f})",
+              file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--chunk-size", type=int, default=ingest.CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=ingest.CHUNK_OVERLAP)
+    parser.add_argument("--k", type=int, default=retrieval.RETRIEVAL_K)
+    parser.add_argument("--retriever", choices=["vector", "hybrid"],
+                        default="hybrid" if retrieval.HYBRID_RETRIEVAL else "vector")
+    parser.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=retrieval.RERANK_ENABLED)
+    parser.add_argument("--embedding-backend", choices=embeddings.EMBEDDING_BACKENDS, default=embeddings.EMBEDDING_BACKEND)
+    parser.add_argument("--context", choices=["assembled", "raw"], default="assembled")
+    parser.add_argument("--context-budget", type=int, default=context.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--llm", choices=["stub", "ollama"], default="stub")
+    parser.add_argument("--prompt-ms", type=float, default=0.0, help="stub: simulated prompt eval cost per token")
+    parser.add_argument("--output-ms", type=float, default=0.0, help="stub: simulated generation cost per token")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="JSON report of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--per-question", action="store_true", help="include per-question results in the report")
+    args = parser.parse_args()
+
+    with open(args.golden) as f:
+        golden = json.load(f)
+    ingest._splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    answer_cache.invalidate = lambda: None
+    llm = StubLLM(args.prompt_ms, args.output_ms) if args.llm == "stub" else llm_clients.get_llm()
+    context.CONTEXT_TOKEN_BUDGET = args.context_budget
+    build_prompt = raw_prompt if args.context == "raw" else rag.build_prompt
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = retrieval.RetrievalService(persist_directory=tmp, k=args.k,
+                                             hybrid=args.retriever == "hybrid", rerank=args.rerank,
+                                             embedding_backend=args.embedding_backend, embedding_cache_path=None)
+        retrieval._service = service
+        service.warm()
+        index = build_index(service)
+        metrics, latency_ms, results = evaluate(service, golden, llm, args.k, build_prompt)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        "config": {
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "k": args.k,
+            "retriever": args.retriever,
+            "rerank": args.rerank,
+            "context": args.context,
+            "context_budget": args.context_budget if args.context == "assembled" else None,
+            "tokenizer": context.CONTEXT_TOKENIZER if context._get_tokenizer() else "estimate",
+            "embedding_model": service.model_name,
+            "embedding_backend": args.embedding_backend,
+            "llm": args.llm,
+            "golden": os.path.basename(args.golden),
+            "questions": len(golden),
+        },
+        "index": index,
+        "metrics": metrics,
+        "latency_ms": latency_ms,
+        "prompt_tokens": token_stats([q["prompt_tokens"] for q in results]),
+        "retrieval_stages": service.stats()["stages"],
+        "misses": [q["question"] for q in results if not q["rank"]],
+    }
+    if args.per_question:
+        report["questions"] = results
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    summary = "  ".join(f"{m} {metrics[m]:.3f}" for m in QUALITY_METRICS)
+    print(f"{summary}  prompt tokens mean {report['prompt_tokens']['mean']:.0f}  "
+          f"ttft p50 {latency_ms['ttft']['p50']:.1f} ms  total p50 {latency_ms['total']['p50']:.1f} ms", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
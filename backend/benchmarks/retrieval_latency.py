@@ -0,0 +1,80 @@
+# Per-query retrieval latency with a Chroma handle built per call (the old
+# get_answer behaviour) versus the shared RetrievalService, for 50 sequential and
+# 50 concurrent questions over the bundled docs/*.pdf. Uses a throwaway Chroma
+# directory. Run from backend/:
+#
+#   python -m benchmarks.retrieval_latency
+import glob
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_chroma import Chroma
+
+from ingest import load_chunks
+from retrieval import RetrievalService
+
+QUESTIONS = [
+    "How are TAs allocated to courses?",
+    "What is the off-campus thesis policy?",
+    "Who emails the HOD with the thesis approval form?",
+    "How is the TA quota for a course calculated?",
+    "What happens when two FD students have identical CGPA?",
+    "How many preferences does a student give for TAship?",
+    "Can a faculty member from another department be the main thesis mentor?",
+    "What are the rules for dual degree students' thesis supervisors?",
+    "Is every student guaranteed a TAship?",
+    "What makes a good thesis?",
+]
+N = 50
+WORKERS = 8
+
+
+def build_corpus(service: RetrievalService):
+    for path in sorted(glob.glob("docs/*.pdf")):
+        chunks, metadatas = load_chunks(path, os.path.basename(path))
+        service.add_texts(chunks, metadatas)
+
+
+def per_call(service: RetrievalService, question: str) -> float:
+    start = time.perf_counter()
+    db = Chroma(persist_directory=service.persist_directory, embedding_function=service.embedding)
+    db.as_retriever(search_kwargs={"k": service.k}).invoke(question)
+    return time.perf_counter() - start
+
+
+def shared(service: RetrievalService, question: str) -> float:
+    start = time.perf_counter()
+    service.retrieve(question)
+    return time.perf_counter() - start
+
+
+def report(label: str, timings: list, wall: float):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(0.95 * (len(ms) - 1))]
+    print(f"{label:<24} mean {statistics.mean(ms):7.1f} ms  p50 {statistics.median(ms):7.1f} ms  "
+          f"p95 {p95:7.1f} ms  wall {wall:6.2f} s")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = RetrievalService(persist_directory=tmp, embedding_cache_path=None)
+        build_corpus(service)
+        service.warm()
+        questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(N)]
+
+        for label, fn in (("per-call Chroma", per_call), ("shared service", shared)):
+            start = time.perf_counter()
+            timings = [fn(service, q) for q in questions]
+            report(f"{label}, sequential", timings, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+                timings = list(pool.map(lambda q: fn(service, q), questions))
+            report(f"{label}, {WORKERS} threads", timings, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Server startup cost: wall time and peak RSS of `import main` in a fresh
+# interpreter, then of loading the models the way the background warm-up does
+# (main._warm_models). Two modes:
+#
+#   eager  the heavy libraries main used to pull in at import time (LangChain
+#          Ollama/Chroma/HuggingFace, the text splitter, the Google API client)
+#          are imported first
+#   lazy   plain `import main`; those libraries load on first use
+#
+# Each mode runs --runs times in its own process; medians are printed. With
+# --importtime the slowest top-level imports of `import main` are listed too.
+# Warm-up needs the embedding model in the local HF cache; set HF_HUB_OFFLINE=1
+# when there is no network, or pass --no-warm. Run from backend/:
+#
+#   python -m benchmarks.startup
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+EAGER_MODULES = [
+    "langchain_ollama",
+    "langchain_chroma",
+    "langchain_huggingface",
+    "langchain_text_splitters",
+    "google.oauth2.credentials",
+    "google_auth_oauthlib.flow",
+    "google.auth.transport.requests",
+    "googleapiclient.discovery",
+]
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+for name in json.loads(sys.argv[1]):
+    __import__(name)
+import main
+result = {"import_s": time.perf_counter() - start, "import_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+if sys.argv[2] == "warm":
+    start = time.perf_counter()
+    main._warm_models()
+    result.update(warm_s=time.perf_counter() - start, warm_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  warm_status=main._warmup["status"])
+print(json.dumps(result))
+"""
+
+
+def run_once(modules: list, warm: bool) -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD, json.dumps(modules), "warm" if warm else "cold"],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    # Modules imported directly by main (and not already loaded at interpreter
+    # start), by cumulative microseconds from -X importtime
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-warm", action="store_true", help="measure import only")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="list the N slowest imports")
+    args = parser.parse_args()
+
+    if not os.path.exists("main.py"):
+        sys.exit("run from backend/")
+    keys = ["import_s", "import_rss_mb"] + ([] if args.no_warm else ["warm_s", "warm_rss_mb"])
+    print(f"{'mode':<6} " + " ".join(f"{key:>14}" for key in keys))
+    for mode, modules in (("eager", EAGER_MODULES), ("lazy", [])):
+        runs = [run_once(modules, not args.no_warm) for _ in range(args.runs)]
+        medians = {key: statistics.median(run[key] for run in runs) for key in keys}
+        status = "" if args.no_warm else f"  ({runs[-1]['warm_status']})"
+        print(f"{mode:<6} " + " ".join(f"{medians[key]:>14.2f}" for key in keys) + status)
+
+    if args.importtime:
+        print("\nslowest imports of `import main` (cumulative):")
+        for us, name in slowest_imports(args.importtime):
+            print(f"  {us / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
-from fastapi import APIRouter
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import HTMLResponse, JSONResponse
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
 from database import (
-    create_booking, get_bookings_by_user, get_all_bookings,
-    get_booking_by_id, update_booking_status,
-    create_announcement, get_announcements
+    reserve_booking, find_bookings, SlotUnavailable,
+    get_booking_by_id, get_booking_by_idempotency_key, update_booking_status, update_booking_statuses,
+    create_announcement, create_announcements, find_announcements,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+)
+from email_service import send_admin_approval_email, send_user_notification, send_user_notifications
+from calendar_services import create_calendar_event, create_calendar_events
+from availability import (
+    check_availability, parse_duration_hours, parse_slot, resource_key,
+    booking_status_changed, add_calendar_event
 )
-from email_service import send_admin_approval_email, send_user_notification
-from calendar_services import check_availability, create_calendar_event
 
 router = APIRouter()
 
+# Most bookings or announcements accepted by one batch request
+MAX_BATCH_ITEMS = 500
+
 class BookingConfirm(BaseModel):
     user_id: str
     requester: str
@@ -24,55 +32,154 @@ class StatusUpdate(BaseModel):
     status: str
     remarks: Optional[str] = ""
 
+class BatchStatusUpdate(BaseModel):
+    booking_ids: list[str] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+    status: Literal["approved", "rejected"]
+    remarks: Optional[str] = ""
+
 class AnnouncementCreate(BaseModel):
     content: str
     posted_by: str = "Admin"
 
+class AnnouncementImport(BaseModel):
+    announcements: list[AnnouncementCreate] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+
+def _unavailable(req: BookingConfirm) -> dict:
+    return {
+        "status": "unavailable",
+        "message": f"{req.resource} is already booked on {req.date} at {req.time}. Please choose a different time."
+    }
+
 @router.post("/bookings/confirm")
-def confirm_booking(req: BookingConfirm):
-    # Check calendar availability first
-    duration_hours = int(req.duration.split()[0]) if req.duration else 2
-    is_available = check_availability(req.resource, req.date, req.time, duration_hours)
-    
-    if not is_available:
+def confirm_booking(req: BookingConfirm, idempotency_key: Optional[str] = Header(None)):
+    # A retried submission gets the booking it already created
+    if idempotency_key:
+        existing = get_booking_by_idempotency_key(idempotency_key)
+        if existing:
+            return {"booking_id": existing["id"], "status": existing["status"]}
+
+    # Calendar events and approved bookings, from the local availability index
+    duration_hours = parse_duration_hours(req.duration)
+    try:
+        is_available = check_availability(req.resource, req.date, req.time, duration_hours)
+    except ValueError:
         return {
-            "status": "unavailable",
-            "message": f"{req.resource} is already booked on {req.date} at {req.time}. Please choose a different time."
+            "status": "invalid",
+            "message": f"I couldn't understand the date/time \"{req.date} {req.time}\". Please use YYYY-MM-DD and HH:MM AM/PM."
         }
-
-    booking_id = create_booking(
-        req.user_id, req.requester,
-        req.resource, req.date, req.time, req.duration
-    )
-    send_admin_approval_email(
-        booking_id, req.requester,
-        req.resource, req.date, req.time, req.duration
-    )
-    return {"booking_id": booking_id, "status": "pending"}
+    
+    if not is_available:
+        return _unavailable(req)
+
+    # The authoritative check: claims the slot atomically against other pending holds
+    start, end = parse_slot(req.date, req.time, duration_hours)
+    try:
+        booking, created = reserve_booking(
+            req.user_id, req.requester, req.resource, req.date, req.time, req.duration,
+            resource_key(req.resource), start.isoformat(), end.isoformat(), idempotency_key
+        )
+    except SlotUnavailable:
+        return _unavailable(req)
+
+    if created:
+        send_admin_approval_email(
+            booking["id"], req.requester,
+            req.resource, req.date, req.time, req.duration
+        )
+    return {"booking_id": booking["id"], "status": booking["status"]}
+
+def _paged(response: Response, query, **params):
+    # Pages are plain lists; the cursor for the next page goes in X-Next-Cursor
+    try:
+        rows, next_cursor = query(**params)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 @router.get("/bookings")
-def list_bookings(user_id: str = None):
-    if user_id:
-        return get_bookings_by_user(user_id)
-    return get_all_bookings()
+def list_bookings(
+    response: Response,
+    user_id: str = None,
+    status: str = None,
+    resource: str = None,
+    requester: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    sort: Literal["created_at", "date"] = "created_at",
+    order: Literal["asc", "desc"] = "desc",
+    cursor: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    return _paged(
+        response, find_bookings,
+        user_id=user_id, status=status, resource=resource, requester=requester,
+        date_from=date_from, date_to=date_to, sort=sort, order=order, cursor=cursor, limit=limit
+    )
 
 @router.patch("/bookings/{booking_id}")
 def update_booking(booking_id: str, req: StatusUpdate):
-    update_booking_status(booking_id, req.status, req.remarks)
+    try:
+        update_booking_status(booking_id, req.status, req.remarks)
+    except SlotUnavailable as e:
+        return JSONResponse(status_code=409, content={"success": False, "detail": f"Slot is no longer free: {e}"})
+    booking = get_booking_by_id(booking_id)
+    if booking:
+        booking_status_changed(booking, req.status)
     return {"success": True}
 
+@router.post("/bookings/batch")
+def batch_update_bookings(req: BatchStatusUpdate):
+    # Approve or reject many bookings at once: one store transaction for the
+    # status changes, one Calendar batch request per 50 approvals, and the user
+    # notifications queued together for the email worker. Every booking gets
+    # its own result, so a taken slot or a calendar error fails only that item.
+    results = update_booking_statuses(list(dict.fromkeys(req.booking_ids)), req.status, req.remarks)
+    updated = [r for r in results if r["result"] == "updated"]
+    for r in updated:
+        booking_status_changed(r["booking"], req.status)
+
+    if req.status == "approved" and updated:
+        slots = [
+            (b["resource"], b["requester"], b["date"], b["time"], parse_duration_hours(b["duration"]))
+            for b in (r["booking"] for r in updated)
+        ]
+        for r, (resource, _, date, time, duration_hours), (event_id, error) in zip(
+                updated, slots, create_calendar_events(slots)):
+            if event_id:
+                add_calendar_event(event_id, resource, date, time, duration_hours)
+                r["calendar_event_id"] = event_id
+            else:
+                print(f"❌ Calendar error for booking {r['booking_id']}: {error}")
+                r["calendar_error"] = error
+
+    send_user_notifications([
+        (r["booking"]["user_id"], req.status, r["booking"]["resource"], r["booking"]["date"], req.remarks)
+        for r in updated
+    ])
+    return {
+        "updated": len(updated),
+        "failed": sum(r["result"] in ("not_found", "slot_unavailable") for r in results),
+        "results": [{k: v for k, v in r.items() if k != "booking"} for r in results],
+    }
+
 @router.get("/bookings/{booking_id}/action")
 def action_booking(booking_id: str, status: str):
     booking = get_booking_by_id(booking_id)
     if not booking:
         return HTMLResponse("<h2>Booking not found.</h2>")
 
-    update_booking_status(booking_id, status)
+    try:
+        update_booking_status(booking_id, status)
+    except SlotUnavailable:
+        return HTMLResponse("<h2>This slot has since been taken by another booking; it can no longer be approved.</h2>")
+    booking_status_changed(booking, status)
 
     # Create calendar event only on approval
     if status == "approved":
         try:
-            duration_hours = int(booking["duration"].split()[0]) if booking["duration"] else 2
+            duration_hours = parse_duration_hours(booking["duration"])
             event_id = create_calendar_event(
                 booking["resource"],
                 booking["requester"],
@@ -80,6 +187,7 @@ def action_booking(booking_id: str, status: str):
                 booking["time"],
                 duration_hours
             )
+            add_calendar_event(event_id, booking["resource"], booking["date"], booking["time"], duration_hours)
             print(f"✅ Calendar event created: {event_id}")
         except Exception as e:
             print(f"❌ Calendar error: {e}")
@@ -113,6 +221,17 @@ def post_announcement(req: AnnouncementCreate):
     ann_id = create_announcement(req.content, req.posted_by)
     return {"id": ann_id}
 
+@router.post("/announcements/bulk")
+def import_announcements(req: AnnouncementImport):
+    # All or nothing, in one transaction; ids come back in the order given
+    ids = create_announcements([(a.content, a.posted_by) for a in req.announcements])
+    return {"ids": ids}
+
 @router.get("/announcements")
-def list_announcements():
-    return get_announcements()
\ No newline at end of file
+def list_announcements(
+    response: Response,
+    since: str = None,
+    cursor: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    return _paged(response, find_announcements, since=since, cursor=cursor, limit=limit)
\ No newline at end of file
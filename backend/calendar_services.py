@@ -1,106 +1,187 @@
 import os
 import datetime
 import pickle
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+import threading
+from availability import parse_slot, BOOKING_SUMMARY_PREFIX
+from tracing import span
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
+TOKEN_PATH = "token.pickle"
+CREDENTIALS_PATH = "credentials.json"
+# Refresh the access token this long before it expires instead of on a 401
+TOKEN_REFRESH_MARGIN = datetime.timedelta(seconds=int(os.getenv("CALENDAR_TOKEN_REFRESH_MARGIN", "300")))
+# The Calendar API accepts at most 50 calls in one batch HTTP request
+CALENDAR_BATCH_SIZE = 50
 
-def get_calendar_service():
-    creds = None
-    if os.path.exists("token.pickle"):
-        with open("token.pickle", "rb") as token:
-            creds = pickle.load(token)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
+class CalendarClient:
+    # Long-lived Calendar API client: credentials are unpickled and the discovery
+    # client built once, on first use, and reused (with its HTTP connection) by
+    # every call. googleapiclient's transport isn't thread-safe, so requests are
+    # executed one at a time under a lock. The Google client libraries are
+    # imported on first use too; together they add ~0.7 s to startup.
+    def __init__(self, service_factory=None, token_path: str = TOKEN_PATH, credentials_path: str = CREDENTIALS_PATH):
+        # service_factory() -> service object, for tests/benchmarks against a fake backend
+        self._service_factory = service_factory
+        self._token_path = token_path
+        self._credentials_path = credentials_path
+        self._lock = threading.RLock()
+        self._creds = None
+        self._service = None
+
+    def _save_credentials(self):
+        with open(self._token_path, "wb") as token:
+            pickle.dump(self._creds, token)
+
+    def _load_credentials(self):
+        creds = None
+        if os.path.exists(self._token_path):
+            with open(self._token_path, "rb") as token:
+                creds = pickle.load(token)
+
+        if not creds or (not creds.valid and not creds.refresh_token):
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file(self._credentials_path, SCOPES)
             creds = flow.run_local_server(port=0)
-        with open("token.pickle", "wb") as token:
-            pickle.dump(creds, token)
-    
-    return build("calendar", "v3", credentials=creds)
+        self._creds = creds
+        self._refresh_if_needed(force=not creds.valid)
+        self._save_credentials()
+        return creds
 
-def check_availability(resource: str, date: str, time: str, duration_hours: int = 2) -> bool:
-    try:
-        service = get_calendar_service()
-        import pytz
-        IST = pytz.timezone("Asia/Kolkata")
-       
-        dt_str = f"{date} {time}"
-        try:
-            dt_start = datetime.datetime.strptime(dt_str, "%Y-%m-%d %I:%M %p")
-        except:
-            try:
-                dt_start = datetime.datetime.strptime(dt_str, "%Y-%m-%d %H:%M %p")
-            except:
-                dt_start = datetime.datetime.strptime(dt_str, "%Y-%m-%d %H:%M")
-       
-        dt_start = IST.localize(dt_start)
-        dt_end = dt_start + datetime.timedelta(hours=duration_hours)
-
-        # Get ALL events in that time window, not just resource-specific ones
-        events_result = service.events().list(
+    def _refresh_if_needed(self, force: bool = False):
+        creds = self._creds
+        if creds is None or not creds.refresh_token:
+            return
+        expiring = creds.expiry is not None and creds.expiry - datetime.datetime.utcnow() < TOKEN_REFRESH_MARGIN
+        if force or expiring:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+            self._save_credentials()
+
+    def authorize(self):
+        with self._lock:
+            self._load_credentials()
+
+    def service(self):
+        with self._lock:
+            if self._service is None:
+                if self._service_factory:
+                    self._service = self._service_factory()
+                else:
+                    from googleapiclient.discovery import build
+                    creds = self._load_credentials()
+                    self._service = build("calendar", "v3", credentials=creds, cache_discovery=False)
+            else:
+                # The service holds a reference to the same credentials object,
+                # so refreshing it in place is enough
+                self._refresh_if_needed()
+            return self._service
+
+    def execute(self, make_request):
+        # make_request(service) -> HttpRequest; executed while holding the lock
+        with span("calendar"), self._lock:
+            return make_request(self.service()).execute()
+
+    def reset(self):
+        with self._lock:
+            self._service = None
+            self._creds = None
+
+_client = CalendarClient()
+
+def get_calendar_client() -> CalendarClient:
+    return _client
+
+def set_calendar_client(client: CalendarClient):
+    global _client
+    _client = client
+
+def get_calendar_service():
+    return _client.service()
+
+def list_events(time_min: datetime.datetime, time_max: datetime.datetime):
+    # Every event on the primary calendar in the window, following pagination.
+    # Used by the availability index's background reconciliation.
+    page_token = None
+    while True:
+        events_result = _client.execute(lambda service: service.events().list(
             calendarId="primary",
-            timeMin=dt_start.isoformat(),
-            timeMax=dt_end.isoformat(),
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
             singleEvents=True,
-            orderBy="startTime"
-        ).execute()
-
-        events = events_result.get("items", [])
-       
-        # Check if any event mentions this resource
-        for event in events:
-            summary = event.get("summary", "").lower()
-            if resource.lower() in summary:
-                print(f"Conflict found: {summary}")
-                return False  # Not available
-       
-        return True  # Available
-       
-    except Exception as e:
-        print(f"Calendar check error: {e}")
-        return True  # Default to available if check fails
+            orderBy="startTime",
+            pageToken=page_token
+        ))
+        yield from events_result.get("items", [])
+        page_token = events_result.get("nextPageToken")
+        if not page_token:
+            return
 
-def create_calendar_event(resource: str, requester: str, date: str, time: str, duration_hours: int = 2) -> str:
-    try:
-        service = get_calendar_service()
-        
-        dt_str = f"{date} {time}"
-        try:
-            dt_start = datetime.datetime.strptime(dt_str, "%Y-%m-%d %I:%M %p")
-        except:
-            dt_start = datetime.datetime.strptime(dt_str, "%Y-%m-%d %H:%M")
-        
-        dt_end = dt_start + datetime.timedelta(hours=duration_hours)
-        
-        event = {
-            "summary": f"[CSIS Booking] {resource} - {requester}",
-            "description": f"Booked via CSIS SmartAssist by {requester}",
-            "start": {
-                "dateTime": dt_start.isoformat(),
-                "timeZone": "Asia/Kolkata"
-            },
-            "end": {
-                "dateTime": dt_end.isoformat(),
-                "timeZone": "Asia/Kolkata"
-            }
+def _event_body(resource: str, requester: str, date: str, time: str, duration_hours: float) -> dict:
+    dt_start, dt_end = parse_slot(date, time, duration_hours)
+    return {
+        "summary": f"{BOOKING_SUMMARY_PREFIX}{resource} - {requester}",
+        "description": f"Booked via CSIS SmartAssist by {requester}",
+        "start": {
+            "dateTime": dt_start.isoformat(),
+            "timeZone": "Asia/Kolkata"
+        },
+        "end": {
+            "dateTime": dt_end.isoformat(),
+            "timeZone": "Asia/Kolkata"
+        },
+        # Lets the availability sync map the event back to its resource
+        "extendedProperties": {
+            "private": {"csis_resource": resource}
         }
-        
-        created_event = service.events().insert(
+    }
+
+def create_calendar_event(resource: str, requester: str, date: str, time: str, duration_hours: float = 2) -> str:
+    try:
+        event = _event_body(resource, requester, date, time, duration_hours)
+
+        created_event = _client.execute(lambda service: service.events().insert(
             calendarId="primary",
             body=event
-        ).execute()
-        
+        ))
+
         return created_event.get("id", "")
     except Exception as e:
         print(f"Calendar event creation error: {e}")
         return ""
-    
+
+def _insert_batch(service, bodies: list, callback):
+    batch = service.new_batch_http_request(callback=callback)
+    for i, body in bodies:
+        batch.add(service.events().insert(calendarId="primary", body=body), request_id=str(i))
+    return batch
+
+def create_calendar_events(slots: list) -> list:
+    # create_calendar_event for many (resource, requester, date, time,
+    # duration_hours) slots, CALENDAR_BATCH_SIZE inserts per HTTP request.
+    # Returns one (event_id, error) pair per slot, in order; a failed insert
+    # doesn't affect the others.
+    results = [None] * len(slots)
+    bodies = []
+    for i, slot in enumerate(slots):
+        try:
+            bodies.append((i, _event_body(*slot)))
+        except ValueError as e:
+            results[i] = ("", str(e))
+
+    def collect(request_id, response, exception):
+        results[int(request_id)] = ("", str(exception)) if exception else (response.get("id", ""), None)
+
+    for start in range(0, len(bodies), CALENDAR_BATCH_SIZE):
+        chunk = bodies[start:start + CALENDAR_BATCH_SIZE]
+        try:
+            _client.execute(lambda service: _insert_batch(service, chunk, collect))
+        except Exception as e:
+            print(f"Calendar batch error: {e}")
+            for i, _ in chunk:
+                results[i] = results[i] or ("", str(e))
+    return results
+
+if __name__ == "__main__":
+    # One-time OAuth consent; writes token.pickle
+    get_calendar_client().authorize()
+    print(f"Authorized, token saved to {TOKEN_PATH}")
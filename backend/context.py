@@ -0,0 +1,126 @@
+from tokenizers import Tokenizer
+import threading
+import re
+import os
+
+# Builds the "Context:" block of the RAG prompt from the retrieved chunks.
+# Duplicate chunks are dropped, chunks from the same page are merged into one
+# block (chunks sharing the splitter's overlap are stitched back together), and the
+# result is trimmed to CONTEXT_TOKEN_BUDGET tokens, counted with the LLM's own
+# tokenizer, so prompt evaluation time in Ollama stays bounded.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))
+# tokenizer.json on the HF hub matching the Ollama model (llama3; an ungated
+# copy of Meta's 128k-vocabulary tokenizer); when it can't be loaded (offline),
+# tokens are estimated from words and punctuation instead
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "NousResearch/Meta-Llama-3-8B-Instruct")
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# A block cut by the budget is only kept if at least this many tokens of it fit
+MIN_BLOCK_TOKENS = 32
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+_tokenizer = None
+_tokenizer_failed = False
+_tokenizer_lock = threading.Lock()
+
+def _get_tokenizer() -> Tokenizer | None:
+    global _tokenizer, _tokenizer_failed
+    if _tokenizer is None and not _tokenizer_failed:
+        with _tokenizer_lock:
+            if _tokenizer is None and not _tokenizer_failed:
+                try:
+                    _tokenizer = Tokenizer.from_pretrained(CONTEXT_TOKENIZER)
+                except Exception as e:
+                    print(f"⚠️ Tokenizer {CONTEXT_TOKENIZER} unavailable ({e}); estimating context tokens")
+                    _tokenizer_failed = True
+    return _tokenizer
+
+def _token_spans(text: str) -> list:
+    # (start, end) character offsets of each token in text
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return [m.span() for m in _WORD_RE.finditer(text)]
+    return tokenizer.encode(text, add_special_tokens=False).offsets
+
+def count_tokens(text: str) -> int:
+    return len(_token_spans(text))
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+def _overlap(a: str, b: str) -> int:
+    # Length of the longest suffix of a that is also a prefix of b
+    if len(b) < MIN_OVERLAP_CHARS:
+        return 0
+    needle = b[:MIN_OVERLAP_CHARS]
+    start = a.find(needle, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(needle, start + 1)
+    return 0
+
+def _merge_page(texts: list) -> list:
+    # Drop chunks contained in another, then stitch overlapping pairs until none are left
+    pieces = []
+    for text in sorted(texts, key=len, reverse=True):
+        if not any(_normalize(text) in _normalize(p) for p in pieces):
+            pieces.append(text)
+    pieces.sort(key=texts.index)
+    merged = True
+    while merged:
+        merged = False
+        for i, a in enumerate(pieces):
+            for j, b in enumerate(pieces):
+                n = _overlap(a, b) if i != j else 0
+                if n:
+                    pieces[i] = a + b[n:]
+                    del pieces[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return pieces
+
+def _trim(text: str, max_tokens: int) -> str:
+    spans = _token_spans(text)
+    if len(spans) <= max_tokens:
+        return text
+    cut = text[:spans[max_tokens - 1][1]]
+    # Prefer ending on a full sentence when that keeps at least half of the cut
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut + " ")]
+    if ends and ends[-1] >= len(cut) // 2:
+        return cut[:ends[-1]]
+    return cut.rstrip() + " …"
+
+def assemble_context(docs: list, budget: int | None = None) -> tuple[str, list]:
+    # Returns the context text and the (source, page) of every block in it, most
+    # relevant first. Pages keep the rank of their best chunk.
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    pages = {}
+    seen = set()
+    for doc in docs:
+        text = doc.page_content.strip()
+        key = _normalize(text)
+        if not text or key in seen:
+            continue
+        seen.add(key)
+        page = (doc.metadata.get("source", "Unknown"), doc.metadata.get("page", "?"))
+        pages.setdefault(page, []).append(text)
+
+    blocks = []
+    cited = []
+    remaining = budget
+    for page, texts in pages.items():
+        body = _trim("\n".join(_merge_page(texts)), max(remaining, MIN_BLOCK_TOKENS))
+        blocks.append(body)
+        cited.append(page)
+        remaining -= count_tokens(body)
+        if remaining < MIN_BLOCK_TOKENS:
+            break
+    return "\n\n".join(blocks), cited
+
+def format_citation(cited: list) -> str:
+    # [("a.pdf", 1), ("a.pdf", 3), ("b.pdf", 2)] -> "a.pdf, p.1; a.pdf, p.3; b.pdf, p.2"
+    return "; ".join(f"{source}, p.{page}" for source, page in cited)
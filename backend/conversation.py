@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from intent import classify_and_extract, rule_intent, BOOKING_FIELDS
+from entity_parser import parse_booking_fields
+import threading
+import time
+import re
+import os
+
+# Per-user booking slot filling. When a booking request is missing fields, the
+# partial entities are kept here and the user's next message is first read by
+# the deterministic parsers, so "at 3 PM" or "2 hours" fills the gap without
+# another classification or extraction call. States live in memory, expire
+# after CONVERSATION_TTL_SECONDS of inactivity, and at most
+# CONVERSATION_MAX_USERS are kept (least recently active dropped first).
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", "900"))
+CONVERSATION_MAX_USERS = int(os.getenv("CONVERSATION_MAX_USERS", "1000"))
+# A reply this short with no recognisable field in it, when only the resource is
+# missing, is taken as the resource name ("D-204", "the old seminar room")
+RESOURCE_REPLY_MAX_WORDS = 5
+# "What is the deadline on 15 March?" asks something new even though it has a
+# date in it; "what about 4 PM?" and "can we do 4 PM?" still answer
+_NEW_QUESTION_RE = re.compile(r"^\s*(what|how|when|where|who|whom|why|which)\b(?!\s+about\b)", re.I)
+
+_lock = threading.Lock()
+_states = OrderedDict()
+_counters = {
+    "turns": 0,
+    "followups_parsed": 0,
+    "followups_classified": 0,
+    "bookings_completed": 0,
+    "booking_llm_calls": 0,
+    "expired": 0,
+    "evicted": 0,
+}
+
+def _get(user_id: str, now: float) -> dict | None:
+    state = _states.get(user_id)
+    if state is not None and state["expires_at"] <= now:
+        del _states[user_id]
+        _counters["expired"] += 1
+        return None
+    return state
+
+def _put(user_id: str, state: dict, now: float):
+    state["expires_at"] = now + CONVERSATION_TTL_SECONDS
+    _states[user_id] = state
+    _states.move_to_end(user_id)
+    # Ordered by last activity, so expired states and the overflow are at the front
+    while _states:
+        oldest = next(iter(_states.values()))
+        if oldest["expires_at"] > now and len(_states) <= CONVERSATION_MAX_USERS:
+            break
+        _states.popitem(last=False)
+        _counters["expired" if oldest["expires_at"] <= now else "evicted"] += 1
+
+def _followup(message: str, entities: dict) -> dict | None:
+    # Fields the message supplies for a pending booking, or None if it doesn't
+    # read as an answer to the clarification question
+    if _NEW_QUESTION_RE.match(message) or rule_intent(message) == "question":
+        return None
+    found = {field: value for field, value in parse_booking_fields(message).items() if value}
+    if "?" in message:
+        # "Is there a lab with projectors?" names no resource to book; "can we do 4 PM?" still answers
+        found.pop("resource", None)
+    if found:
+        return found
+    missing = [field for field in BOOKING_FIELDS if not entities.get(field)]
+    words = message.split()
+    if (missing == ["resource"] and 0 < len(words) <= RESOURCE_REPLY_MAX_WORDS
+            and "?" not in message and rule_intent(message) is None):
+        return {"resource": " ".join(words).strip(" .!")}
+    return None
+
+def handle_message(user_id: str, message: str) -> dict:
+    # classify_and_extract, with the user's unfinished booking (if any) carried
+    # over: a follow-up answer costs no LLM call, and a fresh booking message
+    # only fills the fields it mentions
+    now = time.monotonic()
+    with _lock:
+        _counters["turns"] += 1
+        pending = _get(user_id, now)
+        pending = dict(pending) if pending else None
+
+    found = _followup(message, pending["entities"]) if pending else None
+    if found:
+        analysis = {"intent": "booking", "entities": {**pending["entities"], **found}, "llm_calls": 0}
+    else:
+        analysis = classify_and_extract(message)
+        if pending and analysis["intent"] == "booking":
+            analysis["entities"] = {
+                field: analysis["entities"][field] or pending["entities"][field] for field in BOOKING_FIELDS
+            }
+
+    with _lock:
+        if pending:
+            _counters["followups_parsed" if found else "followups_classified"] += 1
+        if analysis["intent"] != "booking":
+            # A question in the middle of a booking leaves the booking pending
+            return analysis
+        llm_calls = (pending["llm_calls"] if pending else 0) + analysis["llm_calls"]
+        if None in analysis["entities"].values():
+            _put(user_id, {"entities": analysis["entities"], "llm_calls": llm_calls}, now)
+        else:
+            _states.pop(user_id, None)
+            _counters["bookings_completed"] += 1
+            _counters["booking_llm_calls"] += llm_calls
+    return analysis
+
+def get_conversation_stats() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        active = len(_states)
+    completed = counters["bookings_completed"]
+    return {
+        "active": active,
+        **counters,
+        "llm_calls_per_booking": round(counters["booking_llm_calls"] / completed, 3) if completed else 0.0,
+    }
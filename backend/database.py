@@ -1,96 +1,424 @@
-import chromadb
-from datetime import datetime
+from datetime import datetime, timedelta
+import threading
+import base64
+import json
+import sqlite3
 import uuid
+import os
+import events
 
-client = chromadb.PersistentClient(path="chroma_db")
-bookings_col = client.get_or_create_collection("bookings")
-announcements_col = client.get_or_create_collection("announcements")
+# Bookings and announcements live in SQLite (WAL). They used to be Chroma
+# collections, which embedded every row although nothing searched them;
+# migrate_from_chroma() copies an existing chroma_db over once.
+DATABASE_PATH = os.getenv("DATABASE_PATH", "smartassist.db")
+LEGACY_CHROMA_PATH = "chroma_db"
+
+# A pending booking holds its slot against other confirms until the admin acts
+# on it or this long has passed; approving after that re-checks the slot
+BOOKING_HOLD_MINUTES = int(os.getenv("BOOKING_HOLD_MINUTES", str(48 * 60)))
+
+BOOKING_COLUMNS = ("id", "user_id", "requester", "resource", "date", "time", "duration",
+                   "status", "remarks", "created_at", "updated_at",
+                   "resource_key", "start_at", "end_at", "hold_expires_at", "idempotency_key")
+# Added after the first SQLite release; ALTERed into existing databases
+SLOT_COLUMNS = ("resource_key", "start_at", "end_at", "hold_expires_at", "idempotency_key")
+ANNOUNCEMENT_COLUMNS = ("id", "content", "posted_by", "created_at")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+BOOKING_SORTS = ("created_at", "date")
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DATABASE_PATH, timeout=10, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS bookings (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        requester TEXT NOT NULL,
+        resource TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        duration TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        remarks TEXT NOT NULL DEFAULT '',
+        created_at TEXT NOT NULL,
+        updated_at TEXT,
+        resource_key TEXT,
+        start_at TEXT,
+        end_at TEXT,
+        hold_expires_at TEXT,
+        idempotency_key TEXT
+    )""")
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(bookings)")}
+    for column in SLOT_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE bookings ADD COLUMN {column} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS bookings_slot ON bookings (resource_key, start_at)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS bookings_idempotency ON bookings (idempotency_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS bookings_user ON bookings (user_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS bookings_status ON bookings (status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS bookings_resource_date ON bookings (resource, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS bookings_date ON bookings (date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS bookings_created ON bookings (created_at)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS announcements (
+        id TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        posted_by TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS announcements_created ON announcements (created_at)")
+    return conn
+
+_conn = _connect()
+_lock = threading.Lock()
+
+class SlotUnavailable(Exception):
+    def __init__(self, booking: dict):
+        super().__init__(f"{booking['resource']} is already held by booking {booking['id']}")
+        self.booking = booking
+
+def _rows(sql: str, params: tuple = ()) -> list:
+    with _lock:
+        return [dict(row) for row in _conn.execute(sql, params).fetchall()]
+
+def _encode_cursor(sort_value: str, row_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(sort_value), str(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _page(table: str, where: list, params: list, sort: str, order: str, cursor: str | None, limit: int) -> tuple[list, str | None]:
+    # Keyset pagination on (sort column, id): the cursor is the last row of the
+    # previous page, so each page is one index range scan however deep it is
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        where = where + [f"({sort}, id) {'<' if order == 'desc' else '>'} (?, ?)"]
+        params = params + list(_decode_cursor(cursor))
+    sql = f"SELECT * FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort} {order}, id {order} LIMIT ?"
+    rows = _rows(sql, tuple(params) + (limit + 1,))
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], _encode_cursor(last[sort], last["id"])
+
+def _publish_booking(booking: dict):
+    # Pushed to the booking's owner and to admins (GET /events)
+    events.publish({events.ADMIN_TOPIC, events.user_topic(booking["user_id"])}, {"type": "booking", "booking": booking})
 
 def create_booking(user_id: str, requester: str, resource: str, date: str, time: str, duration: str) -> str:
     booking_id = str(uuid.uuid4())
-    bookings_col.add(
-        documents=[f"{requester} wants to book {resource} on {date} at {time} for {duration}"],
-        metadatas=[{
-            "user_id": user_id,
-            "requester": requester,
-            "resource": resource,
-            "date": date,
-            "time": time,
-            "duration": duration,
-            "status": "pending",
-            "remarks": "",
-            "created_at": datetime.utcnow().isoformat()
-        }],
-        ids=[booking_id]
-    )
+    with _lock:
+        _conn.execute(
+            "INSERT INTO bookings (id, user_id, requester, resource, date, time, duration, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (booking_id, user_id, requester, resource, date, time, duration, datetime.utcnow().isoformat())
+        )
+    _publish_booking(get_booking_by_id(booking_id))
     return booking_id
 
 def get_bookings_by_user(user_id: str) -> list:
-    results = bookings_col.get(where={"user_id": user_id})
-    return _format(results)
+    return _rows("SELECT * FROM bookings WHERE user_id = ? ORDER BY created_at", (user_id,))
 
 def get_all_bookings() -> list:
-    results = bookings_col.get()
-    return _format(results)
+    return _rows("SELECT * FROM bookings ORDER BY created_at")
+
+def get_bookings_by_status(status: str) -> list:
+    return _rows("SELECT * FROM bookings WHERE status = ? ORDER BY created_at", (status,))
+
+def find_bookings(user_id: str | None = None, status: str | None = None, resource: str | None = None,
+                  requester: str | None = None, date_from: str | None = None, date_to: str | None = None,
+                  sort: str = "created_at", order: str = "desc", cursor: str | None = None,
+                  limit: int = DEFAULT_PAGE_SIZE) -> tuple[list, str | None]:
+    # One page of bookings and the cursor for the next (None on the last page).
+    # date_from/date_to are inclusive YYYY-MM-DD bounds on the booked date;
+    # requester matches case-insensitively anywhere in the name.
+    if sort not in BOOKING_SORTS:
+        raise ValueError(f"Invalid sort: {sort}")
+    where, params = [], []
+    for column, value in (("user_id", user_id), ("status", status), ("resource", resource)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if requester:
+        where.append("instr(lower(requester), lower(?)) > 0")
+        params.append(requester)
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+    return _page("bookings", where, params, sort, order, cursor, limit)
 
 def get_booking_by_id(booking_id: str) -> dict | None:
-    try:
-        result = bookings_col.get(ids=[booking_id])
-        if not result["ids"]:
-            return None
-        return {
-            "id": result["ids"][0],
-            **result["metadatas"][0]
-        }
-    except:
-        return None
+    rows = _rows("SELECT * FROM bookings WHERE id = ?", (booking_id,))
+    return rows[0] if rows else None
+
+def get_booking_by_idempotency_key(key: str) -> dict | None:
+    rows = _rows("SELECT * FROM bookings WHERE idempotency_key = ?", (key,))
+    return rows[0] if rows else None
+
+def _slot_conflict(resource_key: str, start_at: str, end_at: str, now: str, exclude_id: str | None = None) -> dict | None:
+    # Approved bookings, and pending ones whose hold hasn't lapsed, overlapping [start_at, end_at)
+    row = _conn.execute(
+        "SELECT * FROM bookings WHERE resource_key = ? AND start_at < ? AND end_at > ? AND id IS NOT ? "
+        "AND (status = 'approved' OR (status = 'pending' AND hold_expires_at > ?)) LIMIT 1",
+        (resource_key, end_at, start_at, exclude_id, now)
+    ).fetchone()
+    return dict(row) if row else None
+
+def reserve_booking(user_id: str, requester: str, resource: str, date: str, time: str, duration: str,
+                    resource_key: str, start_at: str, end_at: str,
+                    idempotency_key: str | None = None) -> tuple[dict, bool]:
+    # Check-and-insert in one write transaction, so of any number of concurrent
+    # confirms for overlapping slots (across processes too) exactly one gets the
+    # hold. Returns (booking, created); a repeated idempotency key, or the same
+    # user re-submitting the same slot, returns the existing booking with
+    # created=False. Raises SlotUnavailable if someone else holds the slot.
+    now = datetime.utcnow()
+    with _lock:
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            if idempotency_key:
+                row = _conn.execute("SELECT * FROM bookings WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+                if row:
+                    _conn.execute("COMMIT")
+                    return dict(row), False
+
+            conflict = _slot_conflict(resource_key, start_at, end_at, now.isoformat())
+            if conflict:
+                _conn.execute("COMMIT")
+                same = (conflict["user_id"], conflict["start_at"], conflict["end_at"]) == (user_id, start_at, end_at)
+                if same and conflict["status"] == "pending":
+                    return conflict, False
+                raise SlotUnavailable(conflict)
+
+            booking = {
+                "id": str(uuid.uuid4()), "user_id": user_id, "requester": requester, "resource": resource,
+                "date": date, "time": time, "duration": duration, "status": "pending", "remarks": "",
+                "created_at": now.isoformat(), "updated_at": None,
+                "resource_key": resource_key, "start_at": start_at, "end_at": end_at,
+                "hold_expires_at": (now + timedelta(minutes=BOOKING_HOLD_MINUTES)).isoformat(),
+                "idempotency_key": idempotency_key,
+            }
+            _conn.execute(
+                f"INSERT INTO bookings ({', '.join(BOOKING_COLUMNS)}) VALUES ({', '.join('?' * len(BOOKING_COLUMNS))})",
+                tuple(booking[c] for c in BOOKING_COLUMNS)
+            )
+            _conn.execute("COMMIT")
+            _publish_booking(booking)
+            return booking, True
+        except SlotUnavailable:
+            raise
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
 
 def update_booking_status(booking_id: str, status: str, remarks: str = ""):
-    existing = get_booking_by_id(booking_id)
-    if not existing:
-        return
-    # ChromaDB update requires re-adding with same id
-    bookings_col.update(
-        ids=[booking_id],
-        metadatas=[{
-            **{k: v for k, v in existing.items() if k != "id"},
-            "status": status,
-            "remarks": remarks,
-            "updated_at": datetime.utcnow().isoformat()
-        }]
-    )
-
-def _format(results: dict) -> list:
-    output = []
-    for i, booking_id in enumerate(results["ids"]):
-        output.append({
-            "id": booking_id,
-            **results["metadatas"][i]
-        })
-    return output
+    # Approving re-checks the slot in the same transaction: a booking whose hold
+    # lapsed may have lost it to a later confirm, in which case SlotUnavailable
+    # is raised and the booking is left as it was
+    now = datetime.utcnow().isoformat()
+    with _lock:
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            if status == "approved":
+                row = _conn.execute("SELECT * FROM bookings WHERE id = ?", (booking_id,)).fetchone()
+                if row and row["start_at"]:
+                    conflict = _slot_conflict(row["resource_key"], row["start_at"], row["end_at"], now, booking_id)
+                    if conflict:
+                        raise SlotUnavailable(conflict)
+            _conn.execute(
+                "UPDATE bookings SET status = ?, remarks = ?, updated_at = ? WHERE id = ?",
+                (status, remarks, now, booking_id)
+            )
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+    booking = get_booking_by_id(booking_id)
+    if booking:
+        _publish_booking(booking)
+
+def update_booking_statuses(booking_ids: list, status: str, remarks: str = "") -> list:
+    # update_booking_status for many bookings in one write transaction. Returns
+    # one result per id, in order: "updated" (with the updated "booking"),
+    # "unchanged" (already in that status), "not_found" or "slot_unavailable"
+    # (with "detail"). Approvals are checked as they are applied, so two pending
+    # bookings for the same slot can't both be approved by one batch.
+    now = datetime.utcnow().isoformat()
+    results = []
+    with _lock:
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ", ".join("?" * len(booking_ids))
+            rows = {row["id"]: dict(row) for row in _conn.execute(
+                f"SELECT * FROM bookings WHERE id IN ({placeholders})", tuple(booking_ids)
+            ).fetchall()}
+            for booking_id in booking_ids:
+                row = rows.get(booking_id)
+                if row is None:
+                    results.append({"booking_id": booking_id, "result": "not_found"})
+                    continue
+                if row["status"] == status:
+                    results.append({"booking_id": booking_id, "result": "unchanged", "booking": row})
+                    continue
+                if status == "approved" and row["start_at"]:
+                    conflict = _slot_conflict(row["resource_key"], row["start_at"], row["end_at"], now, booking_id)
+                    if conflict:
+                        results.append({"booking_id": booking_id, "result": "slot_unavailable",
+                                        "detail": str(SlotUnavailable(conflict))})
+                        continue
+                _conn.execute(
+                    "UPDATE bookings SET status = ?, remarks = ?, updated_at = ? WHERE id = ?",
+                    (status, remarks, now, booking_id)
+                )
+                row.update(status=status, remarks=remarks, updated_at=now)
+                results.append({"booking_id": booking_id, "result": "updated", "booking": row})
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+    for result in results:
+        if result["result"] == "updated":
+            _publish_booking(result["booking"])
+    return results
 
 # Announcements
 def create_announcement(content: str, posted_by: str = "Admin") -> str:
     ann_id = str(uuid.uuid4())
-    announcements_col.add(
-        documents=[content],
-        metadatas=[{
-            "content": content,
-            "posted_by": posted_by,
-            "created_at": datetime.utcnow().isoformat()
-        }],
-        ids=[ann_id]
-    )
+    created_at = datetime.utcnow().isoformat()
+    with _lock:
+        _conn.execute(
+            "INSERT INTO announcements (id, content, posted_by, created_at) VALUES (?, ?, ?, ?)",
+            (ann_id, content, posted_by, created_at)
+        )
+    events.publish({events.ANNOUNCEMENTS_TOPIC}, {"type": "announcement", "announcement": {
+        "id": ann_id, "content": content, "posted_by": posted_by, "created_at": created_at
+    }})
     return ann_id
 
+def create_announcements(items: list) -> list:
+    # Bulk import of (content, posted_by) pairs in one transaction; returns the
+    # ids in order. Timestamps step by a microsecond so the feed keeps the
+    # import order (the last item is the newest).
+    now = datetime.utcnow()
+    rows = [
+        (str(uuid.uuid4()), content, posted_by, (now + timedelta(microseconds=i)).isoformat())
+        for i, (content, posted_by) in enumerate(items)
+    ]
+    with _lock:
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            _conn.executemany(
+                "INSERT INTO announcements (id, content, posted_by, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+    for ann_id, content, posted_by, created_at in rows:
+        events.publish({events.ANNOUNCEMENTS_TOPIC}, {"type": "announcement", "announcement": {
+            "id": ann_id, "content": content, "posted_by": posted_by, "created_at": created_at
+        }})
+    return [row[0] for row in rows]
+
 def get_announcements() -> list:
-    results = announcements_col.get()
-    output = []
-    for i, ann_id in enumerate(results["ids"]):
-        output.append({
-            "id": ann_id,
-            **results["metadatas"][i]
-        })
-    # Sort by created_at descending
-    output.sort(key=lambda x: x["created_at"], reverse=True)
-    return output
\ No newline at end of file
+    return _rows("SELECT * FROM announcements ORDER BY created_at DESC")
+
+def find_announcements(since: str | None = None, cursor: str | None = None,
+                       limit: int = DEFAULT_PAGE_SIZE) -> tuple[list, str | None]:
+    # Newest first. since (a created_at from an earlier response) returns only
+    # announcements posted after it, so pollers fetch just what is new.
+    where, params = [], []
+    if since:
+        where.append("created_at > ?")
+        params.append(since)
+    return _page("announcements", where, params, "created_at", "desc", cursor, limit)
+
+# One-shot migration from the old Chroma collections
+def _chroma_rows(client, name: str, batch_size: int = 1000) -> list:
+    try:
+        collection = client.get_collection(name)
+    except Exception:
+        return []
+    rows = []
+    offset = 0
+    while True:
+        result = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        for row_id, metadata in zip(result["ids"], result["metadatas"]):
+            rows.append({"id": row_id, **(metadata or {})})
+        if len(result["ids"]) < batch_size:
+            return rows
+        offset += batch_size
+
+def migrate_from_chroma(path: str = LEGACY_CHROMA_PATH) -> dict:
+    # Copies bookings/announcements out of chroma_db the first time it runs;
+    # afterwards (or when there is no chroma_db) it does nothing. The Chroma
+    # collections are left in place.
+    with _lock:
+        done = _conn.execute("SELECT value FROM meta WHERE key = 'chroma_migrated'").fetchone()
+    if done or not os.path.exists(os.path.join(path, "chroma.sqlite3")):
+        return {"bookings": 0, "announcements": 0}
+
+    import chromadb
+    client = chromadb.PersistentClient(path=path)
+    bookings = _chroma_rows(client, "bookings")
+    announcements = _chroma_rows(client, "announcements")
+
+    with _lock:
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            _conn.executemany(
+                f"INSERT OR IGNORE INTO bookings ({', '.join(BOOKING_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(BOOKING_COLUMNS))})",
+                # Legacy rows carry no slot, so they hold nothing; approved ones
+                # still block through the availability index
+                [(
+                    b["id"], b.get("user_id", ""), b.get("requester", ""), b.get("resource", ""),
+                    b.get("date", ""), b.get("time", ""), b.get("duration", ""),
+                    b.get("status", "pending"), b.get("remarks", ""),
+                    b.get("created_at") or datetime.utcnow().isoformat(), b.get("updated_at")
+                ) + (None,) * len(SLOT_COLUMNS) for b in bookings]
+            )
+            _conn.executemany(
+                f"INSERT OR IGNORE INTO announcements ({', '.join(ANNOUNCEMENT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(ANNOUNCEMENT_COLUMNS))})",
+                [(
+                    a["id"], a.get("content", ""), a.get("posted_by", "Admin"),
+                    a.get("created_at") or datetime.utcnow().isoformat()
+                ) for a in announcements]
+            )
+            _conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('chroma_migrated', ?)",
+                (datetime.utcnow().isoformat(),)
+            )
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+
+    print(f"Migrated {len(bookings)} bookings and {len(announcements)} announcements from {path}")
+    return {"bookings": len(bookings), "announcements": len(announcements)}
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bookings/announcements store maintenance")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--chroma", default=LEGACY_CHROMA_PATH)
+    args = parser.parse_args()
+    print(migrate_from_chroma(args.chroma))
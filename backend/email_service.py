@@ -1,8 +1,14 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+import threading
+import sqlite3
+import time
+import uuid
 import os
 from dotenv import load_dotenv
+from tracing import span
 
 load_dotenv()
 
@@ -11,16 +17,253 @@ GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 ADMIN_EMAIL = os.getenv("GMAIL_USER")
 
-def send_email(to: str, subject: str, html: str):
+# Point these at a local SMTP stand-in (e.g. aiosmtpd, SMTP_SSL=0) for testing
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") == "1"
+
+# Outgoing mail is queued in SQLite and sent by a background worker that keeps
+# one authenticated SMTP connection open between batches
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.db")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS = 5
+EMAIL_RETRY_MAX_SECONDS = 15 * 60
+SMTP_IDLE_CLOSE_SECONDS = 60
+POLL_SECONDS = 5
+# A batch claimed by a worker that died is handed out again after this long
+CLAIM_TIMEOUT_SECONDS = 10 * 60
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(OUTBOX_PATH, timeout=10, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        html TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        claim TEXT,
+        claimed_at REAL,
+        last_error TEXT,
+        created_at TEXT NOT NULL,
+        sent_at TEXT
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+    return conn
+
+_db = _connect()
+_db_lock = threading.Lock()
+_wakeup = threading.Event()
+_stop = threading.Event()
+_worker = None
+_counters = {"sent": 0, "retried": 0, "failed": 0, "connections_opened": 0}
+
+def send_email(to: str, subject: str, html: str) -> int:
+    # Enqueue only; the worker delivers it. Returns the outbox message id.
+    with span("email.enqueue"), _db_lock:
+        cur = _db.execute(
+            "INSERT INTO outbox (recipient, subject, html, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (to, subject, html, time.time(), datetime.utcnow().isoformat())
+        )
+    _wakeup.set()
+    return cur.lastrowid
+
+def send_emails(messages: list) -> int:
+    # send_email for many (to, subject, html) messages, queued in one transaction
+    if not messages:
+        return 0
+    now = time.time()
+    created_at = datetime.utcnow().isoformat()
+    with span("email.enqueue"), _db_lock:
+        _db.execute("BEGIN IMMEDIATE")
+        try:
+            _db.executemany(
+                "INSERT INTO outbox (recipient, subject, html, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(to, subject, html, now, created_at) for to, subject, html in messages]
+            )
+            _db.execute("COMMIT")
+        except Exception:
+            _db.execute("ROLLBACK")
+            raise
+    _wakeup.set()
+    return len(messages)
+
+def _claim_batch() -> list:
+    claim = str(uuid.uuid4())
+    now = time.time()
+    with _db_lock:
+        _db.execute("BEGIN IMMEDIATE")
+        try:
+            _db.execute(
+                "UPDATE outbox SET status = 'queued', claim = NULL "
+                "WHERE status = 'sending' AND claimed_at < ?",
+                (now - CLAIM_TIMEOUT_SECONDS,)
+            )
+            _db.execute(
+                "UPDATE outbox SET status = 'sending', claim = ?, claimed_at = ? WHERE id IN ("
+                "SELECT id FROM outbox WHERE status = 'queued' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?)",
+                (claim, now, now, EMAIL_BATCH_SIZE)
+            )
+            _db.execute("COMMIT")
+        except Exception:
+            _db.execute("ROLLBACK")
+            raise
+        return _db.execute(
+            "SELECT id, recipient, subject, html, attempts FROM outbox WHERE claim = ? ORDER BY id", (claim,)
+        ).fetchall()
+
+def _mark_sent(message_id: int):
+    with _db_lock:
+        _db.execute(
+            "UPDATE outbox SET status = 'sent', claim = NULL, sent_at = ?, last_error = NULL WHERE id = ?",
+            (datetime.utcnow().isoformat(), message_id)
+        )
+    _counters["sent"] += 1
+
+def _mark_failed_attempt(message_id: int, attempts: int, error: str, permanent: bool = False):
+    attempts += 1
+    if permanent or attempts >= EMAIL_MAX_ATTEMPTS:
+        status, next_attempt = "failed", time.time()
+        _counters["failed"] += 1
+    else:
+        delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+        status, next_attempt = "queued", time.time() + delay
+        _counters["retried"] += 1
+    with _db_lock:
+        _db.execute(
+            "UPDATE outbox SET status = ?, claim = NULL, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (status, attempts, next_attempt, error, message_id)
+        )
+
+def _release(message_ids: list):
+    with _db_lock:
+        _db.executemany("UPDATE outbox SET status = 'queued', claim = NULL WHERE id = ?", [(i,) for i in message_ids])
+
+def _open_smtp() -> smtplib.SMTP:
+    server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30) if SMTP_SSL else smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if GMAIL_APP_PASSWORD:
+        server.login(GMAIL_USER, GMAIL_APP_PASSWORD)
+    _counters["connections_opened"] += 1
+    return server
+
+def _close_smtp(server):
+    try:
+        server.quit()
+    except Exception:
+        pass
+
+def _build_message(to: str, subject: str, html: str) -> str:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = GMAIL_USER
     msg["To"] = to
     msg.attach(MIMEText(html, "html"))
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(GMAIL_USER, GMAIL_APP_PASSWORD)
-        server.sendmail(GMAIL_USER, to, msg.as_string())
-    print(f"Email sent to {to}")
+    return msg.as_string()
+
+def _is_permanent(e: smtplib.SMTPException) -> bool:
+    # 5xx replies (unknown mailbox, rejected content) won't succeed on a retry
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+
+def _connection_lost(server, pending: list, error: Exception):
+    # The message being sent counts an attempt, the rest go back to the queue
+    # untouched, and the worker reconnects
+    print(f"SMTP connection lost: {error}")
+    message_id, attempts = pending[0][0], pending[0][4]
+    _release([m[0] for m in pending[1:]])
+    pending.clear()
+    _mark_failed_attempt(message_id, attempts, str(error))
+    _close_smtp(server)
+
+def _send_batch(server, pending: list):
+    # Messages leave the front of pending as soon as they are sent (and marked
+    # sent) or marked failed, so if this raises, pending is exactly what is still
+    # undelivered. Returns the connection to keep using, or None if it broke.
+    while pending:
+        message_id, to, subject, html, attempts = pending[0]
+        try:
+            with span("email.smtp"):
+                server.sendmail(GMAIL_USER, to, _build_message(to, subject, html))
+        except smtplib.SMTPServerDisconnected as e:
+            _connection_lost(server, pending, e)
+            return None
+        except smtplib.SMTPException as e:
+            # The server refused this message (e.g. an unknown recipient); the
+            # connection is still good for the rest of the batch
+            print(f"Email to {to} failed: {e}")
+            pending.pop(0)
+            _mark_failed_attempt(message_id, attempts, str(e), permanent=_is_permanent(e))
+            continue
+        except OSError as e:
+            # Socket-level failure (checked after SMTPException, which subclasses OSError)
+            _connection_lost(server, pending, e)
+            return None
+        pending.pop(0)
+        _mark_sent(message_id)
+        print(f"Email sent to {to}")
+    return server
+
+def _run_worker():
+    server, last_used = None, 0.0
+    while not _stop.is_set():
+        # Cleared before looking at the queue, so a message enqueued while this
+        # batch is being sent still wakes the next wait() immediately
+        _wakeup.clear()
+        try:
+            batch = _claim_batch()
+        except Exception as e:
+            print(f"Outbox error: {e}")
+            batch = []
+
+        if batch:
+            pending = list(batch)
+            try:
+                if server is None:
+                    server = _open_smtp()
+                server = _send_batch(server, pending)
+                last_used = time.time()
+            except Exception as e:
+                # Couldn't connect/log in, or the batch broke off part way: count an
+                # attempt against the messages not yet delivered, never the sent ones
+                print(f"SMTP error: {e}")
+                for message_id, _, _, _, attempts in pending:
+                    _mark_failed_attempt(message_id, attempts, str(e))
+                if server:
+                    _close_smtp(server)
+                server = None
+            continue
+
+        if server and time.time() - last_used > SMTP_IDLE_CLOSE_SECONDS:
+            _close_smtp(server)
+            server = None
+        _wakeup.wait(POLL_SECONDS)
+
+    if server:
+        _close_smtp(server)
+
+def start_worker():
+    global _worker
+    if _worker and _worker.is_alive():
+        return
+    _stop.clear()
+    _worker = threading.Thread(target=_run_worker, name="email-outbox", daemon=True)
+    _worker.start()
+
+def stop_worker(timeout: float = 10):
+    _stop.set()
+    _wakeup.set()
+    if _worker:
+        _worker.join(timeout)
+
+def get_outbox_stats() -> dict:
+    with _db_lock:
+        rows = _db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+    return {"by_status": dict(rows), **_counters}
 
 def send_admin_approval_email(booking_id: str, requester: str, resource: str, date: str, time: str, duration: str):
     approve_link = f"{BASE_URL}/bookings/{booking_id}/action?status=approved"
@@ -50,7 +293,7 @@ def send_admin_approval_email(booking_id: str, requester: str, resource: str, da
     """
     send_email(ADMIN_EMAIL, f"[CSIS] Booking Request: {resource} on {date}", html)
 
-def send_user_notification(to: str, status: str, resource: str, date: str, remarks: str = None):
+def _user_notification(to: str, status: str, resource: str, date: str, remarks: str = None) -> tuple:
     color = "#22c55e" if status == "approved" else "#ef4444"
     label = "Approved ✓" if status == "approved" else "Rejected ✗"
     html = f"""
@@ -67,4 +310,11 @@ def send_user_notification(to: str, status: str, resource: str, date: str, remar
         </div>
     </div>
     """
-    send_email(to, f"[CSIS] Booking {label}: {resource}", html)
\ No newline at end of file
+    return to, f"[CSIS] Booking {label}: {resource}", html
+
+def send_user_notification(to: str, status: str, resource: str, date: str, remarks: str = None):
+    send_email(*_user_notification(to, status, resource, date, remarks))
+
+def send_user_notifications(notifications: list) -> int:
+    # (to, status, resource, date, remarks) tuples, e.g. from a batch approval
+    return send_emails([_user_notification(*n) for n in notifications])
\ No newline at end of file
@@ -0,0 +1,133 @@
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import threading
+import hashlib
+import sqlite3
+import os
+
+# Which runtime computes MiniLM embeddings on the CPU:
+#   torch      sentence-transformers on PyTorch, fp32 (default)
+#   onnx       the same model exported to ONNX Runtime, fp32
+#   onnx-int8  ONNX Runtime with int8 dynamically quantized weights
+# The ONNX backends need `pip install sentence-transformers[onnx]`; their model
+# files are the exports published alongside the model on the Hugging Face hub.
+# Vectors differ slightly between backends, so rebuild the index after switching.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+# quint8_avx2 runs on any x86-64 CPU from the last decade; the hub also has
+# avx512 / avx512_vnni / arm64 variants
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+_ONNX_FILES = {"onnx": EMBEDDING_ONNX_FILE, "onnx-int8": EMBEDDING_ONNX_INT8_FILE}
+
+# Content-addressed cache of embedding vectors, shared by ingest and queries:
+# the key is a hash of the model/backend and the exact text, so a re-uploaded
+# chunk or a repeated question is never embedded twice. Vectors are float32
+# blobs in SQLite, read through a memory map. The oldest entries beyond
+# EMBEDDING_CACHE_MAX_ENTRIES are dropped; an empty EMBEDDING_CACHE_PATH turns
+# the cache off.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+EMBEDDING_CACHE_MMAP_BYTES = 256 * 1024 * 1024
+# SQLite's default limit on ? parameters is 999 in older builds
+_LOOKUP_CHUNK = 500
+
+def load_embeddings(model_name: str, backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    # Imported here: sentence-transformers (and torch) are most of the server's
+    # import time, and only needed once the model is first used
+    from langchain_huggingface import HuggingFaceEmbeddings
+    if backend == "torch":
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend in _ONNX_FILES:
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={
+            "backend": "onnx", "model_kwargs": {"file_name": _ONNX_FILES[backend]},
+        })
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+
+def model_id(model_name: str, backend: str = EMBEDDING_BACKEND) -> str:
+    # Prefix of every cache key, so vectors from different backends never mix
+    return ":".join([model_name, backend] + ([_ONNX_FILES[backend]] if backend in _ONNX_FILES else []))
+
+class CachedEmbeddings(Embeddings):
+    # Wraps a LangChain embeddings model. Texts already in the cache are served
+    # from it; the rest go to the model in one batch and are stored. Queries and
+    # documents share entries (MiniLM embeds both the same way).
+    def __init__(self, underlying: Embeddings, model: str, path: str = EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.underlying = underlying
+        self.model = model
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={EMBEDDING_CACHE_MMAP_BYTES}")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY,
+            vector BLOB NOT NULL
+        )""")
+        self._conn.commit()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list) -> dict:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, keys: list, vectors: list):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in zip(keys, vectors)]
+            )
+            # First in, first out: rowids only grow, so keep the newest max_entries
+            evicted = self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                (self.max_entries,)
+            ).rowcount
+            self._conn.commit()
+            self._counters["evictions"] += evicted
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            self._store(list(missing), vectors)
+            found.update(zip(missing, vectors))
+        with self._lock:
+            self._counters["hits"] += len(texts) - len(missing)
+            self._counters["misses"] += len(missing)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        key = self._key(text)
+        vector = self._lookup([key]).get(key)
+        with self._lock:
+            self._counters["hits" if vector is not None else "misses"] += 1
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self._store([key], [vector])
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "model": self.model,
+            **counters,
+            "entries": entries,
+            "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,183 @@
+from availability import IST
+import datetime
+import re
+
+# Deterministic parsers for booking fields, tried before the LLM. Output uses
+# the same formats the extraction prompt asks for (YYYY-MM-DD, "HH:MM AM/PM",
+# "X hours"), so the two sources are interchangeable. Anything ambiguous ("at 3",
+# "this evening") is left as None for the LLM or a clarification question.
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+_NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_SLASH_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b")
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DAY_MONTH_RE = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?(?:\s+of)?\s+{_MONTH}(?:,?\s+(\d{{4}}))?\b", re.I)
+_MONTH_DAY_RE = re.compile(rf"\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?\b", re.I)
+_RELATIVE_DATE_RE = re.compile(r"\b(day after tomorrow|today|tonight|tomorrow)\b", re.I)
+_WEEKDAY_RE = re.compile(r"\b(next\s+|this\s+|coming\s+)?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.I)
+
+_CLOCK = r"(\d{1,2})(?:[:.](\d{2}))?"
+_TIME_RANGE_RE = re.compile(rf"\b{_CLOCK}\s*(am|pm)?\s*(?:-|–|to|till|until)\s*{_CLOCK}\s*(am|pm)\b", re.I)
+_TIME_RE = re.compile(rf"\b{_CLOCK}\s*(am|pm|a\.m\.|p\.m\.)(?!\w)", re.I)
+_24H_RE = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+_NOON_RE = re.compile(r"\b(noon|midday)\b", re.I)
+
+_HOURS_RE = re.compile(r"\b(\d+(?:\.\d+)?|an?|one|two|three|four|five|six)\s*(?:hours?|hrs?|h)\b", re.I)
+_HALF_HOUR_RE = re.compile(r"\b(?:half an hour|half hour|30 min(?:ute)?s?)\b", re.I)
+_AND_A_HALF_RE = re.compile(r"\b(an?|one|two|three|four|five|\d+)\s+(?:hours?|hrs?)\s+and\s+a\s+half\b", re.I)
+_MINUTES_RE = re.compile(r"\b(\d+)\s*(?:minutes?|mins?)\b", re.I)
+
+_RESOURCE_RE = re.compile(
+    r"\b((?:[\w&-]+\s+){0,2}?(?:lab|room|hall|auditorium|classroom|projector)s?"
+    # A trailing number is the room's, unless it starts a time ("lab 3 pm", "lab 3-5",
+    # "lab 3 to 5") or a duration ("lab 2 hours")
+    r"(?:\s+(?:no\.?\s*)?[A-Z]?-?\d+[A-Z]?\b"
+    r"(?!\s*(?:am|pm|a\.m|p\.m|[:.]\d|[-–]\s*\d|(?:to|till|until)\s+\d|h\b|hrs?\b|hours?\b|mins?\b|minutes?\b)))?)",
+    re.I,
+)
+# Cut out before the resource is matched, so no part of a time or duration can be
+# read as a room number
+_TIME_AND_DURATION_RES = (_TIME_RANGE_RE, _TIME_RE, _24H_RE, _AND_A_HALF_RE, _HALF_HOUR_RE, _HOURS_RE, _MINUTES_RE)
+_RESOURCE_FILLERS = frozenset("""
+a an the this that my our me us i we to for in at on book booking reserve block need want get use
+please can could would like some any free is are there available
+""".split())
+
+def today() -> datetime.date:
+    return datetime.datetime.now(IST).date()
+
+def _valid_date(year: int, month: int, day: int) -> datetime.date | None:
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+def _upcoming(month: int, day: int, year: int | None, ref: datetime.date) -> datetime.date | None:
+    # A date without a year means its next occurrence
+    if year:
+        return _valid_date(year, month, day)
+    date = _valid_date(ref.year, month, day)
+    if date and date < ref:
+        date = _valid_date(ref.year + 1, month, day)
+    return date
+
+def parse_date(text: str, ref: datetime.date | None = None) -> tuple[str | None, tuple | None]:
+    # (YYYY-MM-DD, (start, end) of the match) or (None, None)
+    ref = ref or today()
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        date = _valid_date(*map(int, match.groups()))
+        if date:
+            return date.isoformat(), match.span()
+    match = _DAY_MONTH_RE.search(text)
+    if match:
+        day, month, year = match.groups()
+        date = _upcoming(MONTHS.index(month[:3].lower()) + 1, int(day), int(year) if year else None, ref)
+        if date:
+            return date.isoformat(), match.span()
+    match = _MONTH_DAY_RE.search(text)
+    if match:
+        month, day, year = match.groups()
+        date = _upcoming(MONTHS.index(month[:3].lower()) + 1, int(day), int(year) if year else None, ref)
+        if date:
+            return date.isoformat(), match.span()
+    match = _SLASH_DATE_RE.search(text)
+    if match:
+        # Day first, as written in India
+        day, month, year = match.groups()
+        year = int(year) + 2000 if year and len(year) == 2 else int(year) if year else None
+        date = _upcoming(int(month), int(day), year, ref)
+        if date:
+            return date.isoformat(), match.span()
+    match = _RELATIVE_DATE_RE.search(text)
+    if match:
+        offset = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[match.group(1).lower()]
+        return (ref + datetime.timedelta(days=offset)).isoformat(), match.span()
+    match = _WEEKDAY_RE.search(text)
+    if match:
+        ahead = (WEEKDAYS.index(match.group(2).lower()) - ref.weekday()) % 7
+        if match.group(1) and match.group(1).strip().lower() == "next" and ahead == 0:
+            ahead = 7
+        return (ref + datetime.timedelta(days=ahead)).isoformat(), match.span()
+    return None, None
+
+def _clock(hour: str, minute: str | None, meridiem: str) -> str | None:
+    hour, minute = int(hour), int(minute or 0)
+    if not 1 <= hour <= 12 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d} {meridiem.replace('.', '').upper()}"
+
+def _hours_of(clock: str) -> float:
+    # "03:30 PM" -> 15.5
+    return int(clock[:2]) % 12 + (12 if clock.endswith("PM") else 0) + int(clock[3:5]) / 60
+
+def parse_time(text: str) -> tuple[str | None, float | None]:
+    # ("HH:MM AM/PM", hours of an explicit range like "3-5 pm" or None)
+    match = _TIME_RANGE_RE.search(text)
+    if match:
+        h1, m1, mer1, h2, m2, mer2 = match.groups()
+        end = _clock(h2, m2, mer2)
+        # "3-5 pm" shares the end's meridiem, "11 to 1 pm" crosses noon
+        other = "am" if mer2.lower() == "pm" else "pm"
+        for meridiem in [mer1] if mer1 else [mer2, other]:
+            start = _clock(h1, m1, meridiem)
+            if start and end and _hours_of(end) > _hours_of(start):
+                return start, _hours_of(end) - _hours_of(start)
+        # A range that doesn't read forwards is left to the LLM
+        return None, None
+    match = _TIME_RE.search(text)
+    if match:
+        return _clock(*match.groups()), None
+    match = _24H_RE.search(text)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        return f"{hour % 12 or 12:02d}:{minute:02d} {'PM' if hour >= 12 else 'AM'}", None
+    if _NOON_RE.search(text):
+        return "12:00 PM", None
+    return None, None
+
+def format_duration(hours: float) -> str:
+    if hours < 1:
+        return f"{round(hours * 60)} minutes"
+    value = f"{hours:g}"
+    return f"{value} hour" if hours == 1 else f"{value} hours"
+
+def parse_duration(text: str) -> str | None:
+    match = _AND_A_HALF_RE.search(text)
+    if match:
+        value = match.group(1).lower()
+        return format_duration(float(_NUMBER_WORDS.get(value, value)) + 0.5)
+    if _HALF_HOUR_RE.search(text):
+        return format_duration(0.5)
+    match = _HOURS_RE.search(text)
+    if match:
+        value = match.group(1).lower()
+        return format_duration(float(_NUMBER_WORDS.get(value, value)))
+    match = _MINUTES_RE.search(text)
+    if match and int(match.group(1)) > 0:
+        return format_duration(int(match.group(1)) / 60)
+    return None
+
+def parse_resource(text: str) -> str | None:
+    # "Book the CS lab tomorrow" -> "CS lab"; "reserve lab 3" -> "lab 3"
+    match = _RESOURCE_RE.search(text)
+    if not match:
+        return None
+    words = match.group(1).split()
+    while len(words) > 1 and words[0].lower() in _RESOURCE_FILLERS:
+        words.pop(0)
+    return " ".join(words)
+
+def parse_booking_fields(text: str, ref: datetime.date | None = None) -> dict:
+    # Every field found in text; missing ones are None. The date is cut out first
+    # so "2025-03-10" or "10/3" can't be read as a time, then times and durations
+    # so "lab 3-5 pm" or "lab 2 hours" can't be read as a room number.
+    date, span = parse_date(text, ref)
+    rest = text[:span[0]] + " " + text[span[1]:] if span else text
+    time, range_hours = parse_time(rest)
+    duration = format_duration(range_hours) if range_hours else parse_duration(rest)
+    for pattern in _TIME_AND_DURATION_RES:
+        rest = pattern.sub(" ", rest)
+    return {"resource": parse_resource(rest), "date": date, "time": time, "duration": duration}
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+# In-process pub/sub behind GET /events. Publishers are plain sync code (the
+# store, running in worker threads); each subscriber is one SSE connection with
+# its own queue on the event loop. Events only reach clients connected to the
+# same process, so run a single uvicorn worker or put a broker behind this.
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+ANNOUNCEMENTS_TOPIC = "announcements"
+ADMIN_TOPIC = "admin"
+
+def user_topic(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def topics_for(user_id: str | None, role: str | None) -> set:
+    # Everyone gets announcements; users get their own bookings; admins get all bookings
+    topics = {ANNOUNCEMENTS_TOPIC}
+    if user_id:
+        topics.add(user_topic(user_id))
+    if role == "admin":
+        topics.add(ADMIN_TOPIC)
+    return topics
+
+class Subscription:
+    def __init__(self, topics: set, loop: asyncio.AbstractEventLoop):
+        self.topics = topics
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _deliver(self, event: dict):
+        # Runs on the subscriber's loop. A client too slow to keep up is told to
+        # resync (refetch) instead of the publisher blocking or memory growing.
+        try:
+            self.queue.put_nowait(event)
+            _counters["delivered"] += 1
+        except asyncio.QueueFull:
+            if not self.overflowed:
+                _counters["overflows"] += 1
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> dict | None:
+        # Next event, or None after `timeout` seconds without one
+        if self.overflowed:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.overflowed = False
+            return {"type": "resync"}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+_lock = threading.Lock()
+_subscriptions = set()
+_counters = {"published": 0, "delivered": 0, "overflows": 0}
+
+def subscribe(topics: set) -> Subscription:
+    # Call from the event loop that will consume the subscription
+    subscription = Subscription(topics, asyncio.get_running_loop())
+    with _lock:
+        _subscriptions.add(subscription)
+    return subscription
+
+def unsubscribe(subscription: Subscription):
+    with _lock:
+        _subscriptions.discard(subscription)
+
+def publish(topics: set, event: dict):
+    # Safe to call from any thread; never blocks on subscribers
+    with _lock:
+        targets = [s for s in _subscriptions if s.topics & topics]
+        _counters["published"] += 1
+    for subscription in targets:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+        except RuntimeError:
+            # Loop already closed (shutdown)
+            unsubscribe(subscription)
+
+def get_event_stats() -> dict:
+    with _lock:
+        return {"subscribers": len(_subscriptions), **_counters}
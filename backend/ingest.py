@@ -1,30 +1,309 @@
 from pypdf import PdfReader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from retrieval import get_retrieval_service
+from tracing import traced
+import answer_cache
+import multiprocessing
+import threading
+import hashlib
+import json
+import uuid
+import os
 
-CHROMA_PATH = "chroma_db"
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# Chunks are embedded and written to Chroma this many at a time, so memory stays
+# flat however large the PDF is. Page text is extracted by a pool of processes,
+# PAGES_PER_TASK pages per task, once a PDF has more than one task's worth of pages.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = 8
+MAX_TRACKED_JOBS = 100
+DOCS_DIR = "docs"
 
-def ingest_pdf(filepath: str, filename: str):
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+_splitter = None
+_pool = None
+_pool_lock = threading.Lock()
+# One upload is indexed at a time; the rest wait in this executor's queue
+_job_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _extract_pages(filepath: str, start: int, stop: int) -> list:
     reader = PdfReader(filepath)
-    pages = []
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text()
-        if text and text.strip():
-            pages.append({
-                "text": text,
-                "metadata": {"source": filename, "page": i + 1}
-            })
-    
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    return [(i + 1, reader.pages[i].extract_text()) for i in range(start, stop)]
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has threads and a loaded model
+            _pool = ProcessPoolExecutor(
+                max_workers=INGEST_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def iter_pages(filepath: str):
+    total = len(PdfReader(filepath).pages)
+    ranges = [(start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)]
+    if len(ranges) <= 1 or INGEST_PROCESSES <= 1:
+        results = (_extract_pages(filepath, start, stop) for start, stop in ranges)
+    else:
+        pool = _get_pool()
+        results = pool.map(_extract_pages, [filepath] * len(ranges), *zip(*ranges))
+    for pages in results:
+        for page_no, text in pages:
+            yield page_no, text, total
+
+def _get_splitter():
+    global _splitter
+    if _splitter is None:
+        # Imported on first use: langchain_text_splitters adds ~0.4 s to startup
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        _splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return _splitter
+
+def _page_chunks(filename: str, page_no: int, text: str | None):
+    if not text or not text.strip():
+        return
+    for split in _get_splitter().split_text(text):
+        yield split, {"source": filename, "page": page_no}
+
+def iter_chunks(filepath: str, filename: str):
+    for page_no, text, _ in iter_pages(filepath):
+        yield from _page_chunks(filename, page_no, text)
+
+def load_chunks(filepath: str, filename: str) -> tuple[list, list]:
     chunks = []
     metadatas = []
-    for p in pages:
-        splits = splitter.split_text(p["text"])
-        chunks.extend(splits)
-        metadatas.extend([p["metadata"]] * len(splits))
-    
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding)
-    db.add_texts(chunks, metadatas=metadatas)
-    print(f"Ingested {len(chunks)} chunks from {filename}")
\ No newline at end of file
+    for text, metadata in iter_chunks(filepath, filename):
+        chunks.append(text)
+        metadatas.append(metadata)
+    return chunks, metadatas
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def chunk_id(filename: str, page_no: int, text: str) -> str:
+    # Content-addressed: the same chunk on the same page always gets the same ID,
+    # so re-ingesting it is an upsert rather than a duplicate
+    return _sha256(f"{filename}\x00{page_no}\x00{text}".encode("utf-8"))
+
+def _manifest_dir() -> str:
+    # One JSON manifest per document (file hash, per-page text hash and chunk IDs),
+    # kept inside the Chroma directory so wiping the index wipes them too
+    return os.path.join(get_retrieval_service().persist_directory, "manifests")
+
+def _manifest_path(filename: str) -> str:
+    return os.path.join(_manifest_dir(), _sha256(filename.encode("utf-8"))[:16] + ".json")
+
+def load_manifest(filename: str) -> dict | None:
+    try:
+        with open(_manifest_path(filename)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_manifest(manifest: dict):
+    os.makedirs(_manifest_dir(), exist_ok=True)
+    path = _manifest_path(manifest["filename"])
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+def _all_manifests() -> list:
+    directory = _manifest_dir()
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                manifests.append(json.load(f))
+    return manifests
+
+@traced("ingest")
+def ingest_pdf(filepath: str, filename: str, progress=None) -> dict:
+    # Incremental: pages whose text hash matches the previous manifest keep their
+    # chunks untouched, changed pages are re-split and upserted, and chunks that no
+    # longer exist are deleted. progress, if given, gets the running counts.
+    retrieval = get_retrieval_service()
+    counts = {"pages_total": 0, "pages_done": 0, "pages_changed": 0, "chunks_done": 0, "chunks_removed": 0}
+    with open(filepath, "rb") as f:
+        file_hash = _sha256(f.read())
+
+    previous = load_manifest(filename) or {"pages": {}}
+    if previous.get("file_sha256") == file_hash:
+        counts["pages_total"] = counts["pages_done"] = len(previous["pages"])
+        if progress:
+            progress(dict(counts))
+        print(f"{filename} is unchanged, skipped")
+        return counts
+
+    pages = {}
+    batch_texts, batch_metas, batch_ids = [], [], []
+
+    def flush():
+        if batch_texts:
+            retrieval.add_texts(batch_texts, batch_metas, ids=batch_ids)
+            counts["chunks_done"] += len(batch_texts)
+            batch_texts.clear()
+            batch_metas.clear()
+            batch_ids.clear()
+        if progress:
+            progress(dict(counts))
+
+    for page_no, text, total in iter_pages(filepath):
+        counts["pages_total"] = total
+        counts["pages_done"] = page_no
+        page_hash = _sha256((text or "").encode("utf-8"))
+        old_page = previous["pages"].get(str(page_no))
+        if old_page and old_page["hash"] == page_hash:
+            pages[str(page_no)] = old_page
+            continue
+
+        counts["pages_changed"] += 1
+        # Chunks of a changed page that are still identical are already stored
+        unchanged = set(old_page["chunk_ids"]) if old_page else set()
+        ids = []
+        for chunk, metadata in _page_chunks(filename, page_no, text):
+            cid = chunk_id(filename, page_no, chunk)
+            if cid in ids:
+                continue
+            ids.append(cid)
+            if cid in unchanged:
+                continue
+            batch_texts.append(chunk)
+            batch_metas.append(metadata)
+            batch_ids.append(cid)
+            if len(batch_texts) >= INGEST_BATCH_SIZE:
+                flush()
+        pages[str(page_no)] = {"hash": page_hash, "chunk_ids": ids}
+    flush()
+
+    old_ids = {cid for page in previous["pages"].values() for cid in page["chunk_ids"]}
+    new_ids = {cid for page in pages.values() for cid in page["chunk_ids"]}
+    stale = sorted(old_ids - new_ids)
+    retrieval.delete(stale)
+    counts["chunks_removed"] = len(stale)
+
+    _save_manifest({
+        "filename": filename,
+        "file_sha256": file_hash,
+        "pages": pages,
+        "updated_at": datetime.utcnow().isoformat()
+    })
+    if counts["chunks_done"] or stale:
+        answer_cache.invalidate()
+    print(f"Ingested {filename}: {counts['pages_changed']}/{counts['pages_total']} pages changed, "
+          f"{counts['chunks_done']} chunks embedded, {len(stale)} removed")
+    return counts
+
+def remove_document(filename: str) -> int:
+    manifest = load_manifest(filename)
+    if not manifest:
+        return 0
+    ids = [cid for page in manifest["pages"].values() for cid in page["chunk_ids"]]
+    get_retrieval_service().delete(ids)
+    os.remove(_manifest_path(filename))
+    answer_cache.invalidate()
+    return len(ids)
+
+def reindex(docs_dir: str = DOCS_DIR) -> dict:
+    # Bring the collection in line with docs/: unchanged files are skipped, changed
+    # ones are upserted, and chunks of deleted files or with no manifest
+    # (e.g. indexed before chunk IDs were content hashes) are removed
+    summary = {"indexed": [], "skipped": [], "removed": [], "untracked_chunks_removed": 0}
+    present = set()
+    for name in sorted(os.listdir(docs_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        present.add(name)
+        counts = ingest_pdf(os.path.join(docs_dir, name), name)
+        changed = counts["chunks_done"] or counts["chunks_removed"] or counts["pages_changed"]
+        summary["indexed" if changed else "skipped"].append(name)
+
+    for manifest in _all_manifests():
+        if manifest["filename"] not in present:
+            remove_document(manifest["filename"])
+            summary["removed"].append(manifest["filename"])
+
+    retrieval = get_retrieval_service()
+    tracked = {cid for m in _all_manifests() for page in m["pages"].values() for cid in page["chunk_ids"]}
+    untracked = [cid for cid in retrieval.all_ids() if cid not in tracked]
+    retrieval.delete(untracked)
+    summary["untracked_chunks_removed"] = len(untracked)
+    if untracked:
+        answer_cache.invalidate()
+    return summary
+
+def _run_job(job_id: str, filepath: str, filename: str):
+    def progress(counts: dict):
+        with _jobs_lock:
+            _jobs[job_id].update(counts)
+
+    with _jobs_lock:
+        _jobs[job_id]["status"] = "running"
+        _jobs[job_id]["started_at"] = datetime.utcnow().isoformat()
+    try:
+        ingest_pdf(filepath, filename, progress=progress)
+        status, error = "indexed", None
+    except Exception as e:
+        print(f"Ingestion failed for {filename}: {e}")
+        status, error = "failed", str(e)
+    with _jobs_lock:
+        _jobs[job_id].update({
+            "status": status,
+            "error": error,
+            "finished_at": datetime.utcnow().isoformat()
+        })
+
+def start_ingest_job(filepath: str, filename: str) -> dict:
+    job_id = str(uuid.uuid4())
+    job = {
+        "job_id": job_id,
+        "filename": filename,
+        "status": "queued",
+        "pages_total": 0,
+        "pages_done": 0,
+        "chunks_done": 0,
+        "error": None,
+        "created_at": datetime.utcnow().isoformat(),
+        "started_at": None,
+        "finished_at": None
+    }
+    with _jobs_lock:
+        # Jobs run one at a time, so a job still queued for this file hasn't opened
+        # it yet and will index the upload that just replaced it; reuse that one
+        for queued in _jobs.values():
+            if queued["filename"] == filename and queued["status"] == "queued":
+                return dict(queued)
+        _jobs[job_id] = job
+        # Forget the oldest finished jobs once the table is full
+        finished = [j for j in _jobs.values() if j["status"] in ("indexed", "failed")]
+        for old in finished[:max(0, len(_jobs) - MAX_TRACKED_JOBS)]:
+            del _jobs[old["job_id"]]
+        snapshot = dict(job)
+    _job_runner.submit(_run_job, job_id, filepath, filename)
+    return snapshot
+
+def get_ingest_job(job_id: str) -> dict | None:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+def list_ingest_jobs() -> list:
+    with _jobs_lock:
+        return [dict(j) for j in _jobs.values()]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Knowledge base maintenance")
+    parser.add_argument("command", choices=["reindex"])
+    parser.add_argument("--docs", default=DOCS_DIR)
+    args = parser.parse_args()
+    print(json.dumps(reindex(args.docs), indent=2))
@@ -1,9 +1,131 @@
-from langchain_ollama import OllamaLLM
+from retrieval import get_retrieval_service
+from ollama_queue import ollama_slot
+from tracing import traced, record_intent_tier
+from llm_clients import generate
+from entity_parser import parse_booking_fields
+import numpy as np
+import threading
 import json
+import re
 
-llm = OllamaLLM(model="llama3")
+INTENTS = ("question", "booking", "unclear")
+BOOKING_FIELDS = ("resource", "date", "time", "duration")
 
-def classify_intent(message: str) -> str:
+# Tier 2 settles a message only if its best intent is similar enough to the
+# examples below AND clearly ahead of the runner-up; everything else goes to the LLM.
+EMBEDDING_THRESHOLD = 0.55
+EMBEDDING_MARGIN = 0.08
+
+INTENT_EXAMPLES = {
+    "booking": [
+        "Book the CS lab for tomorrow at 3 PM",
+        "I want to reserve a room for a meeting",
+        "Can I book the seminar hall on Friday for 2 hours?",
+        "Reserve lab 2 next Monday morning",
+        "Please block the conference room for our project review",
+        "I need a room for a group discussion this evening",
+        "Is the projector available to book on 2025-03-10?",
+    ],
+    "question": [
+        "How are TAs allocated to courses?",
+        "What is the policy for an off-campus thesis?",
+        "Who approves a thesis with an external supervisor?",
+        "When is the deadline for submitting the thesis proposal?",
+        "Explain the TA quota calculation",
+        "What are the rules for dual degree students?",
+        "How is the tie broken between students with the same CGPA?",
+    ],
+    "unclear": [
+        "hi",
+        "hello there",
+        "thanks!",
+        "asdfgh",
+        "what's up",
+        "good morning",
+        "ok cool",
+    ],
+}
+
+_GREETING_RE = re.compile(
+    r"^\W*(hi+|hello+|hey+|yo|sup|hola|thanks|thank you|thx|ok|okay|cool|bye|"
+    r"good (morning|afternoon|evening|night))\W*$",
+    re.I,
+)
+_BOOKING_VERB_RE = re.compile(r"\b(book|booking|reserve|reservation|block)\b", re.I)
+_RESOURCE_RE = re.compile(
+    r"\b(lab|labs|room|rooms|hall|auditorium|classroom|projector|equipment|"
+    r"seminar|conference|meeting room|slot)\b",
+    re.I,
+)
+_WHEN_RE = re.compile(
+    r"\b(\d{1,2}(:\d{2})?\s*(am|pm)|\d{1,2}:\d{2}|today|tomorrow|tonight|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|next week|"
+    r"\d{4}-\d{2}-\d{2}|\d+\s*(hours?|hrs?|minutes?|mins?))\b",
+    re.I,
+)
+_QUESTION_START_RE = re.compile(
+    r"^\s*(what|how|when|where|who|whom|why|which|is|are|can|could|do|does|"
+    r"should|will|tell me|explain)\b",
+    re.I,
+)
+# "How do I book the hall on Friday?" asks about booking even with a day in it;
+# "Can I book the hall on Friday?" is the request itself
+_WH_QUESTION_RE = re.compile(r"^\s*(what|how|when|where|who|whom|why|which)\b", re.I)
+_POLICY_RE = re.compile(
+    r"\b(policy|policies|thesis|ta|tas|taship|allocation|quota|deadline|procedure|"
+    r"rules?|eligib\w*|cgpa|hod|supervisor|mentor|fd|hd|phd|phdta|fdta|hdta|"
+    r"course|courses|appendix|approval)\b",
+    re.I,
+)
+
+_stats_lock = threading.Lock()
+_stats = {"rules": 0, "embedding": 0, "llm": 0}
+_example_vectors = None
+
+def _rule_intent(message: str) -> str | None:
+    if not re.search(r"[a-zA-Z]", message) or _GREETING_RE.match(message):
+        return "unclear"
+
+    booking_verb = _BOOKING_VERB_RE.search(message)
+    resource = _RESOURCE_RE.search(message)
+    when = _WHEN_RE.search(message)
+    question_form = _QUESTION_START_RE.match(message) or message.rstrip().endswith("?")
+
+    # "How do I book a lab?" asks about the procedure, so leave it to the later tiers
+    if booking_verb and resource and not _WH_QUESTION_RE.match(message) and (when or not question_form):
+        return "booking"
+    if question_form and _POLICY_RE.search(message) and not booking_verb:
+        return "question"
+    return None
+
+def rule_intent(message: str) -> str | None:
+    # The free tier alone, for callers that must not fall through to a model
+    return _rule_intent(message)
+
+@traced("intent.embedding")
+def _embedding_intent(message: str) -> str | None:
+    global _example_vectors
+    embedding = get_retrieval_service().embedding
+    if _example_vectors is None:
+        _example_vectors = {
+            label: np.array(embedding.embed_documents(examples))
+            for label, examples in INTENT_EXAMPLES.items()
+        }
+
+    query = np.array(embedding.embed_query(message))
+    scores = {}
+    for label, vectors in _example_vectors.items():
+        sims = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        scores[label] = float(sims.max())
+
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score >= EMBEDDING_THRESHOLD and best_score - runner_up >= EMBEDDING_MARGIN:
+        return best
+    return None
+
+@traced("intent.llm")
+def _llm_intent(message: str) -> str:
     prompt = f"""Classify this message as exactly one of: QUESTION, BOOKING, or UNCLEAR.
 
 QUESTION = asking for information, policies, procedures, deadlines, how something works
@@ -13,14 +135,69 @@ UNCLEAR = greetings, random text, gibberish, anything that doesn't fit the above
 Message: "{message}"
 
 Reply with only one word — QUESTION, BOOKING, or UNCLEAR:"""
-    
-    result = llm.invoke(prompt).strip().upper()
+
+    with ollama_slot():
+        result = generate(prompt, "intent").strip().upper()
     if "BOOKING" in result:
         return "booking"
     if "QUESTION" in result:
         return "question"
     return "unclear"
 
+def _fast_intent(message: str) -> tuple[str | None, str]:
+    intent = _rule_intent(message)
+    if intent is not None:
+        return intent, "rules"
+    intent = _embedding_intent(message)
+    if intent is not None:
+        return intent, "embedding"
+    return None, "llm"
+
+def _record_tier(tier: str):
+    with _stats_lock:
+        _stats[tier] += 1
+    record_intent_tier(tier)
+
+def classify_intent_tiered(message: str) -> tuple[str, str]:
+    # Cheap tiers first; the LLM only sees messages neither of them is confident about
+    intent, tier = _fast_intent(message)
+    if intent is None:
+        intent = _llm_intent(message)
+    _record_tier(tier)
+    return intent, tier
+
+def classify_intent(message: str) -> str:
+    return classify_intent_tiered(message)[0]
+
+def get_intent_stats() -> dict:
+    with _stats_lock:
+        counts = dict(_stats)
+    total = sum(counts.values())
+    return {
+        "total": total,
+        "decided_by": counts,
+        "llm_fallback_rate": round(counts["llm"] / total, 3) if total else 0.0,
+    }
+
+def _booking_fields(data: dict) -> dict:
+    return {field: data.get(field) or None for field in BOOKING_FIELDS}
+
+def merge_entities(llm_entities: dict, parsed: dict) -> dict:
+    # Parsed dates, times and durations win: the LLM doesn't know today's date and
+    # reformats times loosely. The LLM's resource name wins over the regex guess.
+    merged = {field: parsed.get(field) or llm_entities.get(field) for field in BOOKING_FIELDS}
+    merged["resource"] = llm_entities.get("resource") or parsed.get("resource")
+    return merged
+
+def _json_object(result: str) -> dict | None:
+    # Ollama's JSON mode can still return truncated or non-object output
+    try:
+        data = json.loads(result)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+@traced("intent.extract")
 def extract_booking_entities(message: str) -> dict:
     prompt = f"""Extract booking details from this message and return ONLY a JSON object.
 If any field is missing or unclear, use null.
@@ -33,19 +210,80 @@ Return exactly this JSON format:
     "date": "YYYY-MM-DD format or null",
     "time": "HH:MM AM/PM format or null",
     "duration": "X hours or null"
-}}
+}}"""
 
-Return ONLY the JSON, no other text:"""
+    with ollama_slot():
+        result = generate(prompt, "intent", json_output=True)
+    data = _json_object(result)
+    if data is None:
+        print(f"⚠️ Unparseable extraction output: {result[:200]!r}")
+        return dict.fromkeys(BOOKING_FIELDS)
+    return _booking_fields(data)
 
-    result = llm.invoke(prompt).strip()
-    
-    try:
-        result = result.replace("```json", "").replace("```", "").strip()
-        return json.loads(result)
-    except:
-        return {
-            "resource": None,
-            "date": None,
-            "time": None,
-            "duration": None
-        }
\ No newline at end of file
+@traced("intent.llm")
+def _llm_intent_and_entities(message: str) -> tuple[str, dict]:
+    prompt = f"""Classify this message and extract any booking details. Return ONLY a JSON object.
+
+"question" = asking for information, policies, procedures, deadlines, how something works
+"booking" = requesting to book or reserve a room, lab, resource, or equipment
+"unclear" = greetings, random text, gibberish, anything that doesn't fit the above two
+
+Message: "{message}"
+
+For a question or an unclear message return only {{"intent": "question"}} or {{"intent": "unclear"}}.
+For a booking return exactly this JSON format, using null for any missing or unclear field:
+{{
+    "resource": "room or lab name or null",
+    "date": "YYYY-MM-DD format or null",
+    "time": "HH:MM AM/PM format or null",
+    "duration": "X hours or null"
+}}"""
+
+    with ollama_slot():
+        result = generate(prompt, "intent", json_output=True)
+    data = _json_object(result)
+    if data is None:
+        print(f"⚠️ Unparseable intent output: {result[:200]!r}")
+        return "unclear", dict.fromkeys(BOOKING_FIELDS)
+    # A booking is answered with just its fields, which keeps the generated
+    # output as short as the plain extraction call's
+    intent = str(data.get("intent") or "").strip().lower()
+    if intent not in INTENTS:
+        intent = "booking" if any(field in data for field in BOOKING_FIELDS) else "unclear"
+    return intent, _booking_fields(data)
+
+def _needs_combined_call(message: str, parsed: dict) -> bool:
+    # The combined JSON call pays off for a message that looks like a booking (a
+    # booking verb, a bookable resource, or a date/time/duration) whose fields the
+    # parsers can't complete. Anything else is most likely a question or small
+    # talk, or needs no extraction, so the one-word classifier's shorter prompt
+    # and output are enough.
+    looks_like_booking = _BOOKING_VERB_RE.search(message) or _RESOURCE_RE.search(message) or any(parsed.values())
+    return bool(looks_like_booking) and None in parsed.values()
+
+@traced("intent")
+def classify_and_extract(message: str) -> dict:
+    # At most one LLM call per message. Cheap tiers first; a message they can't
+    # decide that looks like an incomplete booking gets its intent and fields from
+    # one JSON-mode call, anything else the one-word classifier. The separate JSON
+    # extraction only runs for a fast-tier booking the parsers can't complete.
+    intent, tier = _fast_intent(message)
+    parsed = parse_booking_fields(message)
+    llm_calls = 0
+    entities = None
+    if intent is None:
+        llm_calls = 1
+        if _needs_combined_call(message, parsed):
+            intent, entities = _llm_intent_and_entities(message)
+            entities = merge_entities(entities, parsed)
+        else:
+            intent = _llm_intent(message)
+    if intent == "booking" and entities is None:
+        entities = parsed
+        if None in entities.values():
+            entities = merge_entities(extract_booking_entities(message), entities)
+            llm_calls += 1
+    _record_tier(tier)
+    if intent != "booking":
+        entities = None
+    return {"intent": intent, "entities": entities, "llm_calls": llm_calls}
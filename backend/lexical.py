@@ -0,0 +1,83 @@
+from langchain_core.documents import Document
+from collections import Counter
+import threading
+import math
+import re
+
+# In-memory BM25 over the same chunks as the Chroma collection. Exact policy
+# terms ("FD", "HD", course codes, form names) that MiniLM smooths over still
+# match here. Kept in sync by RetrievalService.add_texts/delete and rebuilt from
+# Chroma on startup, so it needs no storage of its own.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in is it its of on or
+should that the their there this to was what when where which who why will with
+""".split())
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+class BM25Index:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._docs = {}
+        self._lengths = {}
+        self._total_length = 0
+
+    def add(self, ids: list, texts: list, metadatas: list):
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                self._remove(doc_id)
+                terms = Counter(tokenize(text))
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                length = sum(terms.values())
+                self._lengths[doc_id] = length
+                self._total_length += length
+                self._docs[doc_id] = (text, metadata, tuple(terms))
+
+    def _remove(self, doc_id: str):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for term in entry[2]:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def remove(self, ids: list):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def search(self, query: str, k: int) -> list:
+        # [Document] by descending BM25 score; documents sharing no term are left out
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [Document(id=doc_id, page_content=self._docs[doc_id][0], metadata=self._docs[doc_id][1])
+                    for doc_id, _ in best]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._docs)
@@ -0,0 +1,37 @@
+from tracing import LLMMetrics
+import threading
+import os
+
+# One Ollama client per process, shared by intent classification, entity
+# extraction and RAG generation; JSON output is a per-call option rather than a
+# second client. Built on first use, since importing langchain_ollama alone
+# takes about a second of startup.
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+
+_llm = None
+_lock = threading.Lock()
+_callbacks = {}
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                from langchain_ollama import OllamaLLM
+                _llm = OllamaLLM(model=OLLAMA_MODEL)
+    return _llm
+
+def _config(caller: str) -> dict:
+    # Token counts in /metrics are labelled by caller ("intent", "rag")
+    if caller not in _callbacks:
+        _callbacks[caller] = LLMMetrics(caller)
+    return {"callbacks": [_callbacks[caller]]}
+
+def generate(prompt: str, caller: str, json_output: bool = False) -> str:
+    if json_output:
+        # Constrained to emit valid JSON, so structured prompts can be parsed directly
+        return get_llm().invoke(prompt, config=_config(caller), format="json")
+    return get_llm().invoke(prompt, config=_config(caller))
+
+def stream(prompt: str, caller: str):
+    return get_llm().stream(prompt, config=_config(caller))
@@ -1,13 +1,56 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Request
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from bookings import router as bookings_router
-import shutil, os
-from rag import get_answer
-from intent import classify_intent, extract_booking_entities
-from ingest import ingest_pdf
+import shutil, os, json, threading, time, tempfile
+from rag import get_answer, stream_answer
+from intent import get_intent_stats
+from conversation import handle_message, get_conversation_stats
+from ingest import start_ingest_job, get_ingest_job, list_ingest_jobs
+from answer_cache import get_cache_stats
+from retrieval import get_retrieval_service, get_retrieval_stats
+from context import count_tokens
+from llm_clients import get_llm
+from database import migrate_from_chroma
+from availability import start_sync, stop_sync, get_availability_stats
+from email_service import start_worker, stop_worker, get_outbox_stats
+from events import subscribe, unsubscribe, topics_for, get_event_stats, HEARTBEAT_SECONDS
+from ollama_queue import OllamaBusy, run_in_pool, iterate_in_pool, get_queue_stats
+from tracing import trace, finish_trace, render_metrics
 
-app = FastAPI()
+# Models are loaded in the background so the server accepts connections right
+# away; GET /ready turns 200 once they are in memory. A request that needs a
+# model before then builds it itself (once, under the module's lock) and waits.
+_warmup = {"status": "loading", "seconds": None, "error": None}
+
+def _warm_models():
+    start = time.perf_counter()
+    try:
+        # Embedding model and Chroma (plus BM25 / reranker if enabled), the
+        # tokenizer that sizes the RAG context, and the Ollama client
+        get_retrieval_service().warm()
+        count_tokens("warm up")
+        get_llm()
+        _warmup["status"] = "ready"
+    except Exception as e:
+        print(f"⚠️ Warm-up failed: {e}")
+        _warmup.update(status="failed", error=str(e))
+    _warmup["seconds"] = round(time.perf_counter() - start, 2)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=_warm_models, name="warmup", daemon=True).start()
+    # No-op after the first run; bookings must be in place before the availability index loads
+    migrate_from_chroma()
+    start_sync()
+    start_worker()
+    yield
+    stop_worker()
+    stop_sync()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(bookings_router)
 
 app.add_middleware(
@@ -15,15 +58,41 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# /events stays open for as long as the page does, so it isn't timed
+UNTRACED_PATHS = {"/events", "/metrics"}
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # One trace per request; pipeline spans attach to it through the context, and
+    # it is closed when the last byte of the body is sent so streams count in full
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+    with trace(f"{request.method} {request.url.path}") as t:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    route = route.path if route else "unmatched"
+    body = response.body_iterator
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish_trace(t, request.method, route, response.status_code)
+
+    response.body_iterator = traced_body()
+    return response
+
 class ChatRequest(BaseModel):
     message: str
     user_id: str = "default"
 
-@app.post("/chat")
-async def chat(req: ChatRequest):
-    intent = classify_intent(req.message)
+def _intent_reply(analysis: dict) -> dict | None:
+    # Reply for the non-RAG intents; None means the message is a question
+    intent = analysis["intent"]
 
     if intent == "unclear":
         return {
@@ -32,7 +101,7 @@ async def chat(req: ChatRequest):
         }
 
     if intent == "booking":
-        entities = extract_booking_entities(req.message)
+        entities = analysis["entities"]
         missing = [k for k, v in entities.items() if v is None]
 
         if missing:
@@ -52,22 +121,145 @@ async def chat(req: ChatRequest):
             }
         }
 
-    result = get_answer(req.message)
+    return None
+
+BUSY_REPLY = {
+    "type": "busy",
+    "content": "SmartAssist is handling a lot of questions right now. Please try again in a moment."
+}
+
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    # The pipeline is blocking (embedding, Chroma, Ollama), so it runs on the
+    # bounded pool and the event loop stays free for other requests
+    try:
+        reply = _intent_reply(await run_in_pool(handle_message, req.user_id, req.message))
+        if reply:
+            return reply
+        result = await run_in_pool(get_answer, req.message)
+    except OllamaBusy:
+        return JSONResponse(BUSY_REPLY, status_code=503)
+
     return {
         "type": "answer",
         "content": result["answer"],
         "source": result["source"]
     }
 
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    # Server-sent events: booking/unclear replies arrive as one event in the same
+    # shape /chat returns; answers stream as source -> token... -> done
+    try:
+        reply = _intent_reply(await run_in_pool(handle_message, req.user_id, req.message))
+    except OllamaBusy:
+        return JSONResponse(BUSY_REPLY, status_code=503)
+
+    async def events():
+        if reply:
+            yield _sse(reply)
+            yield _sse({"type": "done"})
+            return
+        try:
+            async for event in iterate_in_pool(stream_answer(req.message)):
+                yield _sse(event)
+        except OllamaBusy:
+            yield _sse(BUSY_REPLY)
+            yield _sse({"type": "done"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/events")
+async def event_stream(request: Request, user_id: str = None, role: str = None):
+    # Server-sent push of new announcements and booking changes, replacing
+    # polling. "ready" is sent on every (re)connect and "resync" if the client
+    # fell behind; both mean "refetch your lists".
+    subscription = subscribe(topics_for(user_id, role))
+
+    async def events():
+        try:
+            yield _sse({"type": "ready"})
+            while not await request.is_disconnected():
+                event = await subscription.get(HEARTBEAT_SECONDS)
+                # Comment line as a heartbeat, so idle proxies keep the connection open
+                yield _sse(event) if event else ": ping\n\n"
+        finally:
+            unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _save_upload(src, filepath: str):
+    # Written beside the target and swapped in whole, so an ingest job reading
+    # the previous version of the file never sees a half-written one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(src, f)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
 @app.post("/documents")
 async def upload_document(file: UploadFile = File(...)):
     os.makedirs("docs", exist_ok=True)
     filepath = f"docs/{file.filename}"
-    with open(filepath, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-    ingest_pdf(filepath, file.filename)
-    return {"status": "indexed", "filename": file.filename}
+    # A large upload would otherwise block the event loop while it is copied
+    await run_in_pool(_save_upload, file.file, filepath)
+    # Indexing runs as a background job; poll /documents/jobs/{job_id} for progress
+    job = start_ingest_job(filepath, file.filename)
+    return JSONResponse(
+        {"status": job["status"], "filename": file.filename, "job_id": job["job_id"]},
+        status_code=202
+    )
+
+@app.get("/documents/jobs")
+def list_document_jobs():
+    return list_ingest_jobs()
+
+@app.get("/documents/jobs/{job_id}")
+def document_job(job_id: str):
+    job = get_ingest_job(job_id)
+    if not job:
+        return JSONResponse({"detail": "Job not found"}, status_code=404)
+    return job
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    # Liveness only: the process is up and serving
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    # Readiness: 503 until the models are loaded, so traffic can wait for a warm process
+    if _warmup["status"] != "ready":
+        return JSONResponse(status_code=503, content=_warmup)
+    return _warmup
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+def stats():
+    return {
+        "intent": get_intent_stats(),
+        "conversation": get_conversation_stats(),
+        "answer_cache": get_cache_stats(),
+        "ollama_queue": get_queue_stats(),
+        "availability": get_availability_stats(),
+        "outbox": get_outbox_stats(),
+        "events": get_event_stats(),
+        "retrieval": get_retrieval_stats()
+    }
\ No newline at end of file
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from tracing import span
+import contextvars
+import threading
+import asyncio
+import os
+
+# How many generations may run against Ollama at once (match OLLAMA_NUM_PARALLEL),
+# how many more may wait for a slot before new requests are turned away, and how
+# many threads run the blocking chat/ingest pipeline off the event loop
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "2"))
+OLLAMA_QUEUE_LIMIT = int(os.getenv("OLLAMA_QUEUE_LIMIT", "32"))
+PIPELINE_THREADS = int(os.getenv("PIPELINE_THREADS", "16"))
+
+class OllamaBusy(Exception):
+    pass
+
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_THREADS, thread_name_prefix="pipeline")
+_slots = threading.Semaphore(OLLAMA_CONCURRENCY)
+_lock = threading.Lock()
+_state = {"in_flight": 0, "waiting": 0, "rejected": 0, "completed": 0}
+
+@contextmanager
+def ollama_slot():
+    # Wrap every LLM call; blocks the calling worker thread (never the event loop)
+    # until one of OLLAMA_CONCURRENCY slots is free
+    with _lock:
+        if _state["waiting"] >= OLLAMA_QUEUE_LIMIT:
+            _state["rejected"] += 1
+            raise OllamaBusy()
+        _state["waiting"] += 1
+    with span("ollama.queue_wait"):
+        _slots.acquire()
+    with _lock:
+        _state["waiting"] -= 1
+        _state["in_flight"] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _state["in_flight"] -= 1
+            _state["completed"] += 1
+        _slots.release()
+
+def _submit(fn, *args):
+    # Copy the caller's context so the request trace follows the work onto the pool
+    context = contextvars.copy_context()
+    return _executor.submit(context.run, fn, *args)
+
+async def run_in_pool(fn, *args):
+    return await asyncio.wrap_future(_submit(fn, *args))
+
+async def iterate_in_pool(generator):
+    # Drive a blocking generator from async code, one step per pool task
+    done = object()
+    step = None
+    try:
+        while True:
+            step = _submit(next, generator, done)
+            item = await asyncio.wrap_future(step)
+            if item is done:
+                return
+            yield item
+    finally:
+        # If the client went away this runs while a step may still be inside the
+        # generator on a pool thread; closing it now would fail ("generator already
+        # executing") and leave its Ollama slot held. Let that step finish, then
+        # close the generator on the pool, which releases the slot.
+        if step is not None and not step.done():
+            try:
+                await asyncio.wrap_future(step)
+            except Exception:
+                pass
+        await run_in_pool(generator.close)
+
+def get_queue_stats() -> dict:
+    with _lock:
+        state = dict(_state)
+    return {
+        **state,
+        "concurrency": OLLAMA_CONCURRENCY,
+        "queue_limit": OLLAMA_QUEUE_LIMIT,
+        "pipeline_threads": PIPELINE_THREADS,
+    }
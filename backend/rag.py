@@ -1,28 +1,13 @@
-from langchain_ollama import OllamaLLM
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from retrieval import get_retrieval_service, doc_key
+from ollama_queue import ollama_slot
+from context import assemble_context, format_citation
+from tracing import span, traced, record_cache
+import llm_clients
+import answer_cache
 
-CHROMA_PATH = "chroma_db"
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-llm = OllamaLLM(model="llama3")
+NO_INFO_ANSWER = "I don't have information on this in the current knowledge base."
 
-def get_answer(question: str) -> dict:
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding)
-    retriever = db.as_retriever(search_kwargs={"k": 3})
-    
-    docs = retriever.invoke(question)
-    
-    if not docs:
-        return {
-            "answer": "I don't have information on this in the current knowledge base.",
-            "source": None
-        }
-    
-    context = "\n\n".join([d.page_content for d in docs])
-    source = docs[0].metadata.get("source", "Unknown")
-    page = docs[0].metadata.get("page", "?")
-    
-    prompt = f"""You are CSIS SmartAssist, a helpful university department assistant.
+PROMPT_TEMPLATE = """You are CSIS SmartAssist, a helpful university department assistant.
 Answer the question using only the context provided below.
 If the answer is not in the context, say you don't have that information.
 
@@ -32,9 +17,79 @@ Context:
 Question: {question}
 
 Answer:"""
+
+def build_prompt(question: str, docs: list) -> tuple[str, str]:
+    # The generation prompt for the retrieved docs, and the citation shown with the
+    # answer: every page that made it into the context
+    context, cited = assemble_context(docs)
+    return PROMPT_TEMPLATE.format(context=context, question=question), format_citation(cited)
+
+def _prepare(question: str) -> dict:
+    # Everything up to the LLM call. Returns either a finished "result" (cache hit
+    # or empty retrieval) or the prompt plus what's needed to cache the answer.
+    retrieval = get_retrieval_service()
+    # Embed once: the same vector drives retrieval and the semantic cache lookup
+    with span("rag.embed"):
+        query_vector = retrieval.embed_query(question)
+    with span("rag.retrieve"):
+        docs = retrieval.search(question, query_vector)
     
-    answer = llm.invoke(prompt)
+    if not docs:
+        return {"result": {"answer": NO_INFO_ANSWER, "source": None}}
+
+    chunk_ids = [doc_key(d) for d in docs]
+    cache_key = answer_cache.make_key(question, chunk_ids)
+    cached, outcome = answer_cache.lookup(cache_key, chunk_ids, query_vector)
+    record_cache("answer_cache", outcome)
+    if cached:
+        return {"result": cached}
+    
+    with span("rag.prompt"):
+        prompt, source = build_prompt(question, docs)
     return {
+        "prompt": prompt,
+        "source": source,
+        "cache_key": cache_key,
+        "chunk_ids": chunk_ids,
+        "query_vector": query_vector
+    }
+
+@traced("rag")
+def get_answer(question: str) -> dict:
+    prepared = _prepare(question)
+    if "result" in prepared:
+        return prepared["result"]
+
+    with ollama_slot(), span("rag.generate"):
+        answer = llm_clients.generate(prepared["prompt"], "rag")
+    result = {
         "answer": answer,
-        "source": f"{source}, p.{page}"
-    }
\ No newline at end of file
+        "source": prepared["source"]
+    }
+    answer_cache.put(prepared["cache_key"], question, prepared["chunk_ids"], prepared["query_vector"], result)
+    return result
+
+def stream_answer(question: str):
+    # Yields {"type": "source"} as soon as retrieval is done, then one
+    # {"type": "token"} per generated chunk and a final {"type": "done"}
+    prepared = _prepare(question)
+    if "result" in prepared:
+        result = prepared["result"]
+        yield {"type": "source", "source": result["source"]}
+        yield {"type": "token", "content": result["answer"]}
+        yield {"type": "done", "content": result["answer"], "source": result["source"]}
+        return
+
+    yield {"type": "source", "source": prepared["source"]}
+    parts = []
+    with ollama_slot(), span("rag.generate"):
+        for token in llm_clients.stream(prepared["prompt"], "rag"):
+            parts.append(token)
+            yield {"type": "token", "content": token}
+
+    result = {
+        "answer": "".join(parts),
+        "source": prepared["source"]
+    }
+    answer_cache.put(prepared["cache_key"], question, prepared["chunk_ids"], prepared["query_vector"], result)
+    yield {"type": "done", "content": result["answer"], "source": result["source"]}
\ No newline at end of file
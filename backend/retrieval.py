@@ -0,0 +1,277 @@
+from collections import deque
+from lexical import BM25Index
+from embeddings import load_embeddings, model_id, CachedEmbeddings, EMBEDDING_BACKEND, EMBEDDING_CACHE_PATH
+import threading
+import hashlib
+import time
+import os
+
+CHROMA_PATH = "chroma_db"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+RETRIEVAL_K = 3
+# Rows per Chroma get() when reading the whole collection, so a large corpus is
+# never pulled through one unbounded query
+CHROMA_PAGE_SIZE = 1000
+
+# Hybrid retrieval: dense (Chroma) and BM25 candidates merged by reciprocal-rank
+# fusion, then optionally re-scored by a CPU cross-encoder. HYBRID_RETRIEVAL=0
+# falls back to dense only.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+RERANK_ENABLED = os.getenv("RERANK", "0") == "1"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "10"))
+
+# Per-stage latency budgets (ms). Stages that run over are counted in /stats;
+# the rerank stage is skipped when its recent cost would exceed its own budget
+# or what is left of RETRIEVAL_BUDGET_MS for the request.
+STAGE_BUDGETS_MS = {
+    "embed": float(os.getenv("EMBED_BUDGET_MS", "50")),
+    "vector": float(os.getenv("VECTOR_BUDGET_MS", "50")),
+    "lexical": float(os.getenv("LEXICAL_BUDGET_MS", "10")),
+    "fusion": float(os.getenv("FUSION_BUDGET_MS", "2")),
+    "rerank": float(os.getenv("RERANK_BUDGET_MS", "150")),
+}
+RETRIEVAL_BUDGET_MS = float(os.getenv("RETRIEVAL_BUDGET_MS", "250"))
+# While skipping, rerank anyway every this many requests to refresh its cost estimate
+RERANK_PROBE_EVERY = 50
+
+def doc_key(doc) -> str:
+    if getattr(doc, "id", None):
+        return doc.id
+    raw = f"{doc.metadata.get('source')}|{doc.metadata.get('page')}|{doc.page_content}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def reciprocal_rank_fusion(result_lists: list, k: int = RRF_K) -> list:
+    # Each doc scores sum(1 / (k + rank)) over the lists it appears in
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+class _StageTimer:
+    def __init__(self, samples: int = 500):
+        self._lock = threading.Lock()
+        self._samples = {stage: deque(maxlen=samples) for stage in STAGE_BUDGETS_MS}
+        self._overruns = {stage: 0 for stage in STAGE_BUDGETS_MS}
+        self.rerank_skipped = 0
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            self._samples[stage].append(ms)
+            if ms > STAGE_BUDGETS_MS[stage]:
+                self._overruns[stage] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                out[stage] = {
+                    "budget_ms": STAGE_BUDGETS_MS[stage],
+                    "p50_ms": round(ordered[len(ordered) // 2], 3) if ordered else None,
+                    "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3) if ordered else None,
+                    "over_budget": self._overruns[stage],
+                }
+            out["rerank_skipped"] = self.rerank_skipped
+            return out
+
+class RetrievalService:
+    # One embedding model, Chroma handle, retriever and BM25 index per process.
+    # Built on first use (or by warm() at startup) and shared by the chat and
+    # ingest paths. embedding_cache_path=None embeds everything with the model.
+    def __init__(self, persist_directory: str = CHROMA_PATH, model_name: str = EMBEDDING_MODEL, k: int = RETRIEVAL_K,
+                 hybrid: bool = HYBRID_RETRIEVAL, rerank: bool = RERANK_ENABLED,
+                 embedding_backend: str = EMBEDDING_BACKEND, embedding_cache_path: str | None = EMBEDDING_CACHE_PATH):
+        self.persist_directory = persist_directory
+        self.model_name = model_name
+        self.embedding_backend = embedding_backend
+        self.embedding_cache_path = embedding_cache_path
+        self.k = k
+        self.hybrid = hybrid
+        self.rerank = rerank
+        self._init_lock = threading.Lock()
+        # Chroma handles concurrent reads; writes are serialized so two uploads
+        # don't interleave their batches
+        self._write_lock = threading.Lock()
+        self._embedding = None
+        self._db = None
+        self._retriever = None
+        self._lexical = None
+        self._reranker = None
+        self._rerank_ms = None
+        self._since_rerank = 0
+        self.timer = _StageTimer()
+
+    def _ensure_ready(self):
+        if self._db is not None:
+            return
+        with self._init_lock:
+            if self._db is not None:
+                return
+            # Imported here: chromadb (and, in load_embeddings, sentence-transformers)
+            # are most of the server's import time, and only needed once warm() runs
+            from langchain_chroma import Chroma
+            embedding = load_embeddings(self.model_name, self.embedding_backend)
+            if self.embedding_cache_path:
+                embedding = CachedEmbeddings(embedding, model_id(self.model_name, self.embedding_backend),
+                                             self.embedding_cache_path)
+            db = Chroma(persist_directory=self.persist_directory, embedding_function=embedding)
+            self._retriever = db.as_retriever(search_kwargs={"k": self.k})
+            self._embedding = embedding
+            self._db = db
+
+    def _ensure_lexical(self) -> BM25Index:
+        if self._lexical is not None:
+            return self._lexical
+        self._ensure_ready()
+        with self._write_lock:
+            if self._lexical is None:
+                index = BM25Index()
+                for page in self._pages(["documents", "metadatas"]):
+                    index.add(page["ids"], page["documents"], page["metadatas"])
+                self._lexical = index
+        return self._lexical
+
+    def _pages(self, include: list):
+        # The whole collection, CHROMA_PAGE_SIZE rows per get()
+        offset = 0
+        while True:
+            page = self._db.get(include=include, limit=CHROMA_PAGE_SIZE, offset=offset)
+            yield page
+            if len(page["ids"]) < CHROMA_PAGE_SIZE:
+                return
+            offset += CHROMA_PAGE_SIZE
+
+    def _ensure_reranker(self):
+        if self._reranker is None:
+            with self._init_lock:
+                if self._reranker is None:
+                    from sentence_transformers import CrossEncoder
+                    self._reranker = CrossEncoder(RERANKER_MODEL, device="cpu")
+        return self._reranker
+
+    @property
+    def embedding(self):
+        self._ensure_ready()
+        return self._embedding
+
+    @property
+    def db(self):
+        self._ensure_ready()
+        return self._db
+
+    def warm(self):
+        self._ensure_ready()
+        self._embedding.embed_query("warm up")
+        if self.hybrid:
+            self._ensure_lexical()
+        if self.rerank:
+            self._ensure_reranker().predict([("warm up", "warm up")])
+
+    def embed_query(self, text: str) -> list:
+        start = time.perf_counter()
+        vector = self.embedding.embed_query(text)
+        self.timer.record("embed", (time.perf_counter() - start) * 1000)
+        return vector
+
+    def retrieve(self, question: str) -> list:
+        self._ensure_ready()
+        return self._retriever.invoke(question)
+
+    def search_by_vector(self, vector: list, k: int | None = None) -> list:
+        return self.db.similarity_search_by_vector(vector, k=k or self.k)
+
+    def _rerank(self, question: str, docs: list) -> list:
+        reranker = self._ensure_reranker()
+        start = time.perf_counter()
+        scores = reranker.predict([(question, d.page_content) for d in docs])
+        ms = (time.perf_counter() - start) * 1000
+        self._rerank_ms = ms if self._rerank_ms is None else 0.8 * self._rerank_ms + 0.2 * ms
+        self.timer.record("rerank", ms)
+        return [doc for _, doc in sorted(zip(scores, docs), key=lambda pair: pair[0], reverse=True)]
+
+    def _should_rerank(self, elapsed_ms: float) -> bool:
+        if not self.rerank:
+            return False
+        expected = self._rerank_ms
+        if expected is None or (expected <= STAGE_BUDGETS_MS["rerank"]
+                                and elapsed_ms + expected <= RETRIEVAL_BUDGET_MS):
+            self._since_rerank = 0
+            return True
+        self._since_rerank += 1
+        if self._since_rerank >= RERANK_PROBE_EVERY:
+            self._since_rerank = 0
+            return True
+        self.timer.rerank_skipped += 1
+        return False
+
+    def search(self, question: str, vector: list, k: int | None = None) -> list:
+        # The chat path's retrieval: dense, or hybrid (+ rerank) when enabled
+        k = k or self.k
+        if not self.hybrid:
+            start = time.perf_counter()
+            docs = self.search_by_vector(vector, k)
+            self.timer.record("vector", (time.perf_counter() - start) * 1000)
+            return docs
+
+        start = time.perf_counter()
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = self.search_by_vector(vector, candidates)
+        t_vector = time.perf_counter()
+        sparse = self._ensure_lexical().search(question, candidates)
+        t_lexical = time.perf_counter()
+        fused = reciprocal_rank_fusion([dense, sparse])
+        t_fusion = time.perf_counter()
+        self.timer.record("vector", (t_vector - start) * 1000)
+        self.timer.record("lexical", (t_lexical - t_vector) * 1000)
+        self.timer.record("fusion", (t_fusion - t_lexical) * 1000)
+
+        if self._should_rerank((t_fusion - start) * 1000):
+            return self._rerank(question, fused[:max(k, RERANK_CANDIDATES)])[:k]
+        return fused[:k]
+
+    def add_texts(self, texts: list, metadatas: list, ids: list | None = None) -> list:
+        # With ids this is an upsert: re-adding an existing chunk overwrites it
+        self._ensure_ready()
+        with self._write_lock:
+            ids = self._db.add_texts(texts, metadatas=metadatas, ids=ids)
+            if self._lexical is not None:
+                self._lexical.add(ids, texts, metadatas)
+            return ids
+
+    def delete(self, ids: list):
+        if not ids:
+            return
+        self._ensure_ready()
+        with self._write_lock:
+            self._db.delete(ids=ids)
+            if self._lexical is not None:
+                self._lexical.remove(ids)
+
+    def all_ids(self) -> list:
+        self._ensure_ready()
+        return [row_id for page in self._pages([]) for row_id in page["ids"]]
+
+    def stats(self) -> dict:
+        return {
+            "hybrid": self.hybrid,
+            "rerank": self.rerank,
+            "lexical_docs": len(self._lexical) if self._lexical is not None else None,
+            "embedding_backend": self.embedding_backend,
+            "embedding_cache": self._embedding.stats() if isinstance(self._embedding, CachedEmbeddings) else None,
+            "stages": self.timer.stats(),
+        }
+
+_service = RetrievalService()
+
+def get_retrieval_service() -> RetrievalService:
+    return _service
+
+def get_retrieval_stats() -> dict:
+    return _service.stats()
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+import answer_cache
+
+RESULT = {"answer": "Two TAs per lab section.", "source": "ta_policy.pdf (page 3)"}
+CHUNKS = ["ta_policy.pdf:3:0", "ta_policy.pdf:3:1"]
+
+
+@pytest.fixture(autouse=True)
+def scratch_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(answer_cache, "CACHE_PATH", str(tmp_path / "answers.db"))
+    monkeypatch.setattr(answer_cache, "_conn", answer_cache._connect())
+    monkeypatch.setattr(answer_cache, "_vectors", None)
+    monkeypatch.setattr(answer_cache, "SEMANTIC_ENABLED", True)
+
+
+def store(question: str, chunk_ids: list, vector: list):
+    answer_cache.put(answer_cache.make_key(question, chunk_ids), question, chunk_ids, vector, RESULT)
+
+
+def lookup(question: str, chunk_ids: list, vector: list):
+    return answer_cache.lookup(answer_cache.make_key(question, chunk_ids), chunk_ids, vector)
+
+
+def test_exact_hit():
+    store("How many TAs per lab?", CHUNKS, [1.0, 0.0, 0.0])
+    assert lookup("how many TAs per lab", CHUNKS, [0.0, 1.0, 0.0]) == (RESULT, "hit")
+
+
+def test_semantic_hit_needs_the_same_chunks():
+    store("How many TAs per lab?", CHUNKS, [1.0, 0.0, 0.0])
+    assert lookup("TAs for each lab?", CHUNKS, [0.99, 0.1, 0.0]) == (RESULT, "semantic_hit")
+    assert lookup("TAs for each lab?", CHUNKS[:1], [0.99, 0.1, 0.0]) == (None, "miss")
+    assert lookup("Who allocates TAs?", CHUNKS, [0.0, 1.0, 0.0]) == (None, "miss")
+
+
+def test_semantic_off(monkeypatch):
+    monkeypatch.setattr(answer_cache, "SEMANTIC_ENABLED", False)
+    store("How many TAs per lab?", CHUNKS, [1.0, 0.0, 0.0])
+    assert lookup("TAs for each lab?", CHUNKS, [1.0, 0.0, 0.0]) == (None, "miss")
+
+
+def test_vectors_survive_a_restart(monkeypatch):
+    store("How many TAs per lab?", CHUNKS, [1.0, 0.0, 0.0])
+    monkeypatch.setattr(answer_cache, "_vectors", None)
+    assert lookup("TAs for each lab?", CHUNKS, [1.0, 0.0, 0.0]) == (RESULT, "semantic_hit")
+
+
+def test_invalidate_drops_vectors():
+    store("How many TAs per lab?", CHUNKS, [1.0, 0.0, 0.0])
+    answer_cache.invalidate()
+    assert lookup("TAs for each lab?", CHUNKS, [1.0, 0.0, 0.0]) == (None, "miss")
+
+
+def test_eviction_drops_vectors(monkeypatch):
+    monkeypatch.setattr(answer_cache, "CACHE_MAX_ENTRIES", 1)
+    store("How many TAs per lab?", CHUNKS, [1.0, 0.0, 0.0])
+    store("Who allocates TAs?", ["other.pdf:1:0"], [0.0, 1.0, 0.0])
+    assert lookup("TAs for each lab?", CHUNKS, [1.0, 0.0, 0.0]) == (None, "miss")
+
+
+def test_old_cache_gains_chunk_set(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE answers (key TEXT PRIMARY KEY, question TEXT NOT NULL,
+        corpus_version INTEGER NOT NULL, answer TEXT NOT NULL, source TEXT, embedding BLOB,
+        created_at REAL NOT NULL, last_used REAL NOT NULL)""")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(answer_cache, "CACHE_PATH", str(path))
+    columns = [row[1] for row in answer_cache._connect().execute("PRAGMA table_info(answers)")]
+    assert "chunk_set" in columns
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import conversation
+import intent
+import llm_clients
+
+
+class NullLLM:
+    # Extracts nothing, so every field comes from the deterministic parsers
+    def invoke(self, prompt: str, **kwargs) -> str:
+        return json.dumps(dict.fromkeys(intent.BOOKING_FIELDS))
+
+
+@pytest.fixture(autouse=True)
+def no_models(monkeypatch):
+    monkeypatch.setattr(llm_clients, "_llm", NullLLM())
+    monkeypatch.setattr(intent, "_embedding_intent", lambda message: None)
+
+
+PENDING = {"resource": "CS lab", "date": None, "time": "02:00 PM", "duration": "1 hour"}
+
+
+@pytest.mark.parametrize("message", [
+    "What is the thesis submission deadline on 15 March?",
+    "Does the TA policy apply for 2 hours per week?",
+    "When is the lab open on Friday?",
+])
+def test_question_is_not_a_followup(message):
+    assert conversation._followup(message, PENDING) is None
+
+
+@pytest.mark.parametrize("message", ["next Monday", "can we do 15 March?", "what about tomorrow?"])
+def test_answer_is_a_followup(message):
+    assert conversation._followup(message, PENDING)["date"]
+
+
+def test_question_mid_booking_keeps_booking_pending():
+    user = "test-question-mid-booking"
+    first = conversation.handle_message(user, "Book the CS lab at 2 PM for 1 hour")
+    assert first["intent"] == "booking" and first["entities"]["date"] is None
+
+    aside = conversation.handle_message(user, "What is the thesis submission deadline on 15 March?")
+    assert aside["intent"] == "question"
+
+    done = conversation.handle_message(user, "next Monday")
+    assert done["intent"] == "booking"
+    assert None not in done["entities"].values()
+    assert "03-15" not in done["entities"]["date"]
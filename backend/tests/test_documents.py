@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import ingest
+import main
+
+
+@pytest.fixture
+def blocked_runner(monkeypatch):
+    # Hold the single ingest worker so new jobs stay queued
+    release = threading.Event()
+    indexed = []
+    monkeypatch.setattr(ingest, "ingest_pdf", lambda filepath, filename, progress=None: indexed.append(filename))
+    ingest._job_runner.submit(release.wait, 5)
+    yield indexed
+    release.set()
+    # Let the queued jobs finish while ingest_pdf is still the stub
+    ingest._job_runner.submit(lambda: None).result(5)
+
+
+def test_queued_job_is_reused_for_the_same_file(blocked_runner):
+    first = ingest.start_ingest_job("docs/a.pdf", "dedupe-a.pdf")
+    second = ingest.start_ingest_job("docs/a.pdf", "dedupe-a.pdf")
+    other = ingest.start_ingest_job("docs/b.pdf", "dedupe-b.pdf")
+    assert second["job_id"] == first["job_id"]
+    assert other["job_id"] != first["job_id"]
+
+
+def test_upload_replaces_the_file_whole(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    started = []
+    monkeypatch.setattr(main, "start_ingest_job", lambda filepath, filename: started.append(filepath) or
+                        {"status": "queued", "job_id": "job-1"})
+    client = TestClient(main.app)
+    for content in (b"%PDF-1 old", b"%PDF-1 new"):
+        response = client.post("/documents", files={"file": ("policy.pdf", content, "application/pdf")})
+        assert response.status_code == 202
+    assert (tmp_path / "docs" / "policy.pdf").read_bytes() == b"%PDF-1 new"
+    assert sorted(p.name for p in (tmp_path / "docs").iterdir()) == ["policy.pdf"]
+    assert started == ["docs/policy.pdf", "docs/policy.pdf"]
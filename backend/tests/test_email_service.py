@@ -0,0 +1,91 @@
+import smtplib
+import time
+
+import pytest
+
+import email_service
+
+
+class FlakyServer:
+    # Delivers until the message to fail_on, then raises something unexpected
+    def __init__(self, fail_on: str):
+        self.fail_on = fail_on
+        self.delivered = []
+
+    def sendmail(self, sender: str, to: str, message: str):
+        if to == self.fail_on:
+            raise RuntimeError("unexpected failure")
+        self.delivered.append(to)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_service, "OUTBOX_PATH", str(tmp_path / "outbox.db"))
+    monkeypatch.setattr(email_service, "_db", email_service._connect())
+    yield
+    email_service.stop_worker()
+
+
+def statuses() -> dict:
+    with email_service._db_lock:
+        rows = email_service._db.execute("SELECT recipient, status, attempts FROM outbox").fetchall()
+    return {to: (status, attempts) for to, status, attempts in rows}
+
+
+def test_failure_mid_batch_leaves_sent_messages_sent(outbox, monkeypatch):
+    server = FlakyServer(fail_on="b@example.com")
+    monkeypatch.setattr(email_service, "_open_smtp", lambda: server)
+    email_service.send_emails([(to, "Subject", "<p>hi</p>") for to in
+                               ("a@example.com", "b@example.com", "c@example.com")])
+    email_service.start_worker()
+
+    # Wait until the worker has dealt with every message once
+    deadline = time.time() + 5
+    while any(status == "sending" or (status == "queued" and attempts == 0)
+              for status, attempts in statuses().values()):
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+    assert server.delivered == ["a@example.com"]
+    assert statuses() == {
+        "a@example.com": ("sent", 0),
+        "b@example.com": ("queued", 1),
+        "c@example.com": ("queued", 1),
+    }
+
+
+class RefusingServer(FlakyServer):
+    # Refuses one mailbox with a permanent 550, like Gmail for an unknown address
+    def __init__(self, refuse: str):
+        super().__init__(fail_on=None)
+        self.refuse = refuse
+
+    def sendmail(self, sender: str, to: str, message: str):
+        if to == self.refuse:
+            raise smtplib.SMTPRecipientsRefused({to: (550, b"5.1.1 No such user")})
+        self.delivered.append(to)
+
+
+def test_refused_recipient_keeps_the_connection(outbox, monkeypatch):
+    server = RefusingServer(refuse="nobody@example.com")
+    connections = []
+    monkeypatch.setattr(email_service, "_open_smtp", lambda: connections.append(server) or server)
+    email_service.send_emails([(to, "Subject", "<p>hi</p>") for to in
+                               ("a@example.com", "nobody@example.com", "c@example.com")])
+    email_service.start_worker()
+
+    deadline = time.time() + 5
+    while any(status in ("queued", "sending") for status, _ in statuses().values()):
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+    assert server.delivered == ["a@example.com", "c@example.com"]
+    assert len(connections) == 1
+    assert statuses() == {
+        "a@example.com": ("sent", 0),
+        "nobody@example.com": ("failed", 1),
+        "c@example.com": ("sent", 0),
+    }
@@ -0,0 +1,54 @@
+import datetime
+
+import pytest
+
+from entity_parser import parse_booking_fields, parse_time
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("from 3 to 5 pm", ("03:00 PM", 2.0)),
+    ("11 to 1pm", ("11:00 AM", 2.0)),
+    ("from 11 to 1 PM", ("11:00 AM", 2.0)),
+    ("11:30 to 12:30 pm", ("11:30 AM", 1.0)),
+    ("10 to 12pm", ("10:00 AM", 2.0)),
+    ("12 to 2 pm", ("12:00 PM", 2.0)),
+    ("9 to 5 pm", ("09:00 AM", 8.0)),
+    ("10am-1pm", ("10:00 AM", 3.0)),
+])
+def test_time_range(text, expected):
+    assert parse_time(text) == expected
+
+
+def test_backwards_range_is_left_to_the_llm():
+    assert parse_time("5pm to 3pm") == (None, None)
+
+
+def test_single_time():
+    assert parse_time("at 3 PM") == ("03:00 PM", None)
+    assert parse_time("at 13:00") == ("01:00 PM", None)
+
+
+def test_range_across_noon_sets_duration():
+    fields = parse_booking_fields("book the CS lab tomorrow from 11 to 1 pm")
+    assert fields["time"] == "11:00 AM"
+    assert fields["duration"] == "2 hours"
+
+
+@pytest.mark.parametrize("text, resource, time, duration", [
+    ("book the CS lab 3-5 pm tomorrow", "CS lab", "03:00 PM", "2 hours"),
+    ("book the CS lab tomorrow 10 to 12 pm", "CS lab", "10:00 AM", "2 hours"),
+    ("reserve the seminar hall tomorrow 3 to 5 pm", "seminar hall", "03:00 PM", "2 hours"),
+    ("book lab 2 hours tomorrow at 4pm", "lab", "04:00 PM", "2 hours"),
+])
+def test_times_and_durations_are_not_room_numbers(text, resource, time, duration):
+    fields = parse_booking_fields(text, datetime.date(2026, 10, 18))
+    assert fields == {"resource": resource, "date": "2026-10-19", "time": time, "duration": duration}
+
+
+@pytest.mark.parametrize("text, resource", [
+    ("reserve lab 3 for friday 2pm", "lab 3"),
+    ("book D-204 room for 3 hours today", "D-204 room"),
+    ("book room 204 at 10:30", "room 204"),
+])
+def test_room_numbers(text, resource):
+    assert parse_booking_fields(text, datetime.date(2026, 10, 18))["resource"] == resource
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import intent
+import llm_clients
+from intent import rule_intent
+
+
+class RecordingLLM:
+    # Answers every prompt with output and remembers which prompts it saw
+    def __init__(self, output: str):
+        self.output = output
+        self.prompts = []
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        self.prompts.append((prompt, kwargs.get("format")))
+        return self.output
+
+
+@pytest.fixture
+def llm_tier(monkeypatch):
+    # Send every message to the LLM tier
+    monkeypatch.setattr(intent, "_rule_intent", lambda message: None)
+    monkeypatch.setattr(intent, "_embedding_intent", lambda message: None)
+
+    def install(output: str) -> RecordingLLM:
+        llm = RecordingLLM(output)
+        monkeypatch.setattr(llm_clients, "_llm", llm)
+        return llm
+    return install
+
+
+@pytest.mark.parametrize("message", [
+    "Book the CS lab tomorrow at 3 PM for 2 hours",
+    "Can I book the conference room on Monday at 11 AM?",
+    "Could I reserve the networks lab for 2 hours on Friday?",
+    "Is lab 1 free to book at 5 pm today?",
+])
+def test_booking_requests(message):
+    assert rule_intent(message) == "booking"
+
+
+@pytest.mark.parametrize("message", [
+    "How do I book a lab?",
+    "How do I book the seminar hall on Friday?",
+    "Who do I contact to book a lab tomorrow?",
+    "Where can I reserve a room for 2 hours?",
+])
+def test_questions_about_booking_are_not_bookings(message):
+    assert rule_intent(message) != "booking"
+
+
+def test_incomplete_booking_takes_one_json_call(llm_tier):
+    llm = llm_tier(json.dumps({"resource": "networks lab", "date": None, "time": "03:00 PM", "duration": None}))
+    result = intent.classify_and_extract("Could you get me the networks lab sometime next week?")
+    assert result["intent"] == "booking"
+    assert result["entities"]["resource"] == "networks lab"
+    assert result["entities"]["time"] == "03:00 PM"
+    assert result["llm_calls"] == 1
+    assert [fmt for _, fmt in llm.prompts] == ["json"]
+
+
+def test_complete_booking_only_needs_the_classifier(llm_tier):
+    llm = llm_tier("BOOKING")
+    result = intent.classify_and_extract("Could you get me the networks lab on 2025-03-21 at 3 PM for 2 hours?")
+    assert result["intent"] == "booking"
+    assert None not in result["entities"].values()
+    assert result["llm_calls"] == 1
+    assert "Reply with only one word" in llm.prompts[0][0]
+
+
+def test_question_uses_the_one_word_classifier(llm_tier):
+    llm = llm_tier("QUESTION")
+    result = intent.classify_and_extract("Can a dual degree student have a mentor from another department?")
+    assert result == {"intent": "question", "entities": None, "llm_calls": 1}
+    assert llm.prompts[0][1] is None
+
+
+@pytest.mark.parametrize("output, expected", [
+    (json.dumps({"intent": "question"}), "question"),
+    ("[]", "unclear"),
+    ('{"resource": "lab', "unclear"),
+])
+def test_combined_call_output(llm_tier, output, expected):
+    llm_tier(output)
+    assert intent.classify_and_extract("book something for our review")["intent"] == expected
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+
+from ollama_queue import get_queue_stats, iterate_in_pool, ollama_slot
+
+
+def test_cancel_mid_stream_releases_slot():
+    in_step = threading.Event()
+    finish_step = threading.Event()
+
+    def tokens():
+        with ollama_slot():
+            yield "first"
+            in_step.set()
+            finish_step.wait(5)
+            yield "second"
+
+    async def consume():
+        async for _ in iterate_in_pool(tokens()):
+            pass
+
+    async def run():
+        task = asyncio.create_task(consume())
+        await asyncio.to_thread(in_step.wait, 5)
+        # The client goes away while the second step is still running on the pool
+        task.cancel()
+        threading.Timer(0.1, finish_step.set).start()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert get_queue_stats()["in_flight"] == 0
+
+
+def test_stream_runs_to_completion():
+    def tokens():
+        with ollama_slot():
+            yield from ("a", "b", "c")
+
+    async def collect():
+        return [item async for item in iterate_in_pool(tokens())]
+
+    assert asyncio.run(collect()) == ["a", "b", "c"]
+    assert get_queue_stats()["in_flight"] == 0
@@ -0,0 +1,43 @@
+import retrieval
+
+
+class FakeCollection:
+    # Chroma's get() surface: include, limit and offset
+    def __init__(self, n: int):
+        self.ids = [f"chunk-{i}" for i in range(n)]
+        self.calls = []
+
+    def get(self, include: list, limit: int = None, offset: int = 0) -> dict:
+        self.calls.append((limit, offset))
+        ids = self.ids[offset:offset + limit]
+        page = {"ids": ids}
+        if "documents" in include:
+            page["documents"] = [f"text of {i}" for i in ids]
+        if "metadatas" in include:
+            page["metadatas"] = [{"source": "a.pdf", "page": 1} for _ in ids]
+        return page
+
+
+def service(n: int, monkeypatch) -> tuple:
+    monkeypatch.setattr(retrieval, "CHROMA_PAGE_SIZE", 4)
+    svc = retrieval.RetrievalService(embedding_cache_path=None)
+    svc._db = FakeCollection(n)
+    return svc, svc._db
+
+
+def test_lexical_index_is_loaded_in_pages(monkeypatch):
+    svc, db = service(10, monkeypatch)
+    assert len(svc._ensure_lexical()) == 10
+    assert db.calls == [(4, 0), (4, 4), (4, 8)]
+
+
+def test_exact_multiple_of_the_page_size(monkeypatch):
+    svc, db = service(8, monkeypatch)
+    assert len(svc._ensure_lexical()) == 8
+    assert db.calls == [(4, 0), (4, 4), (4, 8)]
+
+
+def test_all_ids_are_read_in_pages(monkeypatch):
+    svc, db = service(10, monkeypatch)
+    assert svc.all_ids() == db.ids
+    assert db.calls == [(4, 0), (4, 4), (4, 8)]
@@ -0,0 +1,192 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import threading
+import bisect
+import json
+import time
+import os
+
+# Per-request tracing and Prometheus metrics. A trace is opened for every HTTP
+# request (main.py middleware); span() timings inside it land both in that
+# trace and in a process-wide histogram per stage, so they are recorded for
+# background work (ingest jobs, the email worker) too. GET /metrics renders
+# everything in the Prometheus text format. Requests slower than SLOW_REQUEST_MS
+# are logged as one JSON line with their stage breakdown; 0 turns the log off.
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = ContextVar("trace", default=None)
+_lock = threading.Lock()
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+
+    def add_span(self, stage: str, seconds: float):
+        # Spans may finish on pool threads; dict updates under the GIL are enough here
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add(self, key: str, n: int = 1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def summary(self, status: int) -> dict:
+        return {
+            "request": self.name,
+            "status": status,
+            "ms": round((time.perf_counter() - self.start) * 1000, 1),
+            "stages_ms": {stage: round(s * 1000, 1) for stage, s in self.stages.items()},
+            **self.counts,
+        }
+
+class _Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series = {}
+
+    def observe(self, seconds: float, *label_values):
+        with _lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+            if index < len(LATENCY_BUCKETS):
+                series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._series.items()}
+        for label_values, (buckets, total, count) in sorted(series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+class _Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, n: float, *label_values):
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0) + n
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with _lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+def _labels(names: tuple, values: tuple) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+REQUEST_SECONDS = _Histogram("smartassist_request_duration_seconds",
+                             "HTTP request latency, until the last byte of the response",
+                             ("method", "route", "status"))
+STAGE_SECONDS = _Histogram("smartassist_stage_duration_seconds",
+                           "Latency of one pipeline stage (intent, retrieval, generation, calendar, email...)",
+                           ("stage",))
+LLM_TOKENS = _Counter("smartassist_llm_tokens_total", "Tokens evaluated by Ollama", ("llm", "kind"))
+LLM_CALLS = _Counter("smartassist_llm_calls_total", "Ollama generations", ("llm",))
+CACHE_LOOKUPS = _Counter("smartassist_cache_lookups_total", "Cache lookups by result", ("cache", "result"))
+INTENT_TIERS = _Counter("smartassist_intent_decisions_total", "Messages classified, by deciding tier", ("tier",))
+SLOW_REQUESTS = _Counter("smartassist_slow_requests_total", "Requests over SLOW_REQUEST_MS", ("route",))
+_metrics = [REQUEST_SECONDS, STAGE_SECONDS, LLM_TOKENS, LLM_CALLS, CACHE_LOOKUPS, INTENT_TIERS, SLOW_REQUESTS]
+
+def current_trace() -> Trace | None:
+    return _current.get()
+
+@contextmanager
+def trace(name: str):
+    # Opens a request-level trace for the current context; the caller reports it
+    # with finish_trace once the response is complete
+    t = Trace(name)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+def finish_trace(t: Trace, method: str, route: str, status: int):
+    seconds = time.perf_counter() - t.start
+    REQUEST_SECONDS.observe(seconds, method, route, str(status))
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(1, route)
+        print(f"SLOW {json.dumps(t.summary(status))}")
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage)
+        t = _current.get()
+        if t is not None:
+            t.add_span(stage, seconds)
+
+def traced(stage: str):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record_cache(cache: str, result: str):
+    CACHE_LOOKUPS.inc(1, cache, result)
+    t = _current.get()
+    if t is not None:
+        t.add(f"{cache}_{result}")
+
+def record_intent_tier(tier: str):
+    INTENT_TIERS.inc(1, tier)
+    t = _current.get()
+    if t is not None:
+        t.counts["intent_tier"] = tier
+
+class LLMMetrics(BaseCallbackHandler):
+    # Attached to each OllamaLLM: counts prompt/completion tokens from the final
+    # Ollama response, for /metrics and the current trace
+    def __init__(self, llm: str):
+        self.llm = llm
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                prompt, completion = info.get("prompt_eval_count") or 0, info.get("eval_count") or 0
+                LLM_CALLS.inc(1, self.llm)
+                LLM_TOKENS.inc(prompt, self.llm, "prompt")
+                LLM_TOKENS.inc(completion, self.llm, "completion")
+                t = _current.get()
+                if t is not None:
+                    t.add("llm_prompt_tokens", prompt)
+                    t.add("llm_completion_tokens", completion)
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
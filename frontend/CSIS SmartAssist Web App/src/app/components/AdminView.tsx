@@ -29,6 +29,7 @@ interface KnowledgeDoc {
   department: string;
   uploadDate: string;
   indexed: boolean;
+  jobId?: string;
 }
 
 interface AnnouncementPost {
@@ -38,6 +39,20 @@ interface AnnouncementPost {
   posted_by: string;
 }
 
+// List endpoints return one page at a time; follow X-Next-Cursor until the
+// last page so nothing past the first page is dropped
+const fetchAllPages = async (url: string) => {
+  const rows: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const sep = url.includes("?") ? "&" : "?";
+    const res = await fetch(cursor ? `${url}${sep}cursor=${encodeURIComponent(cursor)}` : url);
+    rows.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return rows;
+};
+
 export function AdminView() {
   const [activeNav, setActiveNav] = useState<NavItem>("bookings");
   const [isNavExpanded, setIsNavExpanded] = useState(false);
@@ -50,20 +65,21 @@ export function AdminView() {
   const [uploadedDocs, setUploadedDocs] = useState<KnowledgeDoc[]>([]);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
+  // Refetch when the server pushes a change ("ready" on every (re)connect and
+  // "resync" mean we may have missed some) instead of polling
   useEffect(() => {
-    fetchBookings();
-    fetchAnnouncements();
-    const interval = setInterval(() => {
-      fetchBookings();
-      fetchAnnouncements();
-    }, 10000);
-    return () => clearInterval(interval);
+    const source = new EventSource(`${API_BASE}/events?role=admin`);
+    source.onmessage = (e) => {
+      const event = JSON.parse(e.data);
+      if (event.type === "booking" || event.type === "ready" || event.type === "resync") fetchBookings();
+      if (event.type === "announcement" || event.type === "ready" || event.type === "resync") fetchAnnouncements();
+    };
+    return () => source.close();
   }, []);
 
   const fetchBookings = async () => {
     try {
-      const res = await fetch(`${API_BASE}/bookings`);
-      const data = await res.json();
+      const data = await fetchAllPages(`${API_BASE}/bookings?limit=500`);
       setBookings(data.map((b: any) => ({
         id: b.id,
         requester: b.requester,
@@ -80,8 +96,7 @@ export function AdminView() {
 
   const fetchAnnouncements = async () => {
     try {
-      const res = await fetch(`${API_BASE}/announcements`);
-      const data = await res.json();
+      const data = await fetchAllPages(`${API_BASE}/announcements?limit=500`);
       setAnnouncementHistory(data);
     } catch (err) {
       console.error("Failed to fetch announcements:", err);
@@ -133,6 +148,25 @@ export function AdminView() {
     }
   };
 
+  // Indexing runs in the background; check the job until it finishes
+  const pollIngestJob = (jobId: string, docId: number) => {
+    const interval = setInterval(async () => {
+      try {
+        const res = await fetch(`${API_BASE}/documents/jobs/${jobId}`);
+        const job = await res.json();
+        if (job.status === "indexed" || job.status === "failed" || !res.ok) {
+          clearInterval(interval);
+          setUploadedDocs((prev) =>
+            prev.map((doc) => (doc.id === docId ? { ...doc, indexed: job.status === "indexed" } : doc))
+          );
+        }
+      } catch (err) {
+        clearInterval(interval);
+        console.error("Failed to check indexing status:", err);
+      }
+    }, 2000);
+  };
+
   const handleUploadDocument = async (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0];
     if (!file) return;
@@ -147,18 +181,23 @@ export function AdminView() {
         body: formData,
       });
       const data = await res.json();
+      const docId = Date.now();
 
       setUploadedDocs((prev) => [
         ...prev,
         {
-          id: prev.length + 1,
+          id: docId,
           name: data.filename,
           type: data.filename.split(".").pop()?.toUpperCase() || "FILE",
           department: "Computer Science",
           uploadDate: new Date().toISOString().split("T")[0],
           indexed: data.status === "indexed",
+          jobId: data.job_id,
         },
       ]);
+      if (data.job_id && data.status !== "indexed") {
+        pollIngestJob(data.job_id, docId);
+      }
     } catch (err) {
       console.error("Failed to upload document:", err);
     } finally {
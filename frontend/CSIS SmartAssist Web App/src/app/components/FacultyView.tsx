@@ -47,15 +47,20 @@ export function FacultyView() {
   const [announcements, setAnnouncements] = useState<Announcement[]>([]);
   const [confirmingBooking, setConfirmingBooking] = useState<number | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // One key per booking card, so a double click or retry can't create a second booking
+  const idempotencyKeysRef = useRef<Record<number, string>>({});
+  const latestAnnouncementRef = useRef<string | null>(null);
 
+  // Refetch when the server pushes a change ("ready" on every (re)connect and
+  // "resync" mean we may have missed some) instead of polling
   useEffect(() => {
-    fetchBookings();
-    fetchAnnouncements();
-    const interval = setInterval(() => {
-      fetchBookings();
-      fetchAnnouncements();
-    }, 10000);
-    return () => clearInterval(interval);
+    const source = new EventSource(`${API_BASE}/events?user_id=${encodeURIComponent(USER_ID)}`);
+    source.onmessage = (e) => {
+      const event = JSON.parse(e.data);
+      if (event.type === "booking" || event.type === "ready" || event.type === "resync") fetchBookings();
+      if (event.type === "announcement" || event.type === "ready" || event.type === "resync") fetchAnnouncements();
+    };
+    return () => source.close();
   }, []);
 
   useEffect(() => {
@@ -79,9 +84,21 @@ export function FacultyView() {
 
   const fetchAnnouncements = async () => {
     try {
-      const res = await fetch(`${API_BASE}/announcements`);
-      const data = await res.json();
-      setAnnouncements(data);
+      // After the first load, only ask for announcements newer than the latest one we have
+      const since = latestAnnouncementRef.current;
+      const url = since
+        ? `${API_BASE}/announcements?since=${encodeURIComponent(since)}`
+        : `${API_BASE}/announcements`;
+      const res = await fetch(url);
+      const data: Announcement[] = await res.json();
+      if (data.length > 0) {
+        latestAnnouncementRef.current = data[0].created_at;
+      }
+      if (since) {
+        if (data.length > 0) setAnnouncements((prev) => [...data, ...prev]);
+      } else {
+        setAnnouncements(data);
+      }
     } catch (err) {
       console.error("Failed to fetch announcements:", err);
     }
@@ -135,11 +152,13 @@ export function FacultyView() {
   const handleConfirmBooking = async (messageId: number, booking: Message["booking"]) => {
     if (!booking) return;
     setConfirmingBooking(messageId);
+    const idempotencyKey =
+      idempotencyKeysRef.current[messageId] ??= crypto.randomUUID();
 
     try {
       const res = await fetch(`${API_BASE}/bookings/confirm`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", "Idempotency-Key": idempotencyKey },
         body: JSON.stringify({
           user_id: USER_ID,
           requester: REQUESTER_NAME,
@@ -152,7 +171,7 @@ export function FacultyView() {
 
       const data = await res.json();
 
-      if (data.status === "unavailable") {
+      if (!data.booking_id) {
         setMessages((prev) => [...prev, { id: prev.length + 1, type: "bot", content: data.message }]);
       } else {
         setMessages((prev) => [
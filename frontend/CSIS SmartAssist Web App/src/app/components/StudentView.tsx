@@ -39,12 +39,17 @@ export function StudentView() {
   const [bookingRequests, setBookingRequests] = useState<BookingRequest[]>([]);
   const [confirmingBooking, setConfirmingBooking] = useState<number | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // One key per booking card, so a double click or retry can't create a second booking
+  const idempotencyKeysRef = useRef<Record<number, string>>({});
 
-  // Fetch bookings on load and periodically
+  // Fetch bookings on load and whenever the server pushes a change to one of ours
   useEffect(() => {
-    fetchBookings();
-    const interval = setInterval(fetchBookings, 10000);
-    return () => clearInterval(interval);
+    const source = new EventSource(`${API_BASE}/events?user_id=${encodeURIComponent(USER_ID)}`);
+    source.onmessage = (e) => {
+      const event = JSON.parse(e.data);
+      if (event.type === "booking" || event.type === "ready" || event.type === "resync") fetchBookings();
+    };
+    return () => source.close();
   }, []);
 
   // Auto scroll to bottom
@@ -115,11 +120,13 @@ export function StudentView() {
   const handleConfirmBooking = async (messageId: number, booking: Message["booking"]) => {
     if (!booking) return;
     setConfirmingBooking(messageId);
+    const idempotencyKey =
+      idempotencyKeysRef.current[messageId] ??= crypto.randomUUID();
 
     try {
       const res = await fetch(`${API_BASE}/bookings/confirm`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", "Idempotency-Key": idempotencyKey },
         body: JSON.stringify({
           user_id: USER_ID,
           requester: REQUESTER_NAME,
@@ -132,7 +139,7 @@ export function StudentView() {
 
       const data = await res.json();
 
-      if (data.status === "unavailable") {
+      if (!data.booking_id) {
         setMessages((prev) => [
           ...prev,
           {